@@ -0,0 +1,152 @@
+"""
+Banc de mesure des builders, de flatten_dim_prices et des writers CSV/Parquet sur un dump synthétique.
+
+Sortie à la manière de pytest-benchmark : min / moyenne / écart-type par cible, débit (lignes/s)
+et pic de RSS. Les résultats peuvent être sauvés en JSON puis comparés à une référence ; une cible
+plus lente ou plus gourmande que la référence au-delà du seuil fait échouer la commande.
+
+Usage :
+    python -m benchmarks.bench_builders --invoices 10k --json benchmarks/results/10k.json
+    python -m benchmarks.bench_builders --invoices 1m --compare benchmarks/results/1m.json
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import statistics
+from pathlib import Path
+
+import pandas as pd
+
+from benchmarks.synthetic_dump import generate_dump, parse_scale
+from scripts.csv_builders import BUILDERS
+from scripts.flatten_utils import flatten_dim_prices
+from scripts.metrics import peak_rss_kb, reset_peak_rss
+from scripts.olap_io import stream_oltp_tables, write_table
+
+
+def run_benchmark(name: str, func, rounds: int) -> dict:
+    """Mesure `func` sur `rounds` exécutions ; le pic de RSS est relatif au RSS avant la première."""
+    timings = []
+    baseline = reset_peak_rss()
+    for _ in range(rounds):
+        start = time.perf_counter()
+        rows = func()
+        timings.append(time.perf_counter() - start)
+    peak_mb = (peak_rss_kb() - baseline) / 1024
+    best = min(timings)
+    return {
+        "name": name,
+        "stats": {
+            "min": best,
+            "mean": statistics.fmean(timings),
+            "stddev": statistics.stdev(timings) if len(timings) > 1 else 0.0,
+            "rounds": rounds,
+        },
+        "rows": rows,
+        "rows_per_s": rows / best if best else None,
+        "peak_rss_mb": peak_mb,
+    }
+
+
+def load_dump(n_invoices: int, seed: int, dump_path=None) -> dict:
+    if dump_path:
+        with open(dump_path, "rb") as f:
+            return dict(stream_oltp_tables(f))
+    return generate_dump(n_invoices, seed)
+
+
+def benchmark_targets(raw: dict, out_dir: Path) -> dict:
+    """Cibles mesurées : chaque builder, le flatten des prix et les deux writers. Renvoient un nombre de lignes."""
+    targets = {name: (lambda builder=builder: len(builder(raw))) for name, builder in BUILDERS.items()}
+
+    # flatten_dim_prices mesuré sur autant de prix que de factures (le catalogue réel est petit)
+    prices = pd.DataFrame(raw["prices"])
+    prices = prices.loc[prices.index.repeat(max(len(raw["invoices"]) // max(len(prices), 1), 1))]
+    targets["flatten_dim_prices"] = lambda: len(flatten_dim_prices(prices.copy()))
+
+    fact = BUILDERS["fact_invoices"](raw)
+    for fmt in ("csv", "parquet"):
+        target = out_dir / f"fact_invoices.{fmt}"
+        targets[f"write_{fmt}[fact_invoices]"] = (
+            lambda fmt=fmt, target=target: write_table(fact, target, "fact_invoices", fmt) or len(fact)
+        )
+    return targets
+
+
+def print_results(results: list, n_invoices: int):
+    print(f"📊 Builders benchmark, {n_invoices} invoices")
+    header = f"   {'name':<30}{'min (s)':>10}{'mean (s)':>10}{'stddev':>10}{'rounds':>8}{'rows/s':>14}{'peak MiB':>10}"
+    print(header)
+    print("   " + "-" * (len(header) - 3))
+    for r in results:
+        s = r["stats"]
+        print(f"   {r['name']:<30}{s['min']:>10.3f}{s['mean']:>10.3f}{s['stddev']:>10.3f}{s['rounds']:>8}"
+              f"{r['rows_per_s'] or 0:>14,.0f}{r['peak_rss_mb']:>10.1f}")
+
+
+def compare(results: list, baseline: dict, threshold: float) -> list:
+    """Cibles dont le temps minimal ou le pic de RSS dépasse la référence de plus de `threshold`."""
+    previous = {b["name"]: b for b in baseline["benchmarks"]}
+    regressions = []
+    for r in results:
+        ref = previous.get(r["name"])
+        if ref is None:
+            continue
+        if r["stats"]["min"] > ref["stats"]["min"] * (1 + threshold):
+            regressions.append(f"{r['name']}: min {ref['stats']['min']:.3f}s → {r['stats']['min']:.3f}s")
+        # Tolérance absolue : en dessous de quelques Mo, le pic de RSS est du bruit d'allocateur
+        if r["peak_rss_mb"] > max(ref["peak_rss_mb"] * (1 + threshold), ref["peak_rss_mb"] + 8):
+            regressions.append(f"{r['name']}: peak {ref['peak_rss_mb']:.1f} MiB → {r['peak_rss_mb']:.1f} MiB")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the OLAP builders on a synthetic Stripe dump.")
+    parser.add_argument("--invoices", default="10k", help="Number of invoices or a scale: 10k, 1m, 10m.")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--dump", help="Read this dump file instead of generating one in memory.")
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--only", nargs="*", help="Only run these targets.")
+    parser.add_argument("--json", help="Save results to this JSON file.")
+    parser.add_argument("--compare", help="Compare against a previous JSON result; exit 1 on regression.")
+    parser.add_argument("--threshold", type=float, default=0.10, help="Tolerated regression ratio (default 10%%).")
+    args = parser.parse_args(argv)
+
+    raw = load_dump(parse_scale(args.invoices), args.seed, args.dump)
+    n_invoices = len(raw["invoices"])
+    out_dir = Path(os.getenv("TMPDIR", "/tmp")) / "stripe_olap_bench"
+    out_dir.mkdir(parents=True, exist_ok=True)
+
+    targets = benchmark_targets(raw, out_dir)
+    names = args.only or list(targets)
+    results = [run_benchmark(name, targets[name], args.rounds) for name in names]
+    print_results(results, n_invoices)
+
+    report = {
+        "machine_info": {"python": platform.python_version(), "machine": platform.machine(),
+                         "system": platform.system(), "pandas": pd.__version__},
+        "invoices": n_invoices,
+        "seed": args.seed,
+        "benchmarks": results,
+    }
+    if args.json:
+        Path(args.json).parent.mkdir(parents=True, exist_ok=True)
+        Path(args.json).write_text(json.dumps(report, indent=2))
+        print(f"💾 Results saved to {args.json}")
+
+    if args.compare:
+        regressions = compare(results, json.loads(Path(args.compare).read_text()), args.threshold)
+        if regressions:
+            print("❌ Regressions against baseline:")
+            for line in regressions:
+                print(f"   {line}")
+            return 1
+        print("✅ No regression against baseline.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
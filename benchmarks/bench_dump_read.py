@@ -0,0 +1,117 @@
+"""
+Banc de mesure de la lecture du dump : json.loads du fichier entier (référence) contre la lecture
+en flux de load_latest_oltp_json_from_gcs, seule puis suivie de tous les builders.
+
+Chaque cible tourne dans un processus neuf : le pic de RSS (ru_maxrss) n'est pas faussé par la
+mémoire gardée par l'allocateur après une cible précédente. Le pic est donné en absolu et au-delà
+du RSS du processus une fois ses imports faits.
+
+Usage :
+    python -m benchmarks.bench_dump_read --invoices 50000
+    python -m benchmarks.bench_dump_read --dump tests/data/synthetic/db_dump_prod_synthetic_1m.json
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import resource
+import tempfile
+import multiprocessing
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+from benchmarks.synthetic_dump import parse_scale, write_dump
+from scripts.csv_builders import BUILDERS, required_source_tables
+from scripts.etl_to_snowflake import source_releaser
+from scripts.olap_io import load_latest_oltp_json_from_gcs
+
+DUMP_NAME = "db_dump_prod_synthetic.json"
+
+
+def read_json(dump_dir: str) -> dict:
+    return json.loads((Path(dump_dir) / DUMP_NAME).read_bytes())
+
+
+def read_stream(dump_dir: str) -> dict:
+    return load_latest_oltp_json_from_gcs(local_dir=dump_dir, tables=required_source_tables())
+
+
+def build_all(raw: dict, release=None) -> int:
+    rows = 0
+    for name, builder in BUILDERS.items():
+        rows += len(builder(raw))
+        if release is not None:
+            release(name)
+    return rows
+
+
+TARGETS = {
+    "json.loads": lambda d: sum(len(v) for v in read_json(d).values() if isinstance(v, list)),
+    "stream": lambda d: sum(len(v) for v in read_stream(d).values()),
+    "json.loads + builders": lambda d: build_all(read_json(d)),
+    "stream + builders": lambda d: build_all(raw := read_stream(d), source_releaser(raw)),
+}
+
+
+def _measure(name: str, dump_dir: str) -> dict:
+    """Exécuté dans un processus neuf : durée et pic de RSS d'une cible."""
+    base_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    start = time.perf_counter()
+    rows = TARGETS[name](dump_dir)
+    wall_s = time.perf_counter() - start
+    peak_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    return {"name": name, "wall_s": wall_s, "rows": rows, "peak_rss_mb": peak_mb, "delta_rss_mb": peak_mb - base_mb}
+
+
+def run_target(name: str, dump_dir: str) -> dict:
+    with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as pool:
+        return pool.submit(_measure, name, dump_dir).result()
+
+
+def print_results(results: list, size_mb: float):
+    print(f"📊 Dump read benchmark, {size_mb:.0f} MB dump (fresh process per target)")
+    header = f"   {'name':<24}{'wall (s)':>10}{'peak MiB':>10}{'+ MiB':>10}"
+    print(header)
+    print("   " + "-" * (len(header) - 3))
+    for r in results:
+        print(f"   {r['name']:<24}{r['wall_s']:>10.2f}{r['peak_rss_mb']:>10.0f}{r['delta_rss_mb']:>10.0f}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare json.loads with the streaming dump reader (time, peak RSS).")
+    parser.add_argument("--invoices", default="50000", help="Number of invoices or a scale: 10k, 1m, 10m.")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--dump", help="Read this dump file instead of writing a synthetic one.")
+    parser.add_argument("--only", nargs="*", choices=list(TARGETS), help="Only run these targets.")
+    parser.add_argument("--json", help="Save results to this JSON file.")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory(dir=os.getenv("TMPDIR")) as tmp:
+        dump = Path(tmp) / DUMP_NAME
+        if args.dump:
+            dump.symlink_to(Path(args.dump).resolve())
+        else:
+            write_dump(dump, parse_scale(args.invoices), args.seed)
+        size_mb = dump.stat().st_size / 1e6
+        results = [run_target(name, tmp) for name in args.only or TARGETS]
+    print_results(results, size_mb)
+
+    if args.json:
+        report = {
+            "machine_info": {"python": platform.python_version(), "machine": platform.machine(),
+                             "system": platform.system(), "pandas": pd.__version__},
+            "dump_mb": size_mb,
+            "benchmarks": results,
+        }
+        Path(args.json).parent.mkdir(parents=True, exist_ok=True)
+        Path(args.json).write_text(json.dumps(report, indent=2))
+        print(f"💾 Results saved to {args.json}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
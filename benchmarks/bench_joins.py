@@ -0,0 +1,88 @@
+"""
+Micro-benchmark : résolution des clés étrangères de fact_invoices.
+
+Compare les cinq `merge` chaînés historiques à join_dimensions (index d'ids + take, une passe).
+Mesure le temps (meilleur de N) et le pic mémoire alloué (tracemalloc, qui suit aussi numpy).
+Usage : python -m benchmarks.bench_joins [nb_factures]
+"""
+import sys
+import timeit
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+from scripts.join_utils import Lookup, join_dimensions
+
+
+def make_tables(n: int, seed: int = 42) -> dict:
+    rng = np.random.default_rng(seed)
+    n_customers, n_subs, n_products, n_prices = max(n // 10, 1), max(n // 5, 1), 50, 200
+    ids = lambda prefix, count: np.array([f"{prefix}_{i}" for i in range(count)], dtype=object)
+    customers = pd.DataFrame({"id": ids("cus", n_customers), "email": ids("mail", n_customers)})
+    subscriptions = pd.DataFrame({"id": ids("sub", n_subs), "price_id": ids("price", n_subs),
+                                  "plan_interval": rng.choice(["month", "year"], n_subs)})
+    products = pd.DataFrame({"id": ids("prod", n_products), "name": ids("name", n_products)})
+    prices = pd.DataFrame({"id": ids("price", n_prices), "unit_amount": rng.integers(100, 10_000, n_prices)})
+    payment_methods = pd.DataFrame({"id": ids("pm", n_customers), "type": "card",
+                                    "card": [{"brand": "visa"}] * n_customers})
+    invoices = pd.DataFrame({
+        "invoice_id": ids("in", n),
+        "customer_id": ids("cus", n_customers)[rng.integers(0, n_customers, n)],
+        "subscription_id": ids("sub", n_subs)[rng.integers(0, n_subs, n)],
+        "product_id": ids("prod", n_products)[rng.integers(0, n_products, n)],
+        "price_id": ids("price", n_prices)[rng.integers(0, n_prices, n)],
+        "default_payment_method_id": ids("pm", n_customers)[rng.integers(0, n_customers, n)],
+        "amount_paid": rng.integers(0, 100_000, n),
+        "created": rng.integers(1_600_000_000, 1_700_000_000, n),
+    })
+    # Quelques clés orphelines, écartées par les deux implémentations
+    invoices.loc[invoices.index[::1000], "customer_id"] = "cus_missing"
+    return dict(invoices=invoices, customers=customers, subscriptions=subscriptions, products=products,
+                prices=prices, payment_methods=payment_methods)
+
+
+def legacy_join(t: dict) -> pd.DataFrame:
+    df = t["invoices"].merge(t["customers"][["id", "email"]], left_on="customer_id", right_on="id", suffixes=("", "_customer"))
+    df = df.merge(t["subscriptions"][["id", "price_id", "plan_interval"]], left_on="subscription_id", right_on="id", suffixes=("", "_sub"))
+    df = df.merge(t["products"][["id", "name"]], left_on="product_id", right_on="id", suffixes=("", "_product"))
+    df = df.merge(t["prices"][["id", "unit_amount"]], left_on="price_id", right_on="id", suffixes=("", "_price"))
+    df = df.merge(t["payment_methods"][["id", "type", "card"]], how="left", left_on="default_payment_method_id", right_on="id")
+    return df[["invoice_id", "email", "plan_interval", "name", "unit_amount", "type", "card"]]
+
+
+def indexed_join(t: dict) -> pd.DataFrame:
+    df, _orphans = join_dimensions(t["invoices"], [
+        Lookup("customer_id", t["customers"], {"email": "email"}),
+        Lookup("subscription_id", t["subscriptions"], {"plan_interval": "plan_interval"}),
+        Lookup("product_id", t["products"], {"name": "name"}),
+        Lookup("price_id", t["prices"], {"unit_amount": "unit_amount"}),
+        Lookup("default_payment_method_id", t["payment_methods"], {"type": "type", "card": "card"}, how="left"),
+    ], table="bench")
+    return df[["invoice_id", "email", "plan_interval", "name", "unit_amount", "type", "card"]]
+
+
+def peak_memory(func, tables) -> int:
+    tracemalloc.start()
+    func(tables)
+    _current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak
+
+
+def main(n: int = 500_000, repeat: int = 5):
+    tables = make_tables(n)
+    pd.testing.assert_frame_equal(legacy_join(tables), indexed_join(tables), check_dtype=False)
+
+    legacy = min(timeit.repeat(lambda: legacy_join(tables), number=1, repeat=repeat))
+    indexed = min(timeit.repeat(lambda: indexed_join(tables), number=1, repeat=repeat))
+    legacy_mem, indexed_mem = peak_memory(legacy_join, tables), peak_memory(indexed_join, tables)
+
+    print(f"📊 {n} invoices (best of {repeat})")
+    print(f"   5 chained merges : {legacy:.3f}s, peak {legacy_mem / 1024 ** 2:.1f} MiB")
+    print(f"   id index + take  : {indexed:.3f}s, peak {indexed_mem / 1024 ** 2:.1f} MiB")
+    print(f"   speedup          : x{legacy / indexed:.2f}, memory x{legacy_mem / indexed_mem:.2f}")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 500_000)
@@ -0,0 +1,57 @@
+"""
+Micro-benchmark : extraction des champs de lines.data[0] dans build_fact_invoices.
+
+Compare les trois `.apply(lambda ...)` historiques (qui lèvent sur un chemin manquant) à l'extracteur en une passe.
+Usage : python -m benchmarks.bench_line_items [nb_factures]
+"""
+import sys
+import copy
+import json
+import timeit
+from pathlib import Path
+
+import pandas as pd
+
+from scripts.csv_builders import LINE_ITEM_PATHS
+from scripts.flatten_utils import extract_paths
+
+DUMP_FILE = next((Path(__file__).parent.parent / "tests" / "data" / "oltp_dump").glob("db_dump_prod_*.json"))
+
+
+def make_lines(n: int) -> pd.Series:
+    template = json.loads(DUMP_FILE.read_text())["invoices"][0]["lines"]
+    lines = []
+    for i in range(n):
+        item = copy.deepcopy(template)
+        item["data"][0]["parent"]["subscription_item_details"]["subscription"] = f"sub_{i}"
+        lines.append(item)
+    return pd.Series(lines)
+
+
+def legacy_extract(lines: pd.Series) -> pd.DataFrame:
+    return pd.DataFrame({
+        "subscription_id": lines.apply(lambda x: x["data"][0]["parent"]["subscription_item_details"]["subscription"]),
+        "price_id": lines.apply(lambda x: x["data"][0]["pricing"]["price_details"]["price"]),
+        "product_id": lines.apply(lambda x: x["data"][0]["pricing"]["price_details"]["product"]),
+    })
+
+
+def single_pass_extract(lines: pd.Series) -> pd.DataFrame:
+    return extract_paths(lines, LINE_ITEM_PATHS, prefix=("data", 0))
+
+
+def main(n: int = 200_000, repeat: int = 5):
+    lines = make_lines(n)
+    pd.testing.assert_frame_equal(legacy_extract(lines), single_pass_extract(lines), check_dtype=False)
+
+    legacy = min(timeit.repeat(lambda: legacy_extract(lines), number=1, repeat=repeat))
+    vectorized = min(timeit.repeat(lambda: single_pass_extract(lines), number=1, repeat=repeat))
+
+    print(f"📊 {n} invoices (best of {repeat})")
+    print(f"   legacy 3x apply : {legacy:.3f}s")
+    print(f"   single pass     : {vectorized:.3f}s")
+    print(f"   speedup         : x{legacy / vectorized:.2f}")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 200_000)
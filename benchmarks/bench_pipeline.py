@@ -0,0 +1,169 @@
+"""
+Banc de mesure de l'ETL complet (lecture du dump, builds, écriture des sorties) : flux séquentiel
+actuel, pool de threads (--workers) et pipeline à files bornées (--pipeline).
+
+Le dump et les sorties passent par un stockage local dont le débit peut être bridé (`--bandwidth-mbps`)
+pour simuler le lien vers GCS : sans réseau, lecture et upload ne coûtent presque rien et il n'y a
+rien à recouvrir.
+
+Usage :
+    python -m benchmarks.bench_pipeline --invoices 10k --bandwidth-mbps 20
+    python -m benchmarks.bench_pipeline --invoices 10k --bandwidth-mbps 2 --invoices-last
+    python -m benchmarks.bench_pipeline --invoices 1m --workers 4 --json benchmarks/results/pipeline_1m.json
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import platform
+from pathlib import Path
+from contextlib import contextmanager
+
+import pandas as pd
+
+import scripts.olap_io as olap_io
+from benchmarks.bench_builders import run_benchmark
+from benchmarks.synthetic_dump import parse_scale, write_dump
+from scripts.csv_builders import required_source_tables
+from scripts.etl_to_snowflake import run_pipeline, run_tables
+from scripts.olap_io import OUTPUT_FORMATS, stream_oltp_tables
+from scripts.storage import LocalStorage
+
+TIMESTAMP = "2025-01-01_00-00-00"
+
+
+class SlowLink:
+    """Flux dont chaque lecture / écriture attend len(data) / débit, comme sur le réseau (GIL relâché)."""
+
+    def __init__(self, raw, bytes_per_s: float):
+        self.raw = raw
+        self.bytes_per_s = bytes_per_s
+
+    def _wait(self, n: int):
+        if self.bytes_per_s:
+            time.sleep(n / self.bytes_per_s)
+
+    def read(self, n: int = -1) -> bytes:
+        data = self.raw.read(n)
+        self._wait(len(data))
+        return data
+
+    def write(self, data) -> int:
+        self._wait(len(data))
+        return self.raw.write(data)
+
+    def __getattr__(self, name):
+        return getattr(self.raw, name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.raw.close()
+
+
+class SlowLinkStorage(LocalStorage):
+    """Stockage local dont les lectures et écritures de fichiers sont bridées à `bytes_per_s`."""
+
+    def __init__(self, root, bytes_per_s: float):
+        super().__init__(root)
+        self.bytes_per_s = bytes_per_s
+
+    def open_read(self, name: str, chunk_size: int = None):
+        return SlowLink(super().open_read(name, chunk_size), self.bytes_per_s)
+
+    @contextmanager
+    def open_write(self, name: str, content_type: str = None, chunk_size: int = None):
+        with super().open_write(name, content_type, chunk_size) as out:
+            yield SlowLink(out, self.bytes_per_s)
+
+
+@contextmanager
+def outputs_to(store):
+    """Sorties écrites comme en PROD, dans `store`."""
+    env, get_storage = olap_io.ENV, olap_io.get_storage
+    olap_io.ENV, olap_io.get_storage = "PROD", lambda bucket_name: store
+    try:
+        yield
+    finally:
+        olap_io.ENV, olap_io.get_storage = env, get_storage
+
+
+def benchmark_targets(store, dump_name: str, fmt: str, workers: int) -> dict:
+    """Le même run complet par les trois chemins ; chaque cible renvoie le nombre de lignes écrites."""
+    def open_dump():
+        return store.open_read(dump_name)
+
+    def read_then_run(n_workers: int):
+        with open_dump() as fileobj:
+            raw = dict(stream_oltp_tables(fileobj, tables=required_source_tables()))
+        return sum(r["rows"] for r in run_tables(raw, TIMESTAMP, fmt, workers=n_workers))
+
+    return {
+        "serial": lambda: read_then_run(1),
+        f"threads[{workers}]": lambda: read_then_run(workers),
+        f"pipeline[{workers}]": lambda: sum(
+            r["rows"] for r in run_pipeline(open_dump, TIMESTAMP, fmt, build_workers=workers, upload_workers=workers)
+        ),
+    }
+
+
+def print_results(results: list, n_invoices: int, fmt: str, bandwidth: float):
+    link = f"{bandwidth:g} MB/s link" if bandwidth else "no link limit"
+    print(f"📊 ETL pipeline benchmark, {n_invoices} invoices ({fmt}, {link})")
+    header = f"   {'name':<22}{'min (s)':>10}{'mean (s)':>10}{'stddev':>10}{'rounds':>8}{'speedup':>10}"
+    print(header)
+    print("   " + "-" * (len(header) - 3))
+    serial = results[0]["stats"]["min"]
+    for r in results:
+        s = r["stats"]
+        print(f"   {r['name']:<22}{s['min']:>10.3f}{s['mean']:>10.3f}{s['stddev']:>10.3f}{s['rounds']:>8}"
+              f"{serial / s['min']:>9.2f}x")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare the serial ETL with the overlapped read/build/upload pipeline.")
+    parser.add_argument("--invoices", default="10k", help="Number of invoices or a scale: 10k, 1m, 10m.")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--format", choices=OUTPUT_FORMATS, default="csv")
+    parser.add_argument("--workers", type=int, default=2, help="Threads per stage (and size of the thread pool).")
+    parser.add_argument("--bandwidth-mbps", type=float, default=20.0,
+                        help="Simulated storage link in MB/s for reads and writes (0 = unlimited).")
+    parser.add_argument("--invoices-last", action="store_true",
+                        help="Write every other table before invoices in the dump (sources read first).")
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--json", help="Save results to this JSON file.")
+    args = parser.parse_args(argv)
+
+    n_invoices = parse_scale(args.invoices)
+    with tempfile.TemporaryDirectory(dir=os.getenv("TMPDIR")) as tmp:
+        store = SlowLinkStorage(Path(tmp) / "bucket", args.bandwidth_mbps * 1e6)
+        dump_name = "dump/db_dump_prod_synthetic.json"
+        (store.root / "dump").mkdir(parents=True)
+        write_dump(store.root / dump_name, n_invoices, args.seed, invoices_last=args.invoices_last)
+
+        with outputs_to(store):
+            targets = benchmark_targets(store, dump_name, args.format, args.workers)
+            results = [run_benchmark(name, func, args.rounds) for name, func in targets.items()]
+    print_results(results, n_invoices, args.format, args.bandwidth_mbps)
+
+    if args.json:
+        report = {
+            "machine_info": {"python": platform.python_version(), "machine": platform.machine(),
+                             "system": platform.system(), "pandas": pd.__version__},
+            "invoices": n_invoices,
+            "format": args.format,
+            "bandwidth_mbps": args.bandwidth_mbps,
+            "invoices_last": args.invoices_last,
+            "benchmarks": results,
+        }
+        Path(args.json).parent.mkdir(parents=True, exist_ok=True)
+        Path(args.json).write_text(json.dumps(report, indent=2))
+        print(f"💾 Results saved to {args.json}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
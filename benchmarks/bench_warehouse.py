@@ -0,0 +1,118 @@
+"""
+Banc de mesure de bout en bout sur l'entrepôt local DuckDB : chargement des sorties OLAP par les
+scripts générés (create_tables.sql + COPY INTO) puis latence des vues analytiques.
+
+Les tables sont construites depuis un dump synthétique et écrites dans un stage local ; le chargement
+passe par le même chemin que `load_to_snowflake --backend duckdb` (run_script, run_load_script).
+
+Usage :
+    python -m benchmarks.bench_warehouse --invoices 10k --format parquet
+    python -m benchmarks.bench_warehouse --invoices 1m --json benchmarks/results/warehouse_1m.json
+"""
+import os
+import sys
+import json
+import argparse
+import tempfile
+import platform
+from pathlib import Path
+
+import pandas as pd
+
+from benchmarks.bench_builders import load_dump, run_benchmark
+from benchmarks.synthetic_dump import parse_scale
+from scripts.csv_builders import BUILDERS, TABLE_SCHEMAS
+from scripts.duckdb_warehouse import connect_to_duckdb
+from scripts.generate_copy_into_sql import generate_copy_into_sql
+from scripts.load_to_snowflake import run_load_script
+from scripts.olap_io import OUTPUT_FORMATS, write_table
+from scripts.rollups import ROLLUPS, build_rollup
+from scripts.sql_runner import run_script
+
+VIEWS = ("vw_monthly_revenue", "vw_customer_ltv", "vw_mrr_by_interval", "vw_active_subscriptions")
+
+
+def write_stage(raw: dict, stage_dir: Path, fmt: str) -> int:
+    """Écrit chaque table dans le stage local (<table>.<fmt>) ; renvoie le nombre total de lignes."""
+    stage_dir.mkdir(parents=True, exist_ok=True)
+    rows = 0
+    for name, builder in BUILDERS.items():
+        df = builder(raw)
+        write_table(df, stage_dir / f"{name}.{fmt}", name, fmt)
+        rows += len(df)
+        if name == "fact_invoices":
+            for rollup in ROLLUPS:
+                agg = build_rollup(rollup, df)
+                write_table(agg, stage_dir / f"{rollup}.{fmt}", rollup, fmt)
+                rows += len(agg)
+    return rows
+
+
+def benchmark_targets(conn, stage_dir: Path, copy_script: Path, rows: int) -> dict:
+    """Chargement complet (tables recréées à chaque tour) puis une requête par vue."""
+    def full_load():
+        run_script(conn, "scripts/sql/create_tables.sql")
+        run_script(conn, "scripts/sql/create_stage.sql", {"BUCKET": "bench", "OLAP_PATH": ""})
+        run_load_script(str(copy_script), conn, {})
+        return rows
+
+    targets = {"load[all tables]": full_load}
+    for view in VIEWS:
+        targets[f"query[{view}]"] = lambda view=view: len(conn.db.execute(f"SELECT * FROM {view}").fetchall())
+    return targets
+
+
+def print_results(results: list, n_invoices: int, fmt: str):
+    print(f"📊 DuckDB warehouse benchmark, {n_invoices} invoices ({fmt})")
+    header = f"   {'name':<34}{'min (s)':>10}{'mean (s)':>10}{'stddev':>10}{'rounds':>8}{'rows/s':>14}"
+    print(header)
+    print("   " + "-" * (len(header) - 3))
+    for r in results:
+        s = r["stats"]
+        print(f"   {r['name']:<34}{s['min']:>10.3f}{s['mean']:>10.3f}{s['stddev']:>10.3f}{s['rounds']:>8}"
+              f"{r['rows_per_s'] or 0:>14,.0f}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark loads and analytics views on the local DuckDB warehouse.")
+    parser.add_argument("--invoices", default="10k", help="Number of invoices or a scale: 10k, 1m, 10m.")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--dump", help="Read this dump file instead of generating one in memory.")
+    parser.add_argument("--format", choices=OUTPUT_FORMATS, default="parquet")
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--json", help="Save results to this JSON file.")
+    args = parser.parse_args(argv)
+
+    raw = load_dump(parse_scale(args.invoices), args.seed, args.dump)
+    n_invoices = len(raw["invoices"])
+
+    with tempfile.TemporaryDirectory(dir=os.getenv("TMPDIR")) as tmp:
+        stage_dir = Path(tmp) / "stage"
+        rows = write_stage(raw, stage_dir, args.format)
+        copy_script = Path(tmp) / "copy_into_tables.sql"
+        copy_script.write_text(generate_copy_into_sql(TABLE_SCHEMAS, fmt=args.format))
+
+        conn = connect_to_duckdb(Path(tmp) / "bench.duckdb", stage_root=stage_dir)
+        for script in ("setup_snowflake_infra.sql", "create_tables.sql", "view_for_analytics.sql"):
+            run_script(conn, f"scripts/sql/{script}", skip_current=False)
+        targets = benchmark_targets(conn, stage_dir, copy_script, rows)
+        results = [run_benchmark(name, func, args.rounds) for name, func in targets.items()]
+        conn.close()
+    print_results(results, n_invoices, args.format)
+
+    if args.json:
+        report = {
+            "machine_info": {"python": platform.python_version(), "machine": platform.machine(),
+                             "system": platform.system(), "pandas": pd.__version__},
+            "invoices": n_invoices,
+            "format": args.format,
+            "benchmarks": results,
+        }
+        Path(args.json).parent.mkdir(parents=True, exist_ok=True)
+        Path(args.json).write_text(json.dumps(report, indent=2))
+        print(f"💾 Results saved to {args.json}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,237 @@
+"""
+Générateur de dump Stripe synthétique, reproductible (graine), pour mesurer les builders à l'échelle.
+
+Les objets reprennent la forme du dump de production pour les champs lus par l'ETL :
+invoices.lines (plusieurs line items imbriqués), subscriptions.items, prices.recurring (JSON texte)
+et payment_methods.card. Les tables sont produites enregistrement par enregistrement, le fichier est
+écrit en flux : 10M de factures ne sont jamais en mémoire d'un bloc.
+
+Usage : python -m benchmarks.synthetic_dump --invoices 1m --out /tmp/db_dump_prod_synthetic.json
+"""
+import json
+import random
+import argparse
+from datetime import datetime, timedelta, timezone
+
+SCALES = {"10k": 10_000, "1m": 1_000_000, "10m": 10_000_000}
+
+N_PRODUCTS = 20
+PRICES_PER_PRODUCT = 3
+CURRENCIES = ["eur", "usd", "gbp"]
+INTERVALS = ["month", "year"]
+CARD_BRANDS = ["visa", "mastercard", "amex"]
+INVOICE_STATUSES = ["paid", "paid", "paid", "open", "void"]
+SUBSCRIPTION_STATUSES = ["active", "active", "canceled", "past_due"]
+
+EPOCH = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+
+def parse_scale(value: str) -> int:
+    return SCALES.get(value.lower()) or int(value)
+
+
+def table_sizes(n_invoices: int) -> dict:
+    """Cardinalités dérivées du nombre de factures (ratios proches du compte de démo)."""
+    n_customers = max(n_invoices // 10, 1)
+    return {
+        "customers": n_customers,
+        "invoices": n_invoices,
+        "charges": n_invoices,
+        "payment_intents": n_invoices,
+        "payment_methods": n_customers,
+        "prices": N_PRODUCTS * PRICES_PER_PRODUCT,
+        "products": N_PRODUCTS,
+        "subscriptions": max(n_invoices // 5, 1),
+    }
+
+
+def _ts(seconds: int) -> str:
+    return (EPOCH + timedelta(seconds=seconds)).strftime("%Y-%m-%d %H:%M:%S")
+
+
+def _price(j: int) -> dict:
+    return {"product": f"prod_{j // PRICES_PER_PRODUCT:014d}", "amount": 500 * (j % 7 + 1),
+            "interval": INTERVALS[j % 2], "currency": CURRENCIES[j % len(CURRENCIES)]}
+
+
+def _subscription_price(k: int) -> int:
+    return k % (N_PRODUCTS * PRICES_PER_PRODUCT)
+
+
+def iter_products(sizes: dict, rng: random.Random):
+    for j in range(sizes["products"]):
+        created = rng.randrange(0, 86_400 * 30)
+        yield {
+            "id": f"prod_{j:014d}", "name": f"Plan {j}", "description": f"Synthetic plan {j}",
+            "active": j % 5 != 0, "livemode": False, "created": _ts(created),
+            "updated": _ts(created + rng.randrange(0, 86_400 * 300)), "images": [],
+            "stripe_metadata": {"tag": f"plan_{j}"},
+        }
+
+
+def iter_prices(sizes: dict, rng: random.Random):
+    for j in range(sizes["prices"]):
+        p = _price(j)
+        recurring = {"interval": p["interval"], "interval_count": 1, "meter": None,
+                     "trial_period_days": None, "usage_type": "licensed"}
+        yield {
+            "id": f"price_{j:014d}", "active": True, "currency": p["currency"], "billing_scheme": "per_unit",
+            "type": "recurring", "unit_amount": p["amount"], "unit_amount_decimal": str(p["amount"]),
+            "product_id": p["product"], "recurring": json.dumps(recurring), "livemode": False,
+            "created": _ts(rng.randrange(0, 86_400 * 30)), "nickname": None, "stripe_metadata": {},
+        }
+
+
+def iter_customers(sizes: dict, rng: random.Random):
+    for c in range(sizes["customers"]):
+        yield {
+            "id": f"cus_{c:014d}", "email": f"customer{c}@example.com", "name": f"Customer {c}",
+            "description": None, "balance": 0, "currency": CURRENCIES[c % len(CURRENCIES)],
+            "delinquent": rng.random() < 0.05, "livemode": False, "deleted": False,
+            "created": _ts(rng.randrange(0, 86_400 * 365)), "invoice_settings": {"footer": None},
+            "default_payment_method_id": f"pm_{c:014d}", "stripe_metadata": {},
+        }
+
+
+def iter_payment_methods(sizes: dict, rng: random.Random):
+    for c in range(sizes["payment_methods"]):
+        brand = rng.choice(CARD_BRANDS)
+        yield {
+            "id": f"pm_{c:014d}", "type": "card", "created": _ts(rng.randrange(0, 86_400 * 365)),
+            "livemode": False, "customer_id": f"cus_{c:014d}", "stripe_metadata": {},
+            "card": {"brand": brand, "last4": f"{rng.randrange(10_000):04d}", "country": "FR",
+                     "funding": "credit", "exp_year": 2030, "exp_month": rng.randrange(1, 13),
+                     "display_brand": brand, "checks": {"cvc_check": "pass"}},
+        }
+
+
+def iter_subscriptions(sizes: dict, rng: random.Random):
+    for k in range(sizes["subscriptions"]):
+        j = _subscription_price(k)
+        p = _price(j)
+        created = rng.randrange(0, 86_400 * 365)
+        status = rng.choice(SUBSCRIPTION_STATUSES)
+        yield {
+            "id": f"sub_{k:014d}", "status": status, "currency": p["currency"],
+            "customer_id": f"cus_{k % sizes['customers']:014d}", "price_id": f"price_{j:014d}",
+            "start_date": _ts(created), "created": _ts(created),
+            "cancel_at": _ts(created + 86_400 * 60) if status == "canceled" else None,
+            "ended_at": _ts(created + 86_400 * 60) if status == "canceled" else None,
+            "plan_interval": p["interval"], "livemode": False, "stripe_metadata": {},
+            "items": {"data": [{
+                "id": f"si_{k:014d}", "object": "subscription_item", "quantity": 1,
+                "price": {"id": f"price_{j:014d}", "product": p["product"], "unit_amount": p["amount"],
+                          "currency": p["currency"], "recurring": {"interval": p["interval"], "interval_count": 1}},
+            }], "has_more": False, "url": f"/v1/subscription_items?subscription=sub_{k:014d}"},
+        }
+
+
+def _line_item(i: int, n: int, k: int, amount: int, period_start: int) -> dict:
+    j = _subscription_price(k)
+    p = _price(j)
+    return {
+        "id": f"il_{i:014d}_{n}", "object": "line_item", "amount": amount, "currency": p["currency"],
+        "quantity": 1, "description": f"1 × Plan {j // PRICES_PER_PRODUCT}",
+        "invoice": f"in_{i:014d}", "taxes": [],
+        "period": {"start": period_start, "end": period_start + 86_400 * 30},
+        "parent": {"type": "subscription_item_details", "subscription_item_details": {
+            "proration": n > 0, "subscription": f"sub_{k:014d}", "subscription_item": f"si_{k:014d}",
+        }},
+        "pricing": {"type": "price_details", "price_details": {"price": f"price_{j:014d}", "product": p["product"]}},
+    }
+
+
+def iter_invoices(sizes: dict, rng: random.Random):
+    for i in range(sizes["invoices"]):
+        k = rng.randrange(sizes["subscriptions"])
+        customer = k % sizes["customers"]
+        created = rng.randrange(0, 86_400 * 365)
+        amounts = [_price(_subscription_price(k))["amount"]] + [rng.randrange(-500, 500)
+                                                               for _ in range(rng.choice((0, 0, 0, 1, 2)))]
+        lines = [_line_item(i, n, k, amount, int(EPOCH.timestamp()) + created) for n, amount in enumerate(amounts)]
+        yield {
+            "id": f"in_{i:014d}", "customer_id": f"cus_{customer:014d}", "status": rng.choice(INVOICE_STATUSES),
+            "billing_reason": "subscription_cycle", "currency": lines[0]["currency"],
+            "amount_due": sum(amounts), "amount_paid": sum(amounts), "total": sum(amounts),
+            "created": _ts(created), "period_start": _ts(created), "period_end": _ts(created + 86_400 * 30),
+            "livemode": False, "number": f"SYN-{i:08d}", "receipt_number": f"{i % 10_000:04d}-{i // 10_000:04d}",
+            "default_payment_method_id": f"pm_{customer:014d}" if rng.random() < 0.9 else None,
+            "stripe_metadata": {},
+            "lines": {"url": f"/v1/invoices/in_{i:014d}/lines", "object": "list", "has_more": False,
+                      "total_count": len(lines), "data": lines},
+        }
+
+
+def iter_payment_intents(sizes: dict, rng: random.Random):
+    for i in range(sizes["payment_intents"]):
+        yield {
+            "id": f"pi_{i:014d}", "status": "succeeded", "currency": CURRENCIES[i % len(CURRENCIES)],
+            "amount": rng.randrange(500, 5_000), "created": _ts(rng.randrange(0, 86_400 * 365)),
+            "livemode": False, "customer_id": f"cus_{i % sizes['customers']:014d}",
+            "payment_method": f"pm_{i % sizes['customers']:014d}", "invoice": f"in_{i:014d}",
+        }
+
+
+def iter_charges(sizes: dict, rng: random.Random):
+    for i in range(sizes["charges"]):
+        yield {
+            "id": f"ch_{i:014d}", "amount": rng.randrange(500, 5_000), "currency": CURRENCIES[i % len(CURRENCIES)],
+            "status": "succeeded", "paid": True, "created": _ts(rng.randrange(0, 86_400 * 365)),
+            "livemode": False, "payment_intent": f"pi_{i:014d}", "customer_id": f"cus_{i % sizes['customers']:014d}",
+        }
+
+
+TABLE_GENERATORS = {
+    "customers": iter_customers,
+    "invoices": iter_invoices,
+    "charges": iter_charges,
+    "payment_intents": iter_payment_intents,
+    "payment_methods": iter_payment_methods,
+    "prices": iter_prices,
+    "products": iter_products,
+    "subscriptions": iter_subscriptions,
+}
+
+
+def iter_tables(n_invoices: int, seed: int = 42):
+    """(table, itérateur d'enregistrements) ; chaque table a sa propre graine, indépendante de l'ordre de lecture."""
+    sizes = table_sizes(n_invoices)
+    for offset, (table, generator) in enumerate(TABLE_GENERATORS.items()):
+        yield table, generator(sizes, random.Random(seed * 1_000 + offset))
+
+
+def generate_dump(n_invoices: int, seed: int = 42) -> dict:
+    """Dump complet en mémoire, même forme que load_latest_oltp_json_from_gcs (petites échelles)."""
+    return {table: list(records) for table, records in iter_tables(n_invoices, seed)}
+
+
+def write_dump(path, n_invoices: int, seed: int = 42, invoices_last: bool = False):
+    """Écrit le dump JSON en flux, table par table (`invoices_last` : les autres tables d'abord)."""
+    tables = iter_tables(n_invoices, seed)
+    if invoices_last:
+        tables = sorted(tables, key=lambda item: item[0] == "invoices")
+    with open(path, "w") as f:
+        f.write("{")
+        for t, (table, records) in enumerate(tables):
+            f.write(f'{", " if t else ""}{json.dumps(table)}: [')
+            for r, record in enumerate(records):
+                f.write(", " if r else "")
+                f.write(json.dumps(record))
+            f.write("]")
+        f.write("}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Write a seeded synthetic Stripe dump.")
+    parser.add_argument("--invoices", default="10k", help=f"Number of invoices or a scale: {', '.join(SCALES)}.")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--out", default="db_dump_prod_synthetic.json")
+    args = parser.parse_args()
+    n = parse_scale(args.invoices)
+    print(f"🧪 Writing synthetic dump with {n} invoices to {args.out}...")
+    write_dump(args.out, n, args.seed)
+    print("✅ Synthetic dump written.")
+
+
+if __name__ == "__main__":
+    main()
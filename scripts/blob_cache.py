@@ -0,0 +1,92 @@
+import os
+import hashlib
+import threading
+from pathlib import Path
+
+from dotenv import load_dotenv
+
+# This module keeps downloaded blobs (dumps, OLAP outputs) on local disk between runs and test sessions.
+
+load_dotenv()
+
+BLOB_CACHE_ENABLED = os.getenv("BLOB_CACHE", "1") == "1"
+BLOB_CACHE_DIR = os.getenv("BLOB_CACHE_DIR", ".cache/blobs")
+BLOB_CACHE_MAX_BYTES = int(os.getenv("BLOB_CACHE_MAX_BYTES", str(2 * 1024 ** 3)))
+
+_CACHE = None
+_CACHE_LOCK = threading.Lock()
+
+
+class BlobCache:
+    """
+    Cache disque indexé par (nom du blob, génération ou md5) : un blob réécrit change de clé.
+    L'éviction est LRU sur la taille totale ; la date de dernier accès est portée par le mtime.
+    """
+
+    def __init__(self, root=BLOB_CACHE_DIR, max_bytes: int = BLOB_CACHE_MAX_BYTES):
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(info) -> str:
+        version = info.generation or info.md5_hash or f"{info.updated}-{info.size}"
+        digest = hashlib.sha256(f"{info.name}@{version}".encode()).hexdigest()[:32]
+        return f"{digest}-{Path(info.name).name}"
+
+    def path_for(self, info) -> Path:
+        return self.root / self.key(info)
+
+    def fetch(self, store, info) -> Path:
+        """Chemin local du blob `info`, téléchargé depuis `store` seulement en cas de miss."""
+        path = self.path_for(info)
+        if path.exists():
+            os.utime(path)
+            with self._lock:
+                self.hits += 1
+            print(f"🗃 Cache hit: {info.name} ({self.summary()})")
+            return path
+
+        self.root.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        try:
+            store.download_to(info.name, tmp_path)
+            tmp_path.replace(path)
+        finally:
+            tmp_path.unlink(missing_ok=True)
+        with self._lock:
+            self.misses += 1
+        print(f"🗃 Cache miss: {info.name} downloaded ({self.summary()})")
+        self.evict(keep=path)
+        return path
+
+    def evict(self, keep: Path = None):
+        entries = [p for p in self.root.glob("*") if p.is_file() and not p.name.endswith(".tmp")]
+        total = sum(p.stat().st_size for p in entries)
+        for p in sorted(entries, key=lambda p: p.stat().st_mtime):
+            if total <= self.max_bytes:
+                break
+            if p == keep:
+                continue
+            total -= p.stat().st_size
+            p.unlink(missing_ok=True)
+            with self._lock:
+                self.evictions += 1
+            print(f"🧹 Cache evicted: {p.name}")
+
+    def summary(self) -> str:
+        return f"hits={self.hits}, misses={self.misses}, evictions={self.evictions}"
+
+
+def get_blob_cache():
+    """Cache partagé du process, ou None si BLOB_CACHE=0."""
+    global _CACHE
+    if not BLOB_CACHE_ENABLED:
+        return None
+    with _CACHE_LOCK:
+        if _CACHE is None:
+            _CACHE = BlobCache()
+        return _CACHE
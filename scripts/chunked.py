@@ -0,0 +1,151 @@
+import os
+import time
+from collections import defaultdict
+
+import pandas as pd
+from dotenv import load_dotenv
+
+from scripts.csv_builders import (
+    BUILDERS,
+    FACT_INVOICE_DIMENSIONS,
+    TABLE_SCHEMAS,
+    compact_dtypes,
+    memory_usage_mb,
+)
+from scripts.join_utils import IdIndex
+from scripts.metrics import stage
+from scripts.olap_io import iter_json_dump, output_target, save_part
+from scripts.rollups import ROLLUPS, build_rollup, combine_rollups, rollups_of
+
+# This module implements the chunked (out-of-core) ETL mode: bounded batches in, part files out.
+
+load_dotenv()
+
+ETL_CHUNK_SIZE = int(os.getenv("ETL_CHUNK_SIZE", "50000"))
+
+# Builders ligne à ligne : chaque lot de la table source donne un lot de la table de sortie
+ROW_BUILDERS = {
+    "customers": ["dim_customers"],
+    "products": ["dim_products"],
+    "prices": ["dim_prices"],
+    "payment_methods": ["dim_payment_methods"],
+    "subscriptions": ["dim_subscriptions"],
+    "payment_intents": ["dim_payment_intents"],
+    "charges": ["dim_charges"],
+}
+
+
+def iter_batches(records, size: int):
+    """Regroupe un itérateur d'enregistrements en listes d'au plus `size` éléments."""
+    batch = []
+    for record in records:
+        batch.append(record)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+class PartWriter:
+    """Écrit les lots d'une table en part files numérotés et cumule ses métriques."""
+
+    def __init__(self, name: str, timestamp: str, fmt: str, prefix: str = "olap_outputs/"):
+        self.name = name
+        self.timestamp = timestamp
+        self.fmt = fmt
+        self.prefix = prefix
+        self.parts = 0
+        self.result = {"table": name, "rows": 0, "mem_mb": 0.0, "watermark": None, "build_s": 0.0, "save_s": 0.0,
+                       "files": []}
+
+    def build_and_write(self, builder, data: dict, *args):
+        start = time.perf_counter()
+        with stage("build", table=self.name, part=self.parts) as record:
+            df = builder(data, *args)
+            record["rows_in"] = sum(len(rows) for rows in data.values())
+            record["rows_out"] = len(df)
+        self.result["build_s"] += time.perf_counter() - start
+        self.write(df)
+        return df
+
+    def write(self, df: pd.DataFrame):
+        start = time.perf_counter()
+        path = save_part(df, self.name, self.parts, self.timestamp, self.fmt, self.prefix)
+        _, folder = output_target(self.timestamp, self.prefix)
+        self.result["files"].append(path[len(folder):])
+        self.parts += 1
+        self.result["rows"] += len(df)
+        # Pic par lot : c'est lui qui borne la mémoire en mode chunked
+        self.result["mem_mb"] = max(self.result["mem_mb"], memory_usage_mb(df))
+        self.result["save_s"] += time.perf_counter() - start
+
+    def close(self) -> dict:
+        # Une table vide est quand même écrite (en-tête seul) pour que COPY et les lectures la trouvent
+        if self.parts == 0:
+            self.write(compact_dtypes(pd.DataFrame(columns=list(TABLE_SCHEMAS[self.name])), self.name))
+        return self.result
+
+
+def _dimension_index(frames: list, table: str) -> IdIndex:
+    columns = FACT_INVOICE_DIMENSIONS[table]
+    return IdIndex(pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=columns))
+
+
+def run_chunked(open_dump, timestamp: str, fmt: str, chunk_size: int = ETL_CHUNK_SIZE,
+                prefix: str = "olap_outputs/") -> list:
+    """
+    Construit toutes les tables par lots de `chunk_size` enregistrements, sans matérialiser le dump.
+    `open_dump` renvoie un nouveau flux du dump à chaque appel ; il est lu deux fois :
+    - passe 1 : dimensions et tables ligne à ligne écrites par lots ; on garde en mémoire les index d'ids
+      (colonnes de FACT_INVOICE_DIMENSIONS) et les pages `invoice_lines`, petits devant les factures ;
+    - passe 2 : factures par lots, jointes aux index (les dimensions peuvent suivre les factures dans le dump).
+    Les tables agrégées sont cumulées lot par lot (agrégats partiels, petits) et écrites à la fin.
+    La mémoire est bornée par un lot, plus les index de dimensions.
+    """
+    writers = {name: PartWriter(name, timestamp, fmt, prefix) for name in [*BUILDERS, *ROLLUPS]}
+    partials = defaultdict(list)
+    dimension_frames = defaultdict(list)
+    lines_by_invoice = defaultdict(list)
+
+    print(f"🧱 Chunked mode: batches of {chunk_size} records")
+    with open_dump() as fileobj:
+        for table, records in iter_json_dump(fileobj):
+            if table == "invoice_lines":
+                for line in records:
+                    lines_by_invoice[line.get("invoice")].append(line)
+                continue
+            outputs = ROW_BUILDERS.get(table, [])
+            if not outputs and table not in FACT_INVOICE_DIMENSIONS:
+                continue
+            for batch in iter_batches(records, chunk_size):
+                for name in outputs:
+                    writers[name].build_and_write(BUILDERS[name], {table: batch})
+                if table in FACT_INVOICE_DIMENSIONS:
+                    dimension_frames[table].append(pd.DataFrame(batch, columns=FACT_INVOICE_DIMENSIONS[table]))
+
+    indexes = {table: _dimension_index(dimension_frames.pop(table, []), table) for table in FACT_INVOICE_DIMENSIONS}
+
+    with open_dump() as fileobj:
+        for table, records in iter_json_dump(fileobj):
+            if table != "invoices":
+                continue
+            for batch in iter_batches(records, chunk_size):
+                fact = writers["fact_invoices"].build_and_write(BUILDERS["fact_invoices"], {"invoices": batch}, indexes)
+                for name in rollups_of("fact_invoices"):
+                    partials[name].append(build_rollup(name, fact))
+                extra = [
+                    line for invoice in batch if (invoice.get("lines") or {}).get("has_more")
+                    for line in lines_by_invoice.get(invoice.get("id"), [])
+                ]
+                writers["fact_invoice_lines"].build_and_write(
+                    BUILDERS["fact_invoice_lines"], {"invoices": batch, "invoice_lines": extra}
+                )
+            break
+
+    for name in ROLLUPS:
+        with stage("build", table=name) as record:
+            rollup = combine_rollups(name, partials.pop(name, []))
+            record["rows_out"] = len(rollup)
+        writers[name].write(rollup)
+    return [writers[name].close() for name in writers]
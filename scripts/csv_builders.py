@@ -1,64 +1,136 @@
+import functools
 import pandas as pd
-from scripts.flatten_utils import apply_flatten_if_needed
+from scripts.flatten_utils import apply_flatten_if_needed, extract_paths
+from scripts.join_utils import IdIndex, Lookup, join_dimensions
 
 # This module contains functions to build fact invoices and dimension tables from a JSON dump of Stripe data.
 
-### Fact Table Builder
-def build_fact_invoices(data):
+# Champs lus sur la première ligne de facture (lines.data[0])
+LINE_ITEM_PATHS = {
+    "subscription_id": ("parent", "subscription_item_details", "subscription"),
+    "price_id": ("pricing", "price_details", "price"),
+    "product_id": ("pricing", "price_details", "product"),
+}
+
+# Champs lus sur chaque ligne de facture de fact_invoice_lines
+INVOICE_LINE_PATHS = {
+    "line_item_id": ("id",),
+    "subscription_id": ("parent", "subscription_item_details", "subscription"),
+    "subscription_item_id": ("parent", "subscription_item_details", "subscription_item"),
+    "price_id": ("pricing", "price_details", "price"),
+    "product_id": ("pricing", "price_details", "product"),
+    "amount": ("amount",),
+    "line_currency": ("currency",),
+    "quantity": ("quantity",),
+    "proration": ("parent", "subscription_item_details", "proration"),
+    "period_start": ("period", "start"),
+    "period_end": ("period", "end"),
+    "description": ("description",),
+}
+
+### Fact Table Builders
+def typed_table(name: str):
+    """Applique compact_dtypes(name) à la sortie du builder décoré."""
+    def decorator(builder):
+        @functools.wraps(builder)
+        def wrapper(data, *args, **kwargs):
+            return compact_dtypes(builder(data, *args, **kwargs), name)
+        return wrapper
+    return decorator
+
+# Colonnes des dimensions jointes par fact_invoices
+FACT_INVOICE_DIMENSIONS = {
+    "customers": ["id", "email"],
+    "subscriptions": ["id", "plan_interval"],
+    "products": ["id", "name"],
+    "prices": ["id", "unit_amount"],
+    "payment_methods": ["id", "type", "card"],
+}
+
+def fact_invoice_indexes(data: dict) -> dict:
+    """Index d'ids des dimensions jointes par fact_invoices (construits une fois, réutilisables par lot)."""
+    return {
+        table: IdIndex(pd.DataFrame(data.get(table, []), columns=columns))
+        for table, columns in FACT_INVOICE_DIMENSIONS.items()
+    }
+
+@typed_table("fact_invoices")
+def build_fact_invoices(data, indexes: dict = None):
     invoices = pd.DataFrame(data["invoices"])
-    customers = pd.DataFrame(data["customers"])
-    subscriptions = pd.DataFrame(data["subscriptions"])
-    products = pd.DataFrame(data["products"])
-    prices = pd.DataFrame(data["prices"])
-    payment_methods = pd.DataFrame(data["payment_methods"])
+    indexes = indexes or fact_invoice_indexes(data)
 
     invoices["invoice_id"] = invoices["id"]
-    invoices["subscription_id"] = invoices["lines"].apply(
-        lambda x: x["data"][0]["parent"]["subscription_item_details"]["subscription"]
-    )
-    invoices["price_id"] = invoices["lines"].apply(
-        lambda x: x["data"][0]["pricing"]["price_details"]["price"]
-    )
-    invoices["product_id"] = invoices["lines"].apply(
-        lambda x: x["data"][0]["pricing"]["price_details"]["product"]
-    )
-
-    df = invoices.merge(customers[["id", "email"]], left_on="customer_id", right_on="id", suffixes=("", "_customer"))
-    df = df.merge(subscriptions[["id", "price_id", "plan_interval"]], left_on="subscription_id", right_on="id", suffixes=("", "_sub"))
-    df = df.merge(products[["id", "name"]], left_on="product_id", right_on="id", suffixes=("", "_product"))
-    df = df.merge(prices[["id", "unit_amount"]], left_on="price_id", right_on="id", suffixes=("", "_price"))
-    df = df.merge(payment_methods[["id", "type", "card"]], how="left", left_on="default_payment_method_id", right_on="id")
-
-    df_final = df[[
-        "invoice_id", "customer_id", "email", "amount_paid", "currency", "status", "created", "period_start",
-        "period_end", "product_id", "name", "price_id", "unit_amount", "plan_interval",
-        "subscription_id", "type", "card", "receipt_number", "livemode"
-    ]].rename(columns={
-        "email": "customer_email",
-        "created": "created_at",
-        "name": "product_name",
-        "unit_amount": "plan_amount",
-        "type": "payment_method_type",
-        "card": "card_info"
-    })
+    invoices[list(LINE_ITEM_PATHS)] = extract_paths(invoices["lines"], LINE_ITEM_PATHS, prefix=("data", 0))
+
+    df, _orphans = join_dimensions(invoices, [
+        Lookup("customer_id", indexes["customers"], {"email": "customer_email"}),
+        Lookup("subscription_id", indexes["subscriptions"], {"plan_interval": "plan_interval"}),
+        Lookup("product_id", indexes["products"], {"name": "product_name"}),
+        Lookup("price_id", indexes["prices"], {"unit_amount": "plan_amount"}),
+        Lookup("default_payment_method_id", indexes["payment_methods"],
+               {"type": "payment_method_type", "card": "card_info"}, how="left"),
+    ], table="fact_invoices")
 
-    df_final["card_brand"] = df_final["card_info"].apply(lambda x: x.get("brand") if isinstance(x, dict) else None)
-    df_final.drop(columns=["card_info"], inplace=True)
+    df_final = df.rename(columns={"created": "created_at"})[[
+        "invoice_id", "customer_id", "customer_email", "amount_paid", "currency", "status", "created_at",
+        "period_start", "period_end", "product_id", "product_name", "price_id", "plan_amount", "plan_interval",
+        "subscription_id", "payment_method_type", "card_info", "receipt_number", "livemode"
+    ]].copy()
+
+    return apply_flatten_if_needed(df_final, "fact_invoices")
+
+@typed_table("fact_invoice_lines")
+def build_fact_invoice_lines(data):
+    """
+    Une ligne par élément de facture (lines.data), et non plus seulement lines.data[0].
+    Si lines.has_more est vrai, les pages suivantes sont lues dans la table `invoice_lines`
+    du dump (objets line_item portant leur champ `invoice`) quand elle est présente.
+    """
+    invoices = pd.DataFrame(data["invoices"])
+    columns = [
+        "line_item_id", "invoice_id", "line_number", "customer_id", "subscription_id", "subscription_item_id",
+        "price_id", "product_id", "amount", "currency", "quantity", "proration",
+        "period_start", "period_end", "description", "created_at", "livemode"
+    ]
+    if invoices.empty:
+        return pd.DataFrame(columns=columns)
 
-    return df_final
+    pages = extract_paths(invoices["lines"], {"items": ("data",), "has_more": ("has_more",)})
+    embedded = invoices[["id"]].assign(line=pages["items"]).explode("line", ignore_index=True)
+    embedded = embedded[embedded["line"].notna()]
+
+    truncated = invoices.loc[pages["has_more"].eq(True).to_numpy(), "id"]
+    extra = pd.DataFrame({"line": data.get("invoice_lines", [])})
+    if not extra.empty:
+        extra["id"] = extract_paths(extra["line"], {"invoice": ("invoice",)})["invoice"]
+        extra = extra[extra["id"].isin(truncated)]
+    missing = set(truncated) - set(extra["id"] if not extra.empty else [])
+    if missing:
+        print(f"⚠️ {len(missing)} invoices have paginated lines (has_more) missing from the dump")
+
+    lines = pd.concat([embedded, extra[["id", "line"]] if not extra.empty else None], ignore_index=True)
+    fields = extract_paths(lines["line"], INVOICE_LINE_PATHS)
+    lines = pd.concat([lines[["id"]], fields], axis=1)
+    lines = lines[~(lines.duplicated(subset=["id", "line_item_id"]) & lines["line_item_id"].notna())]
+    lines["line_number"] = lines.groupby("id").cumcount()
+
+    header = invoices[["id", "customer_id", "currency", "created", "livemode"]]
+    df = lines.merge(header, on="id", how="inner")
+    df["currency"] = df["line_currency"].fillna(df["currency"])
+    df[["amount", "quantity"]] = df[["amount", "quantity"]].astype("Int64")
+    df["period_start"] = pd.to_datetime(df["period_start"], unit="s")
+    df["period_end"] = pd.to_datetime(df["period_end"], unit="s")
+
+    return df.rename(columns={"id": "invoice_id", "created": "created_at"})[columns]
 
 ### Dimension Table Builders
+@typed_table("dim_subscriptions")
 def build_dim_subscriptions(data: dict) -> pd.DataFrame:
     df = pd.DataFrame(data["subscriptions"])
     
     # Flatten first item for now
-    def extract_price_id(sub):
-        try:
-            return sub["items"]["data"][0]["price"]["id"]
-        except:
-            return None
-
-    df["price_id"] = df.apply(extract_price_id, axis=1)
+    items = df["items"] if "items" in df else pd.Series(None, index=df.index, dtype=object)
+    df["price_id"] = extract_paths(items, {"price_id": ("data", 0, "price", "id")})["price_id"]
 
     return df[[
         "id", "customer_id", "price_id", "status", "currency", "start_date",
@@ -68,9 +140,10 @@ def build_dim_subscriptions(data: dict) -> pd.DataFrame:
         "created": "created_at"
     })
 
+@typed_table("dim_payment_methods")
 def build_dim_payment_methods(data: dict) -> pd.DataFrame:
     df = pd.DataFrame(data["payment_methods"])
-    df["card_brand"] = df["card"].apply(lambda x: x.get("brand") if isinstance(x, dict) else None)
+    df = apply_flatten_if_needed(df, "dim_payment_methods")
     return df[[
         "id", "type", "customer_id", "livemode", "created", "card_brand"
     ]].rename(columns={
@@ -78,6 +151,7 @@ def build_dim_payment_methods(data: dict) -> pd.DataFrame:
         "created": "created_at"
     })
 
+@typed_table("dim_prices")
 def build_dim_prices(data: dict) -> pd.DataFrame:
     df = pd.DataFrame(data["prices"])
     df = apply_flatten_if_needed(df, "dim_prices")
@@ -89,6 +163,7 @@ def build_dim_prices(data: dict) -> pd.DataFrame:
         "id": "price_id",
         "created": "created_at"
     })
+@typed_table("dim_products")
 def build_dim_products(data: dict) -> pd.DataFrame:
     df = pd.DataFrame(data["products"])
     return df[["id", "name", "description", "active", "created", "updated"]].rename(columns={
@@ -97,6 +172,7 @@ def build_dim_products(data: dict) -> pd.DataFrame:
         "updated": "updated_at"
     })
 
+@typed_table("dim_customers")
 def build_dim_customers(data: dict) -> pd.DataFrame:
     df = pd.DataFrame(data["customers"])
     return df[["id", "email", "name", "delinquent", "currency", "livemode", "created"]].rename(columns={
@@ -104,6 +180,7 @@ def build_dim_customers(data: dict) -> pd.DataFrame:
         "created": "created_at"
     })
 
+@typed_table("dim_payment_intents")
 def build_dim_payment_intents(raw: dict) -> pd.DataFrame:
     df = pd.DataFrame(raw.get("payment_intents", []))
     if df.empty:
@@ -121,6 +198,7 @@ def build_dim_payment_intents(raw: dict) -> pd.DataFrame:
         "created_at": pd.to_datetime(df["created"])
     })
 
+@typed_table("dim_charges")
 def build_dim_charges(raw: dict) -> pd.DataFrame:
     df = pd.DataFrame(raw.get("charges", []))
     if df.empty:
@@ -138,3 +216,316 @@ def build_dim_charges(raw: dict) -> pd.DataFrame:
         "paid": df["paid"],
         "created_at": pd.to_datetime(df["created"])
     })
+
+### Registry
+# Ordre de construction utilisé par l'ETL (fait puis dimensions)
+BUILDERS = {
+    "fact_invoices": build_fact_invoices,
+    "fact_invoice_lines": build_fact_invoice_lines,
+    "dim_customers": build_dim_customers,
+    "dim_products": build_dim_products,
+    "dim_prices": build_dim_prices,
+    "dim_payment_methods": build_dim_payment_methods,
+    "dim_subscriptions": build_dim_subscriptions,
+    "dim_payment_intents": build_dim_payment_intents,
+    "dim_charges": build_dim_charges,
+}
+
+# Tables du dump lues par chaque builder : seules celles-ci sont matérialisées en streaming
+BUILDER_SOURCES = {
+    "fact_invoices": ["invoices", "customers", "subscriptions", "products", "prices", "payment_methods"],
+    "fact_invoice_lines": ["invoices", "invoice_lines"],
+    "dim_customers": ["customers"],
+    "dim_products": ["products"],
+    "dim_prices": ["prices"],
+    "dim_payment_methods": ["payment_methods"],
+    "dim_subscriptions": ["subscriptions"],
+    "dim_payment_intents": ["payment_intents"],
+    "dim_charges": ["charges"],
+}
+
+# Schéma explicite de chaque table produite (types logiques : string, integer, float, boolean, timestamp)
+TABLE_SCHEMAS = {
+    "fact_invoices": {
+        "invoice_id": "string",
+        "customer_id": "string",
+        "customer_email": "string",
+        "amount_paid": "integer",
+        "currency": "string",
+        "status": "string",
+        "created_at": "timestamp",
+        "period_start": "timestamp",
+        "period_end": "timestamp",
+        "product_id": "string",
+        "product_name": "string",
+        "price_id": "string",
+        "plan_amount": "integer",
+        "plan_interval": "string",
+        "subscription_id": "string",
+        "payment_method_type": "string",
+        "receipt_number": "string",
+        "livemode": "boolean",
+        "card_brand": "string",
+    },
+    "fact_invoice_lines": {
+        "line_item_id": "string",
+        "invoice_id": "string",
+        "line_number": "integer",
+        "customer_id": "string",
+        "subscription_id": "string",
+        "subscription_item_id": "string",
+        "price_id": "string",
+        "product_id": "string",
+        "amount": "integer",
+        "currency": "string",
+        "quantity": "integer",
+        "proration": "boolean",
+        "period_start": "timestamp",
+        "period_end": "timestamp",
+        "description": "string",
+        "created_at": "timestamp",
+        "livemode": "boolean",
+    },
+    "dim_customers": {
+        "customer_id": "string",
+        "email": "string",
+        "name": "string",
+        "delinquent": "boolean",
+        "currency": "string",
+        "livemode": "boolean",
+        "created_at": "timestamp",
+    },
+    "dim_products": {
+        "product_id": "string",
+        "name": "string",
+        "description": "string",
+        "active": "boolean",
+        "created_at": "timestamp",
+        "updated_at": "timestamp",
+    },
+    "dim_prices": {
+        "price_id": "string",
+        "product_id": "string",
+        "currency": "string",
+        "unit_amount": "integer",
+        "type": "string",
+        "billing_scheme": "string",
+        "recurring_interval": "string",
+        "recurring_count": "integer",
+        "recurring_usage_type": "string",
+        "livemode": "boolean",
+        "created_at": "timestamp",
+    },
+    "dim_payment_methods": {
+        "payment_method_id": "string",
+        "type": "string",
+        "customer_id": "string",
+        "livemode": "boolean",
+        "created_at": "timestamp",
+        "card_brand": "string",
+    },
+    "dim_subscriptions": {
+        "subscription_id": "string",
+        "customer_id": "string",
+        "price_id": "string",
+        "status": "string",
+        "currency": "string",
+        "start_date": "timestamp",
+        "created_at": "timestamp",
+        "cancel_at": "timestamp",
+        "ended_at": "timestamp",
+        "plan_interval": "string",
+        "livemode": "boolean",
+    },
+    "dim_payment_intents": {
+        "payment_intent_id": "string",
+        "customer_id": "string",
+        "invoice_id": "string",
+        "status": "string",
+        "amount": "integer",
+        "currency": "string",
+        "created_at": "timestamp",
+    },
+    "dim_charges": {
+        "charge_id": "string",
+        "payment_intent_id": "string",
+        "customer_id": "string",
+        "amount": "integer",
+        "currency": "string",
+        "status": "string",
+        "paid": "boolean",
+        "created_at": "timestamp",
+    },
+    # Tables agrégées maintenues par l'ETL (scripts/rollups.py)
+    "agg_revenue_monthly": {
+        "month": "timestamp",
+        "currency": "string",
+        "product_id": "string",
+        "revenue": "integer",
+        "invoices": "integer",
+    },
+    "agg_customer_ltv": {
+        "customer_id": "string",
+        "currency": "string",
+        "lifetime_value": "integer",
+        "invoices": "integer",
+        "first_invoice_at": "timestamp",
+        "last_invoice_at": "timestamp",
+    },
+    "agg_mrr_monthly": {
+        "month": "timestamp",
+        "plan_interval": "string",
+        "currency": "string",
+        "mrr": "float",
+        "invoices": "integer",
+    },
+}
+
+# Colonnes texte à faible cardinalité (enums Stripe) : stockées en category plutôt qu'en object
+CATEGORY_COLUMNS = {
+    "currency", "status", "plan_interval", "type", "payment_method_type", "card_brand",
+    "billing_scheme", "recurring_interval", "recurring_usage_type",
+}
+
+# dtype pandas de chaque type logique ; les autres colonnes texte (ids, emails, libellés) sont en Arrow
+PANDAS_DTYPES = {
+    "string": "string[pyarrow]",
+    "integer": "Int64",
+    "float": "Float64",
+    "boolean": "boolean",
+}
+
+
+def compact_dtypes(df: pd.DataFrame, name: str) -> pd.DataFrame:
+    """
+    Convertit une table vers son schéma mémoire compact : category pour les enums,
+    string[pyarrow] pour le texte, entiers/booléens nullables, timestamps datetime64[ns, UTC].
+    Les timestamps sans fuseau du dump sont interprétés comme UTC.
+    """
+    df = df.copy()
+    for col, logical_type in TABLE_SCHEMAS[name].items():
+        if col not in df:
+            continue
+        if logical_type == "timestamp":
+            df[col] = pd.to_datetime(df[col], utc=True)
+        elif logical_type == "string" and col in CATEGORY_COLUMNS:
+            df[col] = df[col].astype("category")
+        else:
+            df[col] = df[col].astype(PANDAS_DTYPES[logical_type])
+    return df
+
+
+# Type Snowflake de chaque type logique (DDL générée directement depuis TABLE_SCHEMAS)
+SNOWFLAKE_TYPES = {
+    "string": "STRING",
+    "integer": "NUMBER",
+    "float": "FLOAT",
+    "boolean": "BOOLEAN",
+    "timestamp": "TIMESTAMP",
+}
+
+# dtypes pandas acceptés pour chaque type logique à l'écriture
+DTYPE_CHECKS = {
+    "string": lambda dtype: isinstance(dtype, pd.CategoricalDtype) or pd.api.types.is_string_dtype(dtype),
+    "integer": pd.api.types.is_integer_dtype,
+    "float": lambda dtype: pd.api.types.is_float_dtype(dtype) or pd.api.types.is_integer_dtype(dtype),
+    "boolean": pd.api.types.is_bool_dtype,
+    "timestamp": pd.api.types.is_datetime64_any_dtype,
+}
+
+
+def validate_frame(df: pd.DataFrame, name: str):
+    """
+    Contrôle rapide d'une table avant écriture : colonnes (noms et ordre) de TABLE_SCHEMAS,
+    dtypes compatibles avec les types logiques, clé primaire sans valeur nulle.
+    Ne regarde que les dtypes et les colonnes de clé : pas de parcours des valeurs texte.
+    """
+    expected = list(TABLE_SCHEMAS[name])
+    if list(df.columns) != expected:
+        missing = [col for col in expected if col not in df.columns]
+        extra = [col for col in df.columns if col not in expected]
+        raise ValueError(f"{name}: columns do not match TABLE_SCHEMAS (missing={missing}, extra={extra})")
+    wrong = [f"{col} ({df[col].dtype}, expected {logical_type})"
+             for col, logical_type in TABLE_SCHEMAS[name].items() if not DTYPE_CHECKS[logical_type](df[col].dtype)]
+    if wrong:
+        raise ValueError(f"{name}: unexpected dtypes: {', '.join(wrong)}")
+    null_keys = [col for col in TABLE_KEYS[name] if df[col].isna().any()]
+    if null_keys:
+        raise ValueError(f"{name}: null values in key column(s) {null_keys}")
+
+
+def memory_usage_mb(df: pd.DataFrame) -> float:
+    """Empreinte mémoire réelle (deep) d'une table, en MiB."""
+    return df.memory_usage(deep=True).sum() / 1024 ** 2
+
+
+# Clé primaire de chaque table (MERGE incrémental, contrôles d'unicité)
+TABLE_KEYS = {
+    "fact_invoices": ["invoice_id"],
+    "fact_invoice_lines": ["invoice_id", "line_item_id"],
+    "dim_customers": ["customer_id"],
+    "dim_products": ["product_id"],
+    "dim_prices": ["price_id"],
+    "dim_payment_methods": ["payment_method_id"],
+    "dim_subscriptions": ["subscription_id"],
+    "dim_payment_intents": ["payment_intent_id"],
+    "dim_charges": ["charge_id"],
+    "agg_revenue_monthly": ["month", "currency", "product_id"],
+    "agg_customer_ltv": ["customer_id", "currency"],
+    "agg_mrr_monthly": ["month", "plan_interval", "currency"],
+}
+
+# Colonne de high-water mark du mode incrémental (created_at sauf si la source expose `updated`)
+TABLE_WATERMARKS = {
+    "dim_products": "updated_at",
+}
+
+# Tables dont les lignes changent après leur création sans colonne `updated` dans la source (statut,
+# montant payé, résiliation, impayés) : en incrémental, leurs lignes modifiées sont aussi réémises,
+# détectées par empreinte de ligne (scripts/incremental.py)
+TABLE_CHANGE_TRACKING = {"fact_invoices", "dim_customers", "dim_subscriptions", "dim_payment_intents", "dim_charges"}
+
+
+# Conception physique Snowflake, reprise dans la DDL générée. Clé de clustering des grosses tables,
+# interrogées par période : les fichiers sont triés sur cette clé avant l'upload
+TABLE_CLUSTERING = {
+    "fact_invoices": ["created_at"],
+    "fact_invoice_lines": ["created_at"],
+    "dim_payment_intents": ["created_at"],
+    "dim_charges": ["created_at"],
+}
+
+# Colonnes d'id recherchées par égalité (une facture, un client) : search optimization (édition Enterprise)
+SEARCH_OPTIMIZATION = {
+    "fact_invoices": ["invoice_id", "customer_id"],
+    "fact_invoice_lines": ["invoice_id", "customer_id"],
+    "dim_payment_intents": ["payment_intent_id", "customer_id", "invoice_id"],
+    "dim_charges": ["charge_id", "payment_intent_id", "customer_id"],
+}
+
+# Tables recalculables à chaque run (agrégats) : TRANSIENT, sans stockage Fail-safe
+TRANSIENT_TABLES = {"agg_revenue_monthly", "agg_customer_ltv", "agg_mrr_monthly"}
+
+
+def cluster_permutation(df: pd.DataFrame, name: str):
+    """
+    Positions des lignes triées sur la clé de clustering puis la clé primaire (None si la table n'est
+    pas clusterisée). Seules les colonnes de tri sont copiées : les écritures prennent leurs tranches
+    avec df.take(positions[start:stop]) au lieu de matérialiser une copie triée de toute la table.
+    """
+    if name not in TABLE_CLUSTERING:
+        return None
+    columns = TABLE_CLUSTERING[name] + [col for col in TABLE_KEYS[name] if col not in TABLE_CLUSTERING[name]]
+    keys = df[columns].reset_index(drop=True)
+    return keys.sort_values(columns, kind="stable", na_position="last").index.to_numpy()
+
+
+def cluster_order(df: pd.DataFrame, name: str) -> pd.DataFrame:
+    """Lignes triées sur la clé de clustering puis la clé primaire (inchangé si la table n'est pas clusterisée)."""
+    order = cluster_permutation(df, name)
+    return df if order is None else df.take(order).reset_index(drop=True)
+
+
+def required_source_tables(table_names=None) -> list:
+    names = BUILDERS.keys() if table_names is None else table_names
+    return sorted({src for name in names for src in BUILDER_SOURCES[name]})
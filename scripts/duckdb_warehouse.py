@@ -0,0 +1,225 @@
+import os
+import re
+import itertools
+from pathlib import Path
+
+from dotenv import load_dotenv
+
+from scripts.sql_runner import split_statements
+from scripts.storage import LocalStorage, get_storage
+
+# This module runs the generated Snowflake SQL on a local DuckDB database (offline loads, CI, benchmarks).
+
+load_dotenv()
+
+DUCKDB_PATH = os.getenv("DUCKDB_PATH", "stripe_olap.duckdb")
+
+# Objets de compte Snowflake sans équivalent local : instructions ignorées
+IGNORED = re.compile(
+    r"^(?:CREATE\s+(?:OR\s+REPLACE\s+)?(?:DATABASE|WAREHOUSE|STORAGE\s+INTEGRATION)|USE\s+(?:DATABASE|WAREHOUSE|ROLE)"
+    r"|ALTER\s+(?:WAREHOUSE|STORAGE\s+INTEGRATION)|ALTER\s+TABLE\s+[\w.$]+\s+(?:ADD|DROP)\s+SEARCH\s+OPTIMIZATION"
+    r"|GRANT|DESC(?:RIBE)?)\b",
+    re.IGNORECASE,
+)
+USE_SCHEMA = re.compile(r"^USE\s+SCHEMA\s+", re.IGNORECASE)
+CREATE_STAGE = re.compile(
+    r"^CREATE\s+(?:OR\s+REPLACE\s+)?STAGE\s+([\w.$]+)\s+URL\s*=\s*'\w+://([^/']*)/?([^']*)'", re.IGNORECASE
+)
+COPY_INTO = re.compile(
+    r"^COPY\s+INTO\s+(\w+)\s*(?:\(([^)]*)\))?\s*FROM\s+@([\w.$]+)/?(\S*)\s+PATTERN\s*=\s*'([^']*)'"
+    r"\s+FILE_FORMAT\s*=\s*\(\s*TYPE\s*=\s*(\w+)",
+    re.IGNORECASE | re.DOTALL,
+)
+SWAP = re.compile(r"^ALTER\s+TABLE\s+([\w.]+)\s+SWAP\s+WITH\s+([\w.]+)$", re.IGNORECASE)
+CREATE_LIKE = re.compile(r"^(CREATE\s+(?:OR\s+REPLACE\s+)?(?:TEMPORARY\s+)?TABLE\s+\w+)\s+LIKE\s+(\w+)$", re.IGNORECASE)
+# Types, fonctions et indications physiques propres à Snowflake
+REWRITES = [
+    (re.compile(r"^(CREATE\s+(?:OR\s+REPLACE\s+)?)TRANSIENT\s+", re.IGNORECASE), r"\1"),
+    (re.compile(r"\s+CLUSTER\s+BY\s*\((?:[^()]|\([^()]*\))*\)\s*$", re.IGNORECASE), ""),
+    (re.compile(r"\bNUMBER\b", re.IGNORECASE), "BIGINT"),
+    (re.compile(r"\bTIMESTAMP_NTZ\b", re.IGNORECASE), "TIMESTAMP"),
+    (re.compile(r"\bCURRENT_TIMESTAMP\(\)", re.IGNORECASE), "CURRENT_TIMESTAMP"),
+]
+DML = ("INSERT", "UPDATE", "DELETE", "MERGE")
+COPY_COLUMNS = ("file", "status", "rows_loaded")
+
+
+def translate(text: str) -> str:
+    """Réécrit une instruction Snowflake (hors COPY et stages) pour DuckDB ; None si elle est sans objet en local."""
+    if IGNORED.match(text):
+        return None
+    text = USE_SCHEMA.sub("USE ", text)
+    like = CREATE_LIKE.match(text)
+    if like:
+        text = f"{like.group(1)} AS SELECT * FROM {like.group(2)} LIMIT 0"
+    for pattern, replacement in REWRITES:
+        text = pattern.sub(replacement, text)
+    return text
+
+
+def _quote(path) -> str:
+    return "'" + str(path).replace("'", "''") + "'"
+
+
+class DuckDBCursor:
+    """Sous-ensemble du curseur snowflake.connector utilisé par le loader (sync, multi-instructions, async)."""
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.sfqid = None
+        self.description = None
+        self.rowcount = -1
+        self._rows = []
+
+    def _set(self, result):
+        self.description, self._rows, self.rowcount = result
+
+    def execute(self, sql: str, num_statements: int = None):
+        for text in split_statements(sql):
+            self._set(self.conn.run(text))
+        return self
+
+    def execute_async(self, sql: str):
+        # DuckDB parallélise chaque requête en interne : elle est exécutée tout de suite, le polling la trouve finie
+        self.sfqid = self.conn.submit(sql)
+        return {"queryId": self.sfqid}
+
+    def get_results_from_sfqid(self, sfqid: str):
+        self._set(self.conn.results[sfqid])
+
+    def nextset(self):
+        return None
+
+    def fetchall(self):
+        return self._rows
+
+    def fetchone(self):
+        return self._rows[0] if self._rows else None
+
+    def close(self):
+        pass
+
+
+class DuckDBConnection:
+    """
+    Connexion DuckDB exposant l'interface snowflake.connector dont se sert load_to_snowflake :
+    les scripts générés y tournent tels quels. Un stage est un dossier local (`stage_root`/<chemin>,
+    ou le stockage local du bucket) et COPY INTO lit ses fichiers CSV/Parquet via read_csv / read_parquet.
+    """
+
+    def __init__(self, db, stage_root=None):
+        self.db = db
+        self.stage_root = Path(stage_root) if stage_root is not None else None
+        self.stages = {}
+        self.results = {}
+        self.errors = {}
+        self._ids = itertools.count()
+
+    def cursor(self):
+        return DuckDBCursor(self)
+
+    def close(self):
+        self.db.close()
+
+    def stage_dir(self, bucket: str, path: str) -> Path:
+        if self.stage_root is not None:
+            return self.stage_root / path
+        store = get_storage(bucket)
+        if not isinstance(store, LocalStorage):
+            raise ValueError("❌ The DuckDB backend reads local stages only (set STORAGE_BACKEND=local)")
+        return store.root / path
+
+    def run(self, text: str) -> tuple:
+        """Exécute une instruction : (description, lignes, rowcount) comme un curseur Snowflake."""
+        stage = CREATE_STAGE.match(text)
+        if stage:
+            self.stages[stage.group(1).upper()] = self.stage_dir(stage.group(2), stage.group(3))
+            return None, [], 0
+        copy = COPY_INTO.match(text)
+        if copy:
+            return self.copy_into(*copy.groups())
+        swap = SWAP.match(text)
+        if swap:
+            return self.swap_tables(*swap.groups())
+        text = translate(text)
+        if text is None:
+            return None, [], 0
+        cur = self.db.execute(text)
+        rows = cur.fetchall() if cur.description else []
+        if text.split(None, 1)[0].upper() in DML and rows:
+            return None, [], rows[0][0]
+        return cur.description, rows, len(rows)
+
+    def copy_into(self, table: str, columns, stage: str, path: str, pattern: str, file_type: str) -> tuple:
+        """COPY INTO : un INSERT par fichier du stage dont le chemin correspond à PATTERN (aucun fichier : 0 ligne)."""
+        root = self.stages[stage.upper()]
+        files = sorted(
+            f for f in (root.rglob("*") if root.exists() else [])
+            if f.is_file() and f.relative_to(root).as_posix().startswith(path)
+            and re.fullmatch(pattern, f.relative_to(root).as_posix())
+        )
+        rows = []
+        for f in files:
+            if file_type.upper() == "PARQUET":
+                source = f"read_parquet({_quote(f)})"
+            else:
+                # Tout en texte : les types sont ceux de la table cible, comme pour un COPY Snowflake
+                source = f"read_csv({_quote(f)}, header = true, all_varchar = true)"
+            if columns:
+                listed = ", ".join(col.strip() for col in columns.split(","))
+                sql = f"INSERT INTO {table} ({listed}) SELECT {listed} FROM {source}"
+            else:
+                sql = f"INSERT INTO {table} BY NAME SELECT * FROM {source}"
+            loaded = self.db.execute(sql).fetchone()[0]
+            rows.append((f.relative_to(root).as_posix(), "LOADED", loaded))
+        return [(col,) for col in COPY_COLUMNS], rows, len(rows)
+
+    def swap_tables(self, first: str, second: str) -> tuple:
+        """
+        ALTER TABLE ... SWAP WITH : DuckDB ne sait pas déplacer une table d'un schéma à l'autre, l'échange
+        passe par des copies dans une transaction (atomique, mais proportionnel à la taille des tables).
+        """
+        swap = f"{second}__swap"
+        self.db.execute("BEGIN TRANSACTION")
+        try:
+            for sql in (f"CREATE TABLE {swap} AS SELECT * FROM {first}", f"DROP TABLE {first}",
+                        f"CREATE TABLE {first} AS SELECT * FROM {second}", f"DROP TABLE {second}",
+                        f"ALTER TABLE {swap} RENAME TO {second.split('.')[-1]}"):
+                self.db.execute(sql)
+        except Exception:
+            self.db.execute("ROLLBACK")
+            raise
+        self.db.execute("COMMIT")
+        return None, [], 0
+
+    def submit(self, sql: str) -> str:
+        qid = f"duckdb-{next(self._ids)}"
+        try:
+            result = None
+            for text in split_statements(sql):
+                result = self.run(text)
+            self.results[qid] = result or (None, [], 0)
+        except Exception as e:
+            self.errors[qid] = e
+        return qid
+
+    def get_query_status(self, qid: str) -> str:
+        return "FAILED_WITH_ERROR" if qid in self.errors else "SUCCESS"
+
+    @staticmethod
+    def is_still_running(status: str) -> bool:
+        return False
+
+    def get_query_status_throw_if_error(self, qid: str) -> str:
+        if qid in self.errors:
+            raise self.errors[qid]
+        return "SUCCESS"
+
+
+def connect_to_duckdb(path=None, stage_root=None) -> DuckDBConnection:
+    """Base DuckDB locale (DUCKDB_PATH par défaut, ":memory:" possible). Dépendance optionnelle (extra `local`)."""
+    try:
+        import duckdb
+    except ImportError as e:
+        raise ImportError("❌ The DuckDB backend needs duckdb: uv sync --extra local") from e
+    return DuckDBConnection(duckdb.connect(str(path or DUCKDB_PATH)), stage_root)
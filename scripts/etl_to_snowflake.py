@@ -1,61 +1,448 @@
 import os
+import time
+import queue
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
 from datetime import datetime, timezone
 from dotenv import load_dotenv
 
-from gcp import configure_gcp_credentials
+from scripts.gcp import configure_gcp_credentials
 from scripts.csv_builders import (
-    build_fact_invoices,
-    build_dim_customers,
-    build_dim_products,
-    build_dim_prices,
-    build_dim_payment_methods,
-    build_dim_subscriptions,
-    build_dim_payment_intents,
-    build_dim_charges
+    BUILDERS,
+    BUILDER_SOURCES,
+    TABLE_CHANGE_TRACKING,
+    memory_usage_mb,
+    required_source_tables,
 )
+from scripts.metrics import (
+    PROFILERS,
+    PROMETHEUS_TEXTFILE,
+    RUN_REPORT_DIR,
+    add_stage,
+    finish_run,
+    profile_builder,
+    stage,
+    start_run,
+    write_prometheus,
+)
+from scripts.chunked import ETL_CHUNK_SIZE, run_chunked
 from scripts.olap_io import (
+    OFFLINE,
+    OUTPUT_FORMAT,
+    OUTPUT_FORMATS,
     load_latest_oltp_json_from_gcs,
+    open_latest_oltp_dump,
+    output_target,
     save_fact,
     save_dim,
+    stream_oltp_tables,
 )
+from scripts.incremental import DELTA_PREFIX, ROW_HASHES, extract_delta, get_state_store, row_hashes
+from scripts.manifest import previous_manifest, reuse_unchanged, table_fingerprint, write_manifest
+from scripts.rollups import ROLLUPS, affected_groups, build_rollup, rollups_of
 
 # 🔁 Charge les variables d'environnement (.env)
 load_dotenv(override=False)
 ENV = os.getenv("ENV", "DEV").upper()
+ETL_WORKERS = int(os.getenv("ETL_WORKERS", "1"))
+# Mode pipeline : tables construites en attente d'upload (et builders prêts en attente d'un thread)
+PIPELINE_QUEUE_SIZE = int(os.getenv("PIPELINE_QUEUE_SIZE", "2"))
 
-def main():
-    print(f"🚀 Starting ETL for ENV={ENV}")
+# Dump partagé par les workers du pool de processus (envoyé une fois par worker)
+_WORKER_RAW = None
 
-    # 🛡 Configure les credentials ADC
-    configure_gcp_credentials()
 
-    # ⏱ Fige un seul timestamp pour tout le run
-    timestamp = datetime.now(timezone.utc).strftime("%Y-%m-%d_%H-%M-%S")
-    print(f"📁 Using timestamp: {timestamp}")
+def _init_build_worker(raw: dict):
+    global _WORKER_RAW
+    _WORKER_RAW = raw
+    # Le recorder hérité du parent n'est pas celui du run : les mesures sont renvoyées au parent
+    finish_run()
+
+
+def _build_in_worker(name: str, profiler: str = None):
+    return build_table(name, _WORKER_RAW, profiler)
+
+
+def build_table(name: str, raw: dict, profiler: str = None):
+    """Construit une table dans une étape mesurée (et profilée si demandé). Renvoie (df, mesure)."""
+    with stage("build", table=name) as record, profile_builder(name, profiler):
+        df = BUILDERS[name](raw)
+        record["rows_in"] = sum(len(raw.get(source, [])) for source in BUILDER_SOURCES[name])
+        record["rows_out"] = len(df)
+    return df, record
+
+
+def save_table(df, name: str, timestamp: str, fmt: str, prefix: str) -> list:
+    if name.startswith("fact_"):
+        return save_fact(df, timestamp=timestamp, name=name, fmt=fmt, prefix=prefix)
+    return save_dim(df, name, timestamp=timestamp, fmt=fmt, prefix=prefix)
+
+
+def write_table(name: str, df, timestamp: str, fmt: str, state: dict = None, previous: dict = None) -> dict:
+    """
+    Écrit une table construite (son delta si `state` est fourni) et renvoie ses métriques.
+    En mode complet, une table dont l'empreinte n'a pas changé depuis le run `previous`
+    réutilise ses fichiers au lieu d'être réencodée et uploadée.
+    """
+    start = time.perf_counter()
+    result = {"table": name, "rows": len(df), "mem_mb": memory_usage_mb(df), "watermark": None}
+    if state is not None:
+        # Empreintes de la table complète, comparées au prochain run pour y trouver les lignes modifiées
+        if name in TABLE_CHANGE_TRACKING:
+            result["row_hashes"] = row_hashes(df)
+        # Une table agrégée arrive déjà réduite aux groupes touchés (write_rollups), sans watermark propre
+        if name not in ROLLUPS:
+            df, result["watermark"] = extract_delta(df, name, state)
+        result["rows"] = len(df)
+        if df.empty:
+            print(f"⏭ No new rows for {name}")
+            result["save_s"] = time.perf_counter() - start
+            return result
+        result["files"] = _relative(save_table(df, name, timestamp, fmt, DELTA_PREFIX), timestamp, DELTA_PREFIX)
+        result["save_s"] = time.perf_counter() - start
+        return result
+
+    result["fingerprint"] = table_fingerprint(df, name, fmt)
+    result["files"] = reuse_unchanged(name, result["fingerprint"], previous, timestamp)
+    if result["files"] is not None:
+        result["reused_from"] = previous["timestamp"]
+    else:
+        result["files"] = _relative(save_table(df, name, timestamp, fmt, "olap_outputs/"), timestamp, "olap_outputs/")
+    result["save_s"] = time.perf_counter() - start
+    return result
+
+
+def _relative(paths: list, timestamp: str, prefix: str) -> list:
+    """Chemins relatifs au dossier du run, tels qu'écrits dans le manifeste."""
+    _, folder = output_target(timestamp, prefix)
+    return [path[len(folder):] for path in paths]
+
+
+def write_rollups(source: str, df, timestamp: str, fmt: str, state: dict = None, previous: dict = None) -> list:
+    """
+    Construit et écrit les tables agrégées de `source` depuis la table construite `df`.
+    En incrémental, seuls les groupes touchés par les lignes nouvelles sont écrits, recalculés sur toute
+    la table (le dump est toujours lu en entier) : le MERGE les remplace, sans double comptage.
+    """
+    return [{**write_table(name, rollup, timestamp, fmt, state, previous), "build_s": build_s}
+            for name, rollup, build_s in build_rollups(source, df, state)]
+
+
+def build_rollups(source: str, df, state: dict = None):
+    """Produit (nom, table agrégée, durée du build) pour chaque agrégat de `source`."""
+    for name in rollups_of(source):
+        with stage("build", table=name) as record:
+            rollup = build_rollup(name, df)
+            if state is not None:
+                rollup = affected_groups(name, rollup, extract_delta(df, source, state)[0])
+            record["rows_in"] = len(df)
+            record["rows_out"] = len(rollup)
+        yield name, rollup, record["wall_s"]
+
+
+def source_releaser(raw: dict):
+    """
+    Renvoie release(name), à appeler après le build de `name` : retire de `raw` les tables sources
+    qu'aucun builder restant ne lit. Sûr entre threads.
+    """
+    readers_left = {src: sum(src in BUILDER_SOURCES[name] for name in BUILDERS) for src in required_source_tables()}
+    lock = threading.Lock()
+
+    def release(name: str):
+        with lock:
+            for src in BUILDER_SOURCES[name]:
+                readers_left[src] -= 1
+                if not readers_left[src]:
+                    raw.pop(src, None)
+
+    return release
+
+
+def build_and_write_table(name: str, raw: dict, timestamp: str, fmt: str, state: dict = None,
+                          profiler: str = None, previous: dict = None, release=None) -> list:
+    """Construit et écrit une table, puis ses tables agrégées. Renvoie leurs métriques."""
+    df, record = build_table(name, raw, profiler)
+    if release is not None:
+        release(name)
+    result = {**write_table(name, df, timestamp, fmt, state, previous), "build_s": record["wall_s"]}
+    return [result] + write_rollups(name, df, timestamp, fmt, state, previous)
+
+
+def run_tables(raw: dict, timestamp: str, fmt: str, state: dict = None, workers: int = 1,
+               process_builders: bool = False, profiler: str = None, previous: dict = None,
+               release_sources: bool = False) -> list:
+    """
+    Construit et écrit toutes les tables de BUILDERS, et les tables agrégées de ROLLUPS.
+    - workers == 1 : séquentiel, dans l'ordre du registre
+    - workers > 1  : pool de threads (build + upload, l'attente réseau GCS se recouvre)
+    - process_builders : builds dans un pool de processus, uploads dans le pool de threads
+    Avec `release_sources`, chaque table source est retirée de `raw` (le dict de l'appelant) dès que
+    son dernier builder a tourné (sans effet avec process_builders : les workers ont leur copie).
+    """
+    order = list(BUILDERS) + list(ROLLUPS)
+    release = source_releaser(raw) if release_sources and not process_builders else None
+    if workers <= 1 and not process_builders:
+        results = [result for name in BUILDERS
+                   for result in build_and_write_table(name, raw, timestamp, fmt, state, profiler, previous,
+                                                       release)]
+        return sorted(results, key=lambda r: order.index(r["table"]))
+
+    results = []
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="etl-upload") as upload_pool:
+        if process_builders:
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_build_worker,
+                                     initargs=(raw,)) as build_pool:
+                builds = {build_pool.submit(_build_in_worker, name, profiler): name for name in BUILDERS}
+                uploads = {}
+                rollups = []
+                for future in as_completed(builds):
+                    df, record = future.result()
+                    add_stage(record)
+                    uploads[upload_pool.submit(write_table, builds[future], df, timestamp, fmt, state,
+                                               previous)] = record["wall_s"]
+                    if rollups_of(builds[future]):
+                        rollups.append(upload_pool.submit(write_rollups, builds[future], df, timestamp, fmt, state,
+                                                          previous))
+                for future in as_completed(uploads):
+                    results.append({**future.result(), "build_s": uploads[future]})
+                results += [result for future in rollups for result in future.result()]
+        else:
+            futures = [upload_pool.submit(build_and_write_table, name, raw, timestamp, fmt, state, profiler, previous,
+                                          release)
+                       for name in BUILDERS]
+            results = [result for future in as_completed(futures) for result in future.result()]
+
+    return sorted(results, key=lambda r: order.index(r["table"]))
+
 
-    # 📥 Charge les données brutes
-    raw = load_latest_oltp_json_from_gcs()
-    print(f"✅ Loaded raw tables: {list(raw.keys())}")
+class _PipelineStopped(Exception):
+    """Une autre étape du pipeline a échoué : le thread s'arrête sans attendre la file."""
 
-    # 🏗 Build et sauvegarde
-    fact_df = build_fact_invoices(raw)
-    save_fact(fact_df, timestamp=timestamp)
 
-    dims = {
-        "dim_customers": build_dim_customers,
-        "dim_products": build_dim_products,
-        "dim_prices": build_dim_prices,
-        "dim_payment_methods": build_dim_payment_methods,
-        "dim_subscriptions": build_dim_subscriptions,
-        "dim_payment_intents": build_dim_payment_intents,
-        "dim_charges": build_dim_charges
-    }
+def _put(q: queue.Queue, item, failed: threading.Event):
+    while not failed.is_set():
+        try:
+            return q.put(item, timeout=0.1)
+        except queue.Full:
+            continue
+    raise _PipelineStopped
+
+
+def _get(q: queue.Queue, failed: threading.Event):
+    while not failed.is_set():
+        try:
+            return q.get(timeout=0.1)
+        except queue.Empty:
+            continue
+    raise _PipelineStopped
+
+
+def run_pipeline(open_dump, timestamp: str, fmt: str, state: dict = None, previous: dict = None,
+                 build_workers: int = 1, upload_workers: int = 1, queue_size: int = PIPELINE_QUEUE_SIZE,
+                 profiler: str = None) -> list:
+    """
+    Lecture du dump, builds et uploads qui se recouvrent, reliés par des files bornées :
+    - un thread lit le dump table par table ; un builder part dès que ses tables sources sont lues
+      (les dimensions se construisent pendant la lecture des factures) ;
+    - `build_workers` threads construisent les tables, puis leurs agrégats ;
+    - `upload_workers` threads les écrivent (empreinte, réutilisation, upload) pendant les builds suivants.
+    Une file pleine bloque l'étape qui l'alimente : au plus `queue_size` tables construites attendent leur
+    upload, et la lecture du dump s'arrête quand les builds ne suivent pas. Une table source est libérée
+    dès que tous ses builders ont tourné. Mêmes résultats que run_tables.
+    """
+    raw = {}
+    builds = queue.Queue(maxsize=queue_size)
+    uploads = queue.Queue(maxsize=queue_size)
+    failed = threading.Event()
+    errors = []
+    results = []
+
+    def read_dump():
+        pending = list(BUILDERS)
+        with open_dump() as fileobj:
+            tables = stream_oltp_tables(fileobj, tables=required_source_tables())
+            while True:
+                with stage("parse") as record:
+                    table, records = next(tables, (None, []))
+                    record["rows_out"] = len(records)
+                    if table is not None:
+                        record["labels"]["table"] = table
+                if table is None:
+                    break
+                raw[table] = records
+                for name in [n for n in pending if all(src in raw for src in BUILDER_SOURCES[n])]:
+                    pending.remove(name)
+                    _put(builds, name, failed)
+        # Builders dont une source manque au dump : lancés une fois le dump entièrement lu
+        for name in pending:
+            _put(builds, name, failed)
+
+    # Une source n'est gardée que tant qu'un builder la lit
+    release = source_releaser(raw)
+
+    def build():
+        while (name := _get(builds, failed)) is not None:
+            df, record = build_table(name, raw, profiler)
+            release(name)
+            _put(uploads, (name, df, record["wall_s"]), failed)
+            for rollup in build_rollups(name, df, state):
+                _put(uploads, rollup, failed)
+
+    def upload():
+        while (item := _get(uploads, failed)) is not None:
+            name, df, build_s = item
+            results.append({**write_table(name, df, timestamp, fmt, state, previous), "build_s": build_s})
+
+    def guarded(target):
+        def run():
+            try:
+                target()
+            except _PipelineStopped:
+                pass
+            except BaseException as e:
+                errors.append(e)
+                failed.set()
+        return run
+
+    def start(target, name: str, count: int) -> list:
+        threads = [threading.Thread(target=guarded(target), name=f"etl-{name}-{i}") for i in range(count)]
+        for thread in threads:
+            thread.start()
+        return threads
+
+    def finish(threads: list, q: queue.Queue):
+        # Une fin de file par consommateur, une fois les producteurs terminés
+        for thread in threads:
+            guarded(lambda: _put(q, None, failed))()
+        for thread in threads:
+            thread.join()
+
+    readers = start(read_dump, "read", 1)
+    builders = start(build, "build", max(build_workers, 1))
+    uploaders = start(upload, "upload", max(upload_workers, 1))
+    for thread in readers:
+        thread.join()
+    finish(builders, builds)
+    finish(uploaders, uploads)
+    if errors:
+        raise errors[0]
+
+    order = list(BUILDERS) + list(ROLLUPS)
+    return sorted(results, key=lambda r: order.index(r["table"]))
+
+
+def print_timings(results: list, total_s: float):
+    print("⏱ Per-table timing and memory:")
+    print(f"   {'table':<22}{'rows':>10}{'mem_mb':>10}{'build_s':>10}{'save_s':>10}")
+    for r in results:
+        print(f"   {r['table']:<22}{r['rows']:>10}{r['mem_mb']:>10.2f}{r['build_s']:>10.2f}{r['save_s']:>10.2f}")
+    total_mb = sum(r["mem_mb"] for r in results)
+    print(f"   {'total (wall)':<22}{'':>10}{total_mb:>10.2f}{'':>10}{total_s:>10.2f}")
+
+
+def run_etl(timestamp: str, fmt: str, incremental=False, workers=ETL_WORKERS, process_builders=False,
+            profiler=None, chunk_size=None, reuse=True, pipeline=False):
+    """Corps du run ETL (lecture, builds, écritures, manifeste, watermarks), mesuré par le recorder de main."""
+    # 🛡 Configure les credentials ADC (inutile en mode OFFLINE : dump local)
+    if not OFFLINE:
+        configure_gcp_credentials()
+
+    # 🧱 Mode chunked : le dump est relu par lots, les tables sont écrites en part files
+    if chunk_size:
+        start = time.perf_counter()
+        results = run_chunked(open_latest_oltp_dump, timestamp, fmt, chunk_size)
+        print_timings(results, time.perf_counter() - start)
+        write_manifest(timestamp, fmt, results, mode="chunked")
+        return
+
+    # 🔖 Mode incrémental : seules les lignes au-delà du high-water mark sont écrites
+    state_store = get_state_store() if incremental else None
+    watermarks = state_store.load() if incremental else None
+    state = {**watermarks, ROW_HASHES: state_store.load_row_hashes()} if incremental else None
+
+    # ♻️ Empreintes du run précédent : les tables inchangées ne sont pas réuploadées
+    previous = previous_manifest(timestamp) if reuse and not incremental else None
+
+    start = time.perf_counter()
+    if pipeline:
+        # 🔀 Lecture du dump, builds et uploads en parallèle (files bornées)
+        results = run_pipeline(open_latest_oltp_dump, timestamp, fmt, state=state, previous=previous,
+                               build_workers=workers, upload_workers=workers, profiler=profiler)
+    else:
+        # 📥 Charge les données brutes
+        # Streaming : seules les tables lues par les builders sont gardées en mémoire
+        raw = load_latest_oltp_json_from_gcs(tables=required_source_tables())
+        print(f"✅ Loaded raw tables: {list(raw.keys())}")
+
+        # 🏗 Build et sauvegarde
+        results = run_tables(raw, timestamp, fmt, state=state, workers=workers, process_builders=process_builders,
+                             profiler=profiler, previous=previous, release_sources=True)
+    print_timings(results, time.perf_counter() - start)
+
+    # 🧾 Manifeste du run et pointeur LATEST, publiés une fois toutes les sorties écrites
+    write_manifest(timestamp, fmt, results, prefix=DELTA_PREFIX if incremental else "olap_outputs/",
+                   mode="incremental" if incremental else "full")
+
+    # Les high-water marks ne sont avancés qu'une fois toutes les sorties écrites
+    if incremental:
+        new_state = {**watermarks, **{r["table"]: r["watermark"] for r in results if r["table"] not in ROLLUPS}}
+        state_store.save(new_state)
+        state_store.save_row_hashes({r["table"]: r["row_hashes"] for r in results if "row_hashes" in r})
+        print(f"🔖 High-water marks updated: {new_state}")
+
+
+def main(fmt=OUTPUT_FORMAT, incremental=False, workers=ETL_WORKERS, process_builders=False,
+         report_path=None, prometheus_path=PROMETHEUS_TEXTFILE, profiler=None, chunk_size=None, reuse=True,
+         pipeline=False):
+    if chunk_size and incremental:
+        raise ValueError("❌ Chunked mode does not support --incremental")
+    if pipeline and (chunk_size or process_builders):
+        raise ValueError("❌ --pipeline runs its own reader, build and upload threads "
+                         "(not with --chunk-size or --process-builders)")
+    mode = "chunked" if chunk_size else "incremental" if incremental else "full"
+    print(f"🚀 Starting ETL for ENV={ENV} (format={fmt}, mode={mode}, workers={workers}, pipeline={pipeline})")
+    start_run("etl", env=ENV, format=fmt, mode=mode)
+
+    # ⏱ Fige un seul timestamp pour tout le run
+    timestamp = datetime.now(timezone.utc).strftime("%Y-%m-%d_%H-%M-%S")
+    print(f"📁 Using timestamp: {timestamp}")
 
-    for dim_name, builder in dims.items():
-        dim_df = builder(raw)
-        save_dim(dim_df, dim_name, timestamp=timestamp)
+    try:
+        run_etl(timestamp, fmt, incremental=incremental, workers=workers, process_builders=process_builders,
+                profiler=profiler, chunk_size=chunk_size, reuse=reuse, pipeline=pipeline)
+    finally:
+        # 🧾 Rapport machine du run (JSON), écrit aussi en cas d'échec : le statut des étapes montre où il s'est arrêté
+        report = finish_run(report_path or f"{RUN_REPORT_DIR}/etl_{timestamp}.json")
 
+    # Textfile Prometheus seulement pour un run réussi : un échec garde les métriques du dernier succès
+    if prometheus_path:
+        write_prometheus(report, prometheus_path)
     print("🎉 ETL completed successfully")
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Build OLAP fact/dim tables from the latest OLTP dump.")
+    parser.add_argument("--format", choices=OUTPUT_FORMATS, default=OUTPUT_FORMAT,
+                        help="Output file format (parquet uses PARQUET_COMPRESSION, default snappy).")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Only write rows past each table's high-water mark to olap_deltas/ (loaded with MERGE).")
+    parser.add_argument("--workers", type=int, default=ETL_WORKERS,
+                        help="Number of tables built/uploaded concurrently (default ETL_WORKERS or 1 = serial).")
+    parser.add_argument("--process-builders", action="store_true",
+                        help="Run builders in a process pool (uploads stay in the thread pool).")
+    parser.add_argument("--chunk-size", type=int, nargs="?", const=ETL_CHUNK_SIZE,
+                        help=f"Out-of-core mode: build tables in batches of N records into part files "
+                             f"(default N = ETL_CHUNK_SIZE = {ETL_CHUNK_SIZE}).")
+    parser.add_argument("--pipeline", action="store_true",
+                        help="Overlap dump reading, builds and uploads (bounded queues, PIPELINE_QUEUE_SIZE).")
+    parser.add_argument("--no-reuse", action="store_true",
+                        help="Re-upload every table even if its fingerprint matches the previous run.")
+    parser.add_argument("--report", help="Path of the JSON run report (default RUN_REPORT_DIR/etl_<timestamp>.json).")
+    parser.add_argument("--prometheus", default=PROMETHEUS_TEXTFILE,
+                        help="Also write stage metrics to this Prometheus textfile (default PROMETHEUS_TEXTFILE).")
+    parser.add_argument("--profile", choices=PROFILERS,
+                        help="Profile each builder into PROFILE_DIR (use with --workers 1).")
+    args = parser.parse_args()
+    main(fmt=args.format, incremental=args.incremental, workers=args.workers,
+         process_builders=args.process_builders, report_path=args.report, prometheus_path=args.prometheus,
+         profiler=args.profile, chunk_size=args.chunk_size, reuse=not args.no_reuse, pipeline=args.pipeline)
@@ -1,30 +1,122 @@
 import json
+from typing import NamedTuple
 import pandas as pd
 
-def parse_json_column(col, key):
-    def extract(val):
-        try:
-            if pd.isnull(val):
-                return None
-            return json.loads(val).get(key)
-        except Exception:
-            return None
-    return extract
+# orjson (extra `fast`) décode plusieurs fois plus vite ; json de la stdlib sinon
+try:
+    import orjson
+    _loads = orjson.loads
+    _DECODE_ERRORS = (orjson.JSONDecodeError, TypeError)
+except ImportError:
+    _loads = json.loads
+    _DECODE_ERRORS = (json.JSONDecodeError, TypeError)
+
+class JsonFlattenRule(NamedTuple):
+    """Colonne JSON (texte ou dict déjà décodé) et sous-champs à projeter : {colonne cible: chemin}."""
+    column: str
+    fields: dict
+    drop: bool = True
+
+def decode_json_column(series: pd.Series) -> pd.Series:
+    """
+    Décode une colonne JSON une seule fois par valeur distincte.
+    Les dicts/listes déjà décodés passent tels quels ; null et JSON invalide donnent None (compté et signalé).
+    """
+    decoded = {}
+    invalid = 0
+    values = []
+    for val in series.tolist():
+        if isinstance(val, (str, bytes)):
+            if val not in decoded:
+                try:
+                    decoded[val] = _loads(val)
+                except _DECODE_ERRORS:
+                    decoded[val] = None
+                    invalid += 1
+            values.append(decoded[val])
+        elif isinstance(val, (dict, list)):
+            values.append(val)
+        else:
+            values.append(None)
+    if invalid:
+        print(f"⚠️ {invalid} invalid JSON values in column {series.name!r}")
+    return pd.Series(values, index=series.index, dtype=object, name=series.name)
+
+def flatten_json(df: pd.DataFrame, rule: JsonFlattenRule) -> pd.DataFrame:
+    """Projette les sous-champs de `rule.column` en colonnes, en une passe après un seul décodage."""
+    source = df[rule.column] if rule.column in df else pd.Series(None, index=df.index, dtype=object, name=rule.column)
+    df = df.copy()
+    df[list(rule.fields)] = extract_paths(decode_json_column(source), rule.fields)
+    return df.drop(columns=[rule.column]) if rule.drop and rule.column in df else df
+
+PRICES_RECURRING = JsonFlattenRule("recurring", {
+    "recurring_interval": ("interval",),
+    "recurring_count": ("interval_count",),
+    "recurring_usage_type": ("usage_type",),
+})
 
 def flatten_dim_prices(df: pd.DataFrame) -> pd.DataFrame:
-    df["recurring_interval"] = df["recurring"].apply(parse_json_column("recurring", "interval"))
-    df["recurring_count"] = df["recurring"].apply(parse_json_column("recurring", "interval_count"))
-    df["recurring_usage_type"] = df["recurring"].apply(parse_json_column("recurring", "usage_type"))
-    return df.drop(columns=["recurring"])
+    return flatten_json(df, PRICES_RECURRING)
 
-# Mapping rules (can be extended)
+# Mapping rules : une fonction, ou une liste de JsonFlattenRule (voir register_flatten_rule)
 FLATTEN_RULES = {
     "dim_prices": flatten_dim_prices,
-    # future: "fact_invoices": flatten_fact_invoices
+    "fact_invoices": [JsonFlattenRule("card_info", {"card_brand": ("brand",)})],
+    "dim_payment_methods": [JsonFlattenRule("card", {"card_brand": ("brand",)}, drop=False)],
 }
 
+def register_flatten_rule(table_name: str, rule: JsonFlattenRule):
+    """Ajoute une règle déclarative pour `table_name` (après les règles existantes)."""
+    existing = FLATTEN_RULES.get(table_name)
+    if callable(existing):
+        raise ValueError(f"{table_name} is flattened by {existing.__name__}, not by declarative rules")
+    FLATTEN_RULES[table_name] = [*(existing or []), rule]
+
+def _walk(obj, path: tuple):
+    """Suit `path` depuis `obj` : une clé dans un dict, un index dans une liste ; None au premier maillon manquant."""
+    try:
+        for key in path:
+            # Un index n'est appliqué qu'à une liste : une chaîne l'accepterait ("xy"[0] == "x")
+            if key.__class__ is int and not isinstance(obj, list):
+                return None
+            obj = obj[key]
+        return obj
+    except (KeyError, IndexError, TypeError):
+        # Clé absente, liste trop courte, ou None / NaN / nombre / chaîne en cours de chemin
+        return None
+
+def compile_paths(paths: list, prefix: tuple = ()):
+    """
+    Regroupe des chemins imbriqués (clés / index) en une seule fonction d'accès.
+    La fonction renvoie un tuple de valeurs ; un maillon manquant donne None au lieu de lever.
+    """
+    paths = [tuple(path) for path in paths]
+    prefix = tuple(prefix)
+
+    def get(obj):
+        if prefix:
+            obj = _walk(obj, prefix)
+        return tuple([_walk(obj, path) for path in paths])
+
+    return get
+
+def extract_paths(series: pd.Series, paths: dict, prefix: tuple = ()) -> pd.DataFrame:
+    """
+    Extrait plusieurs champs imbriqués en une seule passe sur `series`.
+    `prefix` est résolu une fois par ligne, puis chaque chemin de `paths` part de là.
+    """
+    get = compile_paths(list(paths.values()), prefix)
+    rows = list(map(get, series.tolist()))
+    columns = zip(*rows) if rows else [()] * len(paths)
+    return pd.DataFrame(
+        {name: pd.Series(values, index=series.index, dtype=object) for name, values in zip(paths, columns)},
+        index=series.index,
+    )
+
 def apply_flatten_if_needed(df: pd.DataFrame, table_name: str) -> pd.DataFrame:
-    flatten_fn = FLATTEN_RULES.get(table_name)
-    if flatten_fn:
-        return flatten_fn(df)
+    rules = FLATTEN_RULES.get(table_name)
+    if callable(rules):
+        return rules(df)
+    for rule in rules or []:
+        df = flatten_json(df, rule)
     return df
@@ -1,39 +1,74 @@
 import os
+import argparse
 from pathlib import Path
 from dotenv import load_dotenv
-from scripts.olap_io import load_latest_olap_outputs
-from gcp import configure_gcp_credentials
+from scripts.csv_builders import TABLE_SCHEMAS
+from scripts.olap_io import read_latest_manifest, OUTPUT_FORMAT, OUTPUT_FORMATS
+from scripts.storage import get_storage
+from scripts.gcp import configure_gcp_credentials
 
 load_dotenv()
 
 GCS_BUCKET = os.getenv("GCS_BUCKET")
 OUTPUT_FILE = Path("scripts/sql/copy_into_tables.sql")
 
-def generate_copy_into_sql(df_dict: dict) -> str:
-    lines = []
-    for table_name, df in df_dict.items():
-        lines.append(f"COPY INTO {table_name} (")
-        for col in df.columns:
-            lines.append(f"    {col},")
-        lines[-1] = lines[-1].rstrip(',')  # remove trailing comma
-        lines.append(")")
-        lines.append(f"FROM @STRIPE_OLAP.RAW.GCS_STAGE_PROD/{table_name}.csv")
-        lines.append("FILE_FORMAT = (")
-        lines.append("    TYPE = CSV,")
-        lines.append("    FIELD_DELIMITER = ',',")
-        lines.append("    SKIP_HEADER = 1")
-        lines.append(");")
+STAGE = "@STRIPE_OLAP.RAW.GCS_STAGE_PROD"
+
+def file_pattern(table_name: str, fmt: str) -> str:
+    """
+    Fichier unique <table>.<fmt> ou part files <table>/part-NNNNN.<fmt> (chargés en parallèle par COPY).
+    Les CSV peuvent être gzippés (.csv.gz) : décompressés par COPY (COMPRESSION = AUTO par défaut).
+    """
+    suffix = "([.]gz)?" if fmt == "csv" else ""
+    return f".*{table_name}([.]|/part-[0-9]+[.]){fmt}{suffix}"
+
+def copy_into_statement(table_name: str, columns: list, fmt: str = "csv", target: str = None) -> str:
+    """COPY INTO `target` (par défaut la table elle-même) depuis les fichiers `table_name` du stage."""
+    target = target or table_name
+    source = [f"FROM {STAGE}/{table_name}", f"PATTERN = '{file_pattern(table_name, fmt)}'"]
+    if fmt == "parquet":
+        # Colonnes associées par nom : le schéma Parquet porte déjà les types
+        return "\n".join([
+            f"COPY INTO {target}",
+            *source,
+            "FILE_FORMAT = (TYPE = PARQUET)",
+            "MATCH_BY_COLUMN_NAME = CASE_INSENSITIVE;",
+        ])
+
+    lines = [f"COPY INTO {target} ("]
+    for col in columns:
+        lines.append(f"    {col},")
+    lines[-1] = lines[-1].rstrip(',')  # remove trailing comma
+    lines.append(")")
+    lines.extend(source)
+    lines.append("FILE_FORMAT = (")
+    lines.append("    TYPE = CSV,")
+    lines.append("    FIELD_DELIMITER = ',',")
+    lines.append("    FIELD_OPTIONALLY_ENCLOSED_BY = '\"',")
+    lines.append("    SKIP_HEADER = 1")
+    lines.append(");")
     return "\n".join(lines)
 
-def main():
-    print("🔐 Configuring GCP credentials...")
-    configure_gcp_credentials()
+def generate_copy_into_sql(df_dict: dict, fmt: str = "csv") -> str:
+    """`df_dict` : {table: DataFrame, liste de colonnes ou schéma}."""
+    return "\n".join(
+        copy_into_statement(table_name, list(columns), fmt) for table_name, columns in df_dict.items()
+    )
+
+def latest_format(bucket_name: str):
+    """Format du dernier run d'après son manifeste (un seul GET), ou None."""
+    manifest = read_latest_manifest(get_storage(bucket_name))
+    return manifest["format"] if manifest is not None else None
 
-    print("📥 Downloading OLAP outputs from GCS...")
-    dfs = load_latest_olap_outputs(GCS_BUCKET)
+def main(fmt=None):
+    if fmt is None:
+        print("🔐 Configuring GCP credentials...")
+        configure_gcp_credentials()
+        print("🧾 Reading the output format from the latest run manifest...")
+        fmt = latest_format(GCS_BUCKET) or OUTPUT_FORMAT
 
-    print("🛠 Generating COPY INTO SQL script...")
-    sql_script = generate_copy_into_sql(dfs)
+    print("🛠 Generating COPY INTO SQL script from TABLE_SCHEMAS...")
+    sql_script = generate_copy_into_sql(TABLE_SCHEMAS, fmt=fmt)
 
     print(f"💾 Writing to {OUTPUT_FILE}...")
     OUTPUT_FILE.parent.mkdir(parents=True, exist_ok=True)
@@ -41,4 +76,8 @@ def main():
     print("✅ copy_into_tables.sql generated successfully.")
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Generate COPY INTO statements for the latest OLAP outputs.")
+    parser.add_argument("--format", choices=OUTPUT_FORMATS,
+                        help="Format of the staged files (default: the latest manifest's, else OUTPUT_FORMAT).")
+    args = parser.parse_args()
+    main(fmt=args.format)
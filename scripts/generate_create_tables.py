@@ -1,84 +1,49 @@
-import os
-import re
-from io import BytesIO
+import argparse
 from pathlib import Path
-import pandas as pd
-from dotenv import load_dotenv
-from scripts.olap_io import load_latest_olap_outputs
-from gcp import configure_gcp_credentials
+from scripts.csv_builders import (
+    SEARCH_OPTIMIZATION, SNOWFLAKE_TYPES, TABLE_CLUSTERING, TABLE_SCHEMAS, TRANSIENT_TABLES,
+)
 
-load_dotenv()
-
-GCS_BUCKET = os.getenv("GCS_BUCKET")
 OUTPUT_FILE = Path("scripts/sql/create_tables.sql")
 
-# 🔧 Forcer certains types si inférés à tort
-TYPE_OVERRIDES = {
-    # IDs toujours forcés en STRING
-    "invoice_id": "STRING",
-    "customer_id": "STRING",
-    "subscription_id": "STRING",
-    "product_id": "STRING",
-    "price_id": "STRING",
-    "payment_method_id": "STRING",
-    "payment_intent_id": "STRING",
-    "charge_id": "STRING",
-
-    # Cas spécifiques corrigés
-    "receipt_number": "STRING",         # ex: '2072-1714' -> STRING
-    "card_brand": "STRING",             # parfois inféré à tort en float
-    "payment_method_type": "STRING",    # vide donc mal typé parfois
-    "invoice_id": "STRING",             # vide dans payment_intents
-
-    # Champs avec valeurs nulles interprétées comme float
-    "cancel_at": "TIMESTAMP",
-    "ended_at": "TIMESTAMP",
-}
-
-
-# 🧠 Pattern ISO8601
-def is_iso_datetime(val: str) -> bool:
-    iso_dt_pattern = r"^\d{4}-\d{2}-\d{2}[ T](\d{2}:\d{2}:\d{2})"
-    return isinstance(val, str) and re.match(iso_dt_pattern, val) is not None
-
-def infer_snowflake_type(col_name: str, series: pd.Series) -> str:
-    # Force via override
-    if col_name in TYPE_OVERRIDES:
-        return TYPE_OVERRIDES[col_name]
-
-    sample = series.dropna().astype(str).head(5)
-    if sample.apply(is_iso_datetime).all():
-        return "TIMESTAMP"
-
-    mapping = {
-        'object': 'STRING',
-        'float64': 'FLOAT',
-        'int64': 'NUMBER',
-        'bool': 'BOOLEAN',
-        'datetime64[ns]': 'TIMESTAMP'
-    }
-    return mapping.get(str(series.dtype), 'STRING')
-
-def generate_create_table_sql(df_dict: dict) -> str:
-    lines = []
-    for table_name, df in df_dict.items():
-        lines.append(f"CREATE OR REPLACE TABLE {table_name} (")
-        for col in df.columns:
-            col_type = infer_snowflake_type(col, df[col])
-            lines.append(f"    {col} {col_type},")
-        lines[-1] = lines[-1].rstrip(',')
+def cluster_expression(col: str, logical_type: str) -> str:
+    # Un timestamp est clusterisé par jour : cardinalité raisonnable pour le reclustering automatique
+    return f"TO_DATE({col})" if logical_type == "timestamp" else col
+
+def create_table_statement(table_name: str, schema: dict, cluster_by: list = None, transient: bool = False) -> str:
+    kind = "TRANSIENT TABLE" if transient else "TABLE"
+    lines = [f"CREATE OR REPLACE {kind} {table_name} ("]
+    for col, logical_type in schema.items():
+        lines.append(f"    {col} {SNOWFLAKE_TYPES[logical_type]},")
+    lines[-1] = lines[-1].rstrip(',')
+    if cluster_by:
+        lines.append(f") CLUSTER BY ({', '.join(cluster_expression(col, schema[col]) for col in cluster_by)});\n")
+    else:
         lines.append(");\n")
     return "\n".join(lines)
 
-def main():
-    print("🔐 Configuring GCP credentials...")
-    configure_gcp_credentials()
-
-    print("📥 Downloading OLAP outputs from GCS...")
-    dfs = load_latest_olap_outputs(GCS_BUCKET)
-
-    print("🛠 Inferring schema and generating SQL...")
-    sql_script = generate_create_table_sql(dfs)
+def search_optimization_statement(table_name: str, columns: list) -> str:
+    return f"ALTER TABLE {table_name} ADD SEARCH OPTIMIZATION ON EQUALITY({', '.join(columns)});\n"
+
+def generate_create_table_sql(schemas: dict, clustering: dict = None, search: dict = None,
+                              transient: set = frozenset()) -> str:
+    """
+    `schemas` : {table: {colonne: type logique}}, en pratique TABLE_SCHEMAS (aucune inférence).
+    `clustering`, `search` et `transient` ajoutent les indications physiques (TABLE_CLUSTERING, ...).
+    """
+    statements = []
+    for table_name, schema in schemas.items():
+        statements.append(create_table_statement(
+            table_name, schema, (clustering or {}).get(table_name), table_name in transient))
+        if table_name in (search or {}):
+            statements.append(search_optimization_statement(table_name, search[table_name]))
+    return "\n".join(statements)
+
+def main(search_optimization=True):
+    print("🛠 Generating CREATE TABLE SQL script from TABLE_SCHEMAS...")
+    sql_script = generate_create_table_sql(
+        TABLE_SCHEMAS, TABLE_CLUSTERING, SEARCH_OPTIMIZATION if search_optimization else None, TRANSIENT_TABLES
+    )
 
     print(f"💾 Writing to {OUTPUT_FILE}...")
     OUTPUT_FILE.parent.mkdir(parents=True, exist_ok=True)
@@ -86,4 +51,8 @@ def main():
     print("✅ create_tables.sql generated successfully.")
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Generate CREATE TABLE statements from the schema registry.")
+    parser.add_argument("--no-search-optimization", action="store_true",
+                        help="Omit ADD SEARCH OPTIMIZATION (not available on Snowflake Standard edition).")
+    args = parser.parse_args()
+    main(search_optimization=not args.no_search_optimization)
@@ -0,0 +1,50 @@
+import argparse
+from pathlib import Path
+from scripts.csv_builders import TABLE_SCHEMAS, TABLE_KEYS
+from scripts.generate_copy_into_sql import copy_into_statement
+from scripts.olap_io import OUTPUT_FORMAT, OUTPUT_FORMATS
+
+OUTPUT_FILE = Path("scripts/sql/merge_into_tables.sql")
+
+def merge_into_statement(table_name: str, columns: list, keys: list) -> str:
+    delta_table = f"{table_name}_delta"
+    lines = [f"MERGE INTO {table_name} AS t", f"USING {delta_table} AS s"]
+    lines.append("ON " + " AND ".join(f"t.{key} = s.{key}" for key in keys))
+    lines.append("WHEN MATCHED THEN UPDATE SET")
+    updates = [col for col in columns if col not in keys]
+    for col in updates:
+        lines.append(f"    {col} = s.{col},")
+    lines[-1] = lines[-1].rstrip(',')
+    lines.append(f"WHEN NOT MATCHED THEN INSERT ({', '.join(columns)})")
+    lines.append(f"VALUES ({', '.join(f's.{col}' for col in columns)});")
+    return "\n".join(lines)
+
+def generate_merge_sql(schemas: dict, fmt: str = "csv") -> str:
+    """
+    Pour chaque table : charge le delta du run dans une table temporaire, puis MERGE sur la clé.
+    Un fichier delta absent (aucune ligne nouvelle) donne un COPY vide et un MERGE sans effet.
+    """
+    blocks = []
+    for table_name, schema in schemas.items():
+        columns = list(schema)
+        blocks.append("\n".join([
+            f"CREATE OR REPLACE TEMPORARY TABLE {table_name}_delta LIKE {table_name};",
+            copy_into_statement(table_name, columns, fmt, target=f"{table_name}_delta"),
+            merge_into_statement(table_name, columns, TABLE_KEYS[table_name]),
+        ]))
+    return "\n\n".join(blocks) + "\n"
+
+def main(fmt=OUTPUT_FORMAT):
+    print("🛠 Generating MERGE INTO SQL script from TABLE_SCHEMAS...")
+    sql_script = generate_merge_sql(TABLE_SCHEMAS, fmt=fmt)
+
+    print(f"💾 Writing to {OUTPUT_FILE}...")
+    OUTPUT_FILE.parent.mkdir(parents=True, exist_ok=True)
+    OUTPUT_FILE.write_text(sql_script)
+    print("✅ merge_into_tables.sql generated successfully.")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate MERGE INTO statements for incremental loads.")
+    parser.add_argument("--format", choices=OUTPUT_FORMATS, default=OUTPUT_FORMAT, help="Format of the staged delta files.")
+    args = parser.parse_args()
+    main(fmt=args.format)
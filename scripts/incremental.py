@@ -0,0 +1,170 @@
+import io
+import os
+import json
+import posixpath
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from dotenv import load_dotenv
+
+from scripts.csv_builders import TABLE_CHANGE_TRACKING, TABLE_KEYS, TABLE_WATERMARKS
+from scripts.storage import get_storage
+
+# This module implements the incremental ETL mode: per-table high-water marks and delta extraction.
+
+load_dotenv()
+
+GCS_BUCKET = os.getenv("GCS_BUCKET")
+ENV = os.getenv("ENV", "DEV").upper()
+
+DELTA_PREFIX = "olap_deltas/"
+STATE_BLOB = os.getenv("ETL_STATE_BLOB", "state/etl_watermarks.json")
+LOCAL_STATE_FILE = os.getenv("ETL_STATE_FILE", ".etl_state/etl_watermarks.json")
+# Empreintes de ligne des tables de TABLE_CHANGE_TRACKING, à côté du fichier d'état (un parquet par table)
+ROW_HASHES_DIR = "row_hashes"
+# Clé de `state` sous laquelle le run reçoit les empreintes du run précédent (jamais écrite dans le JSON)
+ROW_HASHES = "row_hashes"
+
+
+def _hashes_to_parquet(hashes: np.ndarray) -> bytes:
+    buffer = io.BytesIO()
+    pd.DataFrame({"row_hash": hashes}).to_parquet(buffer, index=False)
+    return buffer.getvalue()
+
+
+def _hashes_from_parquet(data: bytes) -> np.ndarray:
+    return pd.read_parquet(io.BytesIO(data))["row_hash"].to_numpy()
+
+
+class LocalStateStore:
+    """High-water marks stockés dans un fichier JSON local (DEV, tests hors-ligne)."""
+
+    def __init__(self, path=LOCAL_STATE_FILE):
+        self.path = Path(path)
+
+    def load(self) -> dict:
+        if not self.path.exists():
+            return {}
+        return json.loads(self.path.read_text())
+
+    def save(self, state: dict):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix(".tmp")
+        tmp_path.write_text(json.dumps(state, indent=2, sort_keys=True))
+        tmp_path.replace(self.path)
+
+    def _hashes_path(self, table: str) -> Path:
+        return self.path.parent / ROW_HASHES_DIR / f"{table}.parquet"
+
+    def load_row_hashes(self) -> dict:
+        return {table: _hashes_from_parquet(self._hashes_path(table).read_bytes())
+                for table in sorted(TABLE_CHANGE_TRACKING) if self._hashes_path(table).exists()}
+
+    def save_row_hashes(self, hashes: dict):
+        for table, values in hashes.items():
+            path = self._hashes_path(table)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = path.with_suffix(".tmp")
+            tmp_path.write_bytes(_hashes_to_parquet(values))
+            tmp_path.replace(path)
+
+
+class GCSStateStore:
+    """High-water marks stockés dans un blob JSON du bucket (PROD, ou stockage local si OFFLINE)."""
+
+    def __init__(self, bucket_name=None, blob_path=STATE_BLOB, store=None):
+        self.store = store or get_storage(bucket_name or GCS_BUCKET)
+        self.blob_path = blob_path
+
+    def load(self) -> dict:
+        if not self.store.exists(self.blob_path):
+            return {}
+        return json.loads(self.store.read_bytes(self.blob_path))
+
+    def save(self, state: dict):
+        self.store.write_bytes(self.blob_path, json.dumps(state, indent=2, sort_keys=True).encode(),
+                               content_type="application/json")
+
+    def _hashes_blob(self, table: str) -> str:
+        return posixpath.join(posixpath.dirname(self.blob_path), ROW_HASHES_DIR, f"{table}.parquet")
+
+    def load_row_hashes(self) -> dict:
+        return {table: _hashes_from_parquet(self.store.read_bytes(self._hashes_blob(table)))
+                for table in sorted(TABLE_CHANGE_TRACKING) if self.store.exists(self._hashes_blob(table))}
+
+    def save_row_hashes(self, hashes: dict):
+        for table, values in hashes.items():
+            self.store.write_bytes(self._hashes_blob(table), _hashes_to_parquet(values),
+                                   content_type="application/vnd.apache.parquet")
+
+
+def get_state_store():
+    if ENV == "PROD":
+        return GCSStateStore()
+    return LocalStateStore()
+
+
+def watermark_column(table: str) -> str:
+    return TABLE_WATERMARKS.get(table, "created_at")
+
+
+def _watermark_values(df: pd.DataFrame, table: str) -> pd.Series:
+    values = pd.to_datetime(df[watermark_column(table)], errors="coerce")
+    # Les high-water marks sont stockés en UTC sans fuseau
+    if values.dt.tz is not None:
+        values = values.dt.tz_convert("UTC").dt.tz_localize(None)
+    return values
+
+
+def _past_watermark(df: pd.DataFrame, table: str, watermark: str = None) -> np.ndarray:
+    if watermark is None:
+        return np.ones(len(df), dtype=bool)
+    return (_watermark_values(df, table) >= pd.Timestamp(watermark)).to_numpy()
+
+
+def filter_new_rows(df: pd.DataFrame, table: str, watermark: str = None) -> pd.DataFrame:
+    """
+    Garde les lignes dont la colonne de watermark est >= au dernier high-water mark.
+    L'égalité est incluse : des lignes arrivées dans la même seconde ne sont pas perdues,
+    et le MERGE côté Snowflake rend leur rechargement idempotent.
+    """
+    if watermark is None:
+        return df
+    return df[_past_watermark(df, table, watermark)]
+
+
+def row_hashes(df: pd.DataFrame) -> np.ndarray:
+    """Empreinte de chaque ligne, clé comprise : une ligne nouvelle ou modifiée a une empreinte inconnue."""
+    return pd.util.hash_pandas_object(df, index=False).to_numpy()
+
+
+def _changed(df: pd.DataFrame, previous_hashes: np.ndarray = None) -> np.ndarray:
+    # Sans empreintes du run précédent, rien ne dit quelles lignes ont changé : tout est réémis
+    if previous_hashes is None:
+        return np.ones(len(df), dtype=bool)
+    return ~np.isin(row_hashes(df), previous_hashes)
+
+
+def next_watermark(df: pd.DataFrame, table: str, previous: str = None):
+    values = _watermark_values(df, table).dropna()
+    if values.empty:
+        return previous
+    latest = values.max()
+    if previous is not None:
+        latest = max(latest, pd.Timestamp(previous))
+    return latest.isoformat()
+
+
+def extract_delta(df: pd.DataFrame, table: str, state: dict):
+    """
+    Renvoie (lignes nouvelles ou modifiées, nouveau high-water mark) pour une table.
+    Pour TABLE_CHANGE_TRACKING, les lignes antérieures au watermark mais modifiées depuis le run
+    précédent (empreinte absente de state[ROW_HASHES]) sont aussi réémises.
+    """
+    previous = state.get(table)
+    keep = _past_watermark(df, table, previous)
+    if table in TABLE_CHANGE_TRACKING:
+        keep |= _changed(df, state.get(ROW_HASHES, {}).get(table))
+    delta = df[keep]
+    return delta.drop_duplicates(subset=TABLE_KEYS[table], keep="last"), next_watermark(df, table, previous)
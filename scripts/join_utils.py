@@ -0,0 +1,74 @@
+import numpy as np
+import pandas as pd
+from typing import NamedTuple
+
+# This module resolves foreign keys against dimension id indexes in one pass, instead of chained merges.
+
+
+class Lookup(NamedTuple):
+    """
+    Une clé étrangère `key` de la table de faits, résolue contre `dim[on]` pour ramener `columns`.
+    `dim` peut être un IdIndex déjà construit (réutilisé d'un lot à l'autre en mode chunked).
+    """
+    key: str
+    dim: pd.DataFrame
+    columns: dict
+    on: str = "id"
+    how: str = "inner"
+
+
+class IdIndex:
+    """Index haché des ids d'une dimension : positions des clés par get_indexer, valeurs par take."""
+
+    def __init__(self, dim: pd.DataFrame, on: str = "id"):
+        # Un id dupliqué dans une dimension ferait dupliquer les faits avec un merge ; on garde le premier
+        dim = dim.drop_duplicates(subset=on, keep="first") if dim[on].duplicated().any() else dim
+        self.dim = dim.reset_index(drop=True)
+        self.index = pd.Index(self.dim[on])
+
+    def positions(self, keys: pd.Series) -> np.ndarray:
+        """Position de chaque clé dans la dimension, -1 si absente."""
+        return self.index.get_indexer(keys)
+
+    def take(self, column: str, positions: np.ndarray) -> pd.Series:
+        values = self.dim[column].array
+        return pd.Series(values.take(positions, allow_fill=True), name=column)
+
+
+def orphan_keys(keys: pd.Series, positions: np.ndarray) -> list:
+    """Clés étrangères (non nulles) absentes de la dimension, sans doublons."""
+    missing = keys[(positions < 0) & keys.notna().to_numpy()]
+    return list(pd.unique(missing))
+
+
+def join_dimensions(df: pd.DataFrame, lookups: list, table: str = "fact"):
+    """
+    Résout toutes les clés étrangères de `df` en une passe : une seule sélection des lignes
+    (sémantique des jointures internes) puis un `take` par colonne ramenée.
+    Renvoie (table enrichie, {clé: ids orphelins}) ; les orphelins sont aussi affichés.
+    """
+    resolved = []
+    keep = np.ones(len(df), dtype=bool)
+    orphans = {}
+    for lookup in lookups:
+        keys = df[lookup.key]
+        index = lookup.dim if isinstance(lookup.dim, IdIndex) else IdIndex(lookup.dim, lookup.on)
+        positions = index.positions(keys)
+        missing = orphan_keys(keys, positions)
+        if missing:
+            orphans[lookup.key] = missing
+        if lookup.how == "inner":
+            keep &= positions >= 0
+        resolved.append((lookup, index, positions))
+
+    dropped = int((~keep).sum())
+    for key, missing in orphans.items():
+        print(f"⚠️ {table}: {len(missing)} orphan {key} (e.g. {missing[0]})")
+    if dropped:
+        print(f"⚠️ {table}: {dropped} rows dropped by inner joins")
+
+    result = df[keep].reset_index(drop=True)
+    for lookup, index, positions in resolved:
+        for column, alias in lookup.columns.items():
+            result[alias] = index.take(column, positions[keep])
+    return result, orphans
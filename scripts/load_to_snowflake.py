@@ -1,12 +1,50 @@
 import os
+import re
+import time
 import argparse
+from collections import deque
+from datetime import datetime, timezone
 from dotenv import load_dotenv
 import snowflake.connector
-from olap_io import get_latest_olap_gcs_path
-from gcp import configure_gcp_credentials
+from scripts.csv_builders import TABLE_SCHEMAS
+from scripts.duckdb_warehouse import connect_to_duckdb
+from scripts.olap_io import OFFLINE, get_latest_olap_folder, read_latest_manifest
+from scripts.storage import get_storage
+from scripts.incremental import DELTA_PREFIX
+from scripts.gcp import configure_gcp_credentials
+from scripts.metrics import (
+    PROMETHEUS_TEXTFILE,
+    RUN_REPORT_DIR,
+    add_stage,
+    finish_run,
+    stage,
+    start_run,
+    write_prometheus,
+)
+from scripts.sql_runner import (
+    TABLE_DATA,
+    TABLE_DATA_CHECKSUMS,
+    checksum_statements,
+    current_checksums,
+    execute_batch,
+    forget_checksums_statements,
+    load_script,
+    read_template,
+    render,
+    run_script,
+)
 
 load_dotenv()
 
+# COPY / MERGE lancés en parallèle (requêtes asynchrones sur la même session)
+LOAD_CONCURRENCY = int(os.getenv("LOAD_CONCURRENCY", "4"))
+LOAD_POLL_INTERVAL = float(os.getenv("LOAD_POLL_INTERVAL", "0.5"))
+# Entrepôt cible : Snowflake, ou DuckDB en local (mêmes scripts SQL, stages lus sur le disque)
+WAREHOUSE_BACKENDS = ("snowflake", "duckdb")
+WAREHOUSE_BACKEND = os.getenv("WAREHOUSE_BACKEND", "snowflake").lower()
+# Publication par échange (--staged) : schéma où les tables sont chargées avant le SWAP avec RAW
+STAGING_SCHEMA = os.getenv("LOAD_STAGING_SCHEMA", "RAW_STAGING")
+
 def connect_to_snowflake():
     return snowflake.connector.connect(
         user=os.getenv("SNOWFLAKE_USER"),
@@ -17,64 +55,325 @@ def connect_to_snowflake():
         schema=os.getenv("SNOWFLAKE_SCHEMA")
     )
 
+def connect_to_warehouse(backend: str = WAREHOUSE_BACKEND):
+    if backend not in WAREHOUSE_BACKENDS:
+        raise ValueError(f"❌ Unknown warehouse backend {backend!r} (expected one of {WAREHOUSE_BACKENDS})")
+    return connect_to_duckdb() if backend == "duckdb" else connect_to_snowflake()
 
-def run_sql_file(path: str, conn):
-    with open(path, 'r') as file:
-        content = file.read()
 
-    # Split by semicolon
-    commands = content.split(';')
-    cur = conn.cursor()
+# Table visée par un COPY / MERGE, pour étiqueter les métriques
+STATEMENT_TARGET = re.compile(r"^\s*(COPY|MERGE)\s+INTO\s+(\w+)", re.IGNORECASE)
+# Table touchée par une instruction du script de chargement (CREATE ... TABLE compris), pour les regrouper
+STATEMENT_TABLE = re.compile(
+    r"^\s*(?:(?:COPY|MERGE)\s+INTO|CREATE\s+(?:OR\s+REPLACE\s+)?(?:(?:TEMPORARY|TRANSIENT)\s+)?TABLE(?:\s+IF\s+NOT\s+EXISTS)?)\s+(\w+)",
+    re.IGNORECASE,
+)
 
-    for cmd in commands:
-        cleaned = cmd.strip()
-        # Skip empty or pure comment blocks
-        if not cleaned or cleaned.startswith('--'):
-            continue
-        print(f"▶ Executing: {cleaned}")
-        cur.execute(cleaned)
 
-    cur.close()
+def rows_affected(cur):
+    """Lignes chargées par un COPY (somme de rows_loaded par fichier), sinon rowcount du curseur."""
+    columns = [col[0].lower() for col in (cur.description or [])]
+    if "rows_loaded" in columns:
+        position = columns.index("rows_loaded")
+        return sum(row[position] or 0 for row in cur.fetchall())
+    return cur.rowcount if cur.rowcount is not None and cur.rowcount >= 0 else None
 
-def run_sql_file_with_substitution(path: str, conn, substitutions: dict):
-    with open(path, 'r') as file:
-        content = file.read()
-    for key, val in substitutions.items():
-        content = content.replace(f"{{{{{key}}}}}", val)
 
-    commands = content.split(';')
-    cur = conn.cursor()
+def read_statements(path: str, substitutions: dict = None, replacements: dict = None) -> list:
+    return [statement.text for statement in load_script(path, substitutions, replacements)]
 
-    for cmd in commands:
-        cleaned = cmd.strip()
-        if not cleaned or cleaned.startswith('--'):
-            continue
-        print(f"▶ Executing: {cleaned}")
-        cur.execute(cleaned)
 
-    cur.close()
+def run_sql_file(path: str, conn):
+    return run_script(conn, path)
+
+def run_sql_file_with_substitution(path: str, conn, substitutions: dict, replacements: dict = None):
+    return run_script(conn, path, substitutions, replacements)
+
+
+def group_statements(statements: list) -> dict:
+    """
+    Regroupe les instructions par table, dans l'ordre du script. Une table temporaire `<table>_delta`
+    (MERGE incrémental) appartient au groupe de sa table ; une instruction sans table suit la précédente.
+    Les groupes sont indépendants, les instructions d'un groupe restent séquentielles.
+    """
+    groups = {}
+    table = None
+    for statement in statements:
+        match = STATEMENT_TABLE.match(statement)
+        if match:
+            table = match.group(1).lower().removesuffix("_delta")
+        groups.setdefault(table, []).append(statement)
+    return groups
+
+
+class TableLoad:
+    """Chargement d'une table : ses instructions, exécutées une à une en asynchrone, et leur bilan."""
+
+    def __init__(self, table: str, statements: list):
+        self.table = table
+        self.statements = deque(statements)
+        self.status = "pending"
+        # Lignes chargées par les COPY, et lignes insérées ou mises à jour par le MERGE (incrémental)
+        self.rows = None
+        self.merged = None
+        self.error = None
+        self.query_id = None
+        self.cursor = None
+        self.started = None
+        self.wall_s = 0.0
+
+    def record(self, statement: str, status: str, elapsed: float, rows=None) -> dict:
+        return {"stage": "sql", "labels": {"table": self.table, "statement": statement.split(None, 1)[0].upper()},
+                "query_id": self.query_id, "rows_in": None, "rows_out": rows, "bytes": None, "status": status,
+                "wall_s": elapsed, "cpu_s": None, "peak_rss_mb": None}
+
+
+def _submit(conn, load: TableLoad):
+    statement = load.statements[0]
+    print(f"▶ [{load.table}] Submitting: {statement.splitlines()[0]}")
+    load.cursor = conn.cursor()
+    load.cursor.execute_async(statement)
+    load.query_id = load.cursor.sfqid
+    load.status = "running"
+    load.started = time.perf_counter()
+
+
+def _poll(conn, load: TableLoad) -> bool:
+    """Avance `load` si sa requête courante est terminée ; renvoie False tant qu'elle tourne."""
+    status = conn.get_query_status(load.query_id)
+    if conn.is_still_running(status):
+        return False
+    statement = load.statements.popleft()
+    elapsed = time.perf_counter() - load.started
+    load.wall_s += elapsed
+    try:
+        # Lève l'erreur Snowflake de la requête (message, code) si elle a échoué
+        conn.get_query_status_throw_if_error(load.query_id)
+        load.cursor.get_results_from_sfqid(load.query_id)
+        rows = rows_affected(load.cursor)
+    except Exception as e:
+        load.status, load.error = "failed", str(e).strip().splitlines()[0]
+        load.statements.clear()
+        add_stage(load.record(statement, "error", elapsed))
+        print(f"❌ [{load.table}] {load.error}")
+        return True
+    finally:
+        load.cursor.close()
+    # Le COPY d'un delta puis son MERGE portent sur les mêmes lignes : comptées séparément, jamais additionnées
+    target = STATEMENT_TARGET.match(statement)
+    if target and rows is not None:
+        if target.group(1).upper() == "COPY":
+            load.rows = (load.rows or 0) + rows
+        else:
+            load.merged = (load.merged or 0) + rows
+    add_stage(load.record(statement, "ok", elapsed, rows))
+    load.status = "loaded" if not load.statements else "pending"
+    return True
+
+
+def run_statements_parallel(conn, statements: list, concurrency: int = LOAD_CONCURRENCY,
+                            poll_interval: float = LOAD_POLL_INTERVAL, skip_tables=()) -> list:
+    """
+    Exécute les groupes de `group_statements` en parallèle via execute_async : au plus `concurrency`
+    requêtes en vol, chaque groupe enchaîne ses instructions dans l'ordre. Un groupe en échec s'arrête
+    sans bloquer les autres. Les tables de `skip_tables` ne sont pas chargées. Renvoie un TableLoad par table.
+    """
+    loads = [TableLoad(table, group) for table, group in group_statements(statements).items()
+             if table not in skip_tables]
+    queue = deque(loads)
+    running = []
+    while queue or running:
+        while queue and len(running) < concurrency:
+            load = queue.popleft()
+            _submit(conn, load)
+            running.append(load)
+        progressed = False
+        for load in list(running):
+            if not _poll(conn, load):
+                continue
+            progressed = True
+            if load.status == "pending":
+                _submit(conn, load)
+            else:
+                running.remove(load)
+        if not progressed:
+            time.sleep(poll_interval)
+    return loads
+
+
+def print_load_summary(loads: list):
+    print("📋 Load summary:")
+    print(f"   {'table':<22}{'status':>10}{'loaded':>12}{'merged':>12}{'seconds':>10}")
+    for load in loads:
+        rows = "" if load.rows is None else load.rows
+        merged = "" if load.merged is None else load.merged
+        print(f"   {load.table:<22}{load.status:>10}{rows:>12}{merged:>12}{load.wall_s:>10.2f}"
+              f"{f'  {load.error}' if load.error else ''}")
+
+
+def run_load_script(path: str, conn, substitutions: dict, concurrency: int = LOAD_CONCURRENCY,
+                    skip_tables=()) -> list:
+    """
+    Charge les tables du script en parallèle, sauf `skip_tables` ; lève une erreur listant les tables en échec.
+    """
+    loads = run_statements_parallel(conn, read_statements(path, substitutions), concurrency, skip_tables=skip_tables)
+    print_load_summary(loads)
+    failed = [load for load in loads if load.status != "loaded"]
+    if failed:
+        raise RuntimeError(f"❌ Load failed for {len(failed)}/{len(loads)} table(s): "
+                           + "; ".join(f"{load.table}: {load.error}" for load in failed))
+    return loads
+
+
+def use_schema(conn, schema: str):
+    cur = conn.cursor()
+    try:
+        cur.execute(f"USE SCHEMA {schema};")
+    finally:
+        cur.close()
 
 
+def row_counts(conn, tables: list) -> dict:
+    """Nombre de lignes de chaque table du schéma courant, en une requête."""
+    cur = conn.cursor()
+    try:
+        cur.execute(" UNION ALL ".join(f"SELECT '{table}', COUNT(*) FROM {table}" for table in tables))
+        return {table: count for table, count in cur.fetchall()}
+    finally:
+        cur.close()
+
+
+def publish_staged(conn, manifest: dict, path: str, substitutions: dict, concurrency: int = LOAD_CONCURRENCY,
+                   skip_tables=(), schema: str = "RAW", staging: str = STAGING_SCHEMA) -> list:
+    """
+    Chargement complet sans fenêtre de tables vides : les tables sont recréées et chargées en parallèle dans
+    `staging`, leur nombre de lignes est comparé au manifeste de l'ETL, puis chacune est échangée avec celle
+    de `schema` (ALTER TABLE ... SWAP WITH, atomique). Rien n'est publié si une table échoue ou diverge.
+    Reprise par table : une table déjà chargée et validée en staging (empreinte du manifeste enregistrée dans
+    le schéma de staging) n'est pas recopiée. Après l'échange, la version précédente reçue par `staging` est
+    supprimée : le stockage ne garde pas une seconde copie complète de RAW entre deux publications.
+    Renvoie les tables publiées.
+    """
+    tables = [table for table in manifest["tables"] if table not in skip_tables]
+    if not tables:
+        return []
+
+    execute_batch(conn, [f"CREATE SCHEMA IF NOT EXISTS {staging}"], "publish")
+    use_schema(conn, staging)
+    try:
+        resumed = unchanged_tables(conn, manifest) & set(tables)
+        if resumed:
+            print(f"⏯ Already staged and validated, not copied again: {', '.join(sorted(resumed))}")
+        to_copy = [table for table in tables if table not in resumed]
+        forget_table_fingerprints(conn, to_copy, "publish")
+        idle = {table.upper() for table in TABLE_SCHEMAS if table not in to_copy}
+        run_script(conn, "scripts/sql/create_tables.sql", skip_objects=idle)
+
+        print(f"📤 Loading {len(to_copy)} table(s) into {staging}...")
+        loads = run_statements_parallel(conn, read_statements(path, substitutions), concurrency,
+                                        skip_tables=set(TABLE_SCHEMAS) - set(to_copy))
+        print_load_summary(loads)
+
+        # 🔎 Lignes présentes en staging contre lignes écrites par l'ETL (manifeste)
+        counts = row_counts(conn, tables)
+        problems = {load.table: load.error for load in loads if load.status != "loaded"}
+        for table in tables:
+            expected = manifest["tables"][table]["rows"]
+            if table not in problems and counts.get(table) != expected:
+                problems[table] = f"{counts.get(table)} rows staged, manifest says {expected}"
+        record_table_fingerprints(conn, manifest, [load for load in loads if load.table not in problems], "publish")
+        if problems:
+            raise RuntimeError(f"❌ Staged load failed for {len(problems)}/{len(tables)} table(s), nothing published: "
+                               + "; ".join(f"{table}: {error}" for table, error in problems.items()))
+    finally:
+        use_schema(conn, schema)
+
+    # 🔁 Un SWAP par table, chacun suivi de ses empreintes : une reprise après un échec ici ne recopie rien.
+    # La version précédente, passée en staging par l'échange, est supprimée aussitôt
+    texts = []
+    for table in tables:
+        fingerprint = manifest["tables"][table].get("fingerprint")
+        texts.append(f"ALTER TABLE {table} SWAP WITH {staging}.{table}")
+        texts.append(f"DROP TABLE IF EXISTS {staging}.{table}")
+        texts += forget_checksums_statements(TABLE_DATA, [table.upper()], schema=staging)
+        texts += forget_checksums_statements(TABLE_DATA, [table.upper()])
+        if fingerprint:
+            texts += checksum_statements([(TABLE_DATA, table.upper(), fingerprint)])
+    with stage("publish", tables=len(tables)):
+        execute_batch(conn, texts, "publish")
+    print(f"🔁 Published {len(tables)} table(s) from {staging} into {schema}")
+    return tables
 
-def print_sql_file(path: str, substitutions: dict = None):
-    with open(path, 'r') as file:
-        content = file.read()
-    if substitutions:
-        for key, val in substitutions.items():
-            content = content.replace(f"{{{{{key}}}}}", val)
-    print(content)
 
 
-def main(dry_run=False):
-    print("🔐 Configuring GCP credentials...")
-    configure_gcp_credentials()
+def print_sql_file(path: str, substitutions: dict = None):
+    print(render(read_template(path), substitutions))
+
+
+def unchanged_tables(conn, manifest: dict) -> set:
+    """Tables dont l'empreinte du manifeste est celle des données déjà chargées (et qui existent encore)."""
+    fingerprints = {name: entry["fingerprint"] for name, entry in (manifest or {}).get("tables", {}).items()
+                    if entry.get("fingerprint")}
+    if not fingerprints:
+        return set()
+    loaded = current_checksums(conn, TABLE_DATA_CHECKSUMS)
+    return {name for name, fingerprint in fingerprints.items() if loaded.get((TABLE_DATA, name.upper())) == fingerprint}
+
+
+def forget_table_fingerprints(conn, tables: list, source: str):
+    if tables:
+        execute_batch(conn, forget_checksums_statements(TABLE_DATA, [t.upper() for t in tables]), source)
+
+
+def record_table_fingerprints(conn, manifest: dict, loads: list, source: str):
+    """
+    Marque à jour les tables chargées avec exactement le nombre de lignes du manifeste.
+    Un COPY qui n'a trouvé aucun fichier (ou pas tous) finit « loaded » avec moins de lignes :
+    son empreinte est oubliée et le run échoue, pour que le prochain run recharge la table.
+    """
+    tables = manifest.get("tables", {}) if manifest else {}
+    loaded = [load for load in loads if load.status == "loaded" and load.table in tables]
+    mismatched = {load.table: load.rows or 0 for load in loaded if (load.rows or 0) != tables[load.table]["rows"]}
+    entries = [(TABLE_DATA, load.table.upper(), tables[load.table]["fingerprint"])
+               for load in loaded if load.table not in mismatched and tables[load.table].get("fingerprint")]
+    if entries:
+        execute_batch(conn, checksum_statements(entries), source)
+    if mismatched:
+        forget_table_fingerprints(conn, list(mismatched), source)
+        detail = ", ".join(f"{t}: {rows} rows loaded, manifest says {tables[t]['rows']}"
+                           for t, rows in sorted(mismatched.items()))
+        raise RuntimeError(f"❌ Loaded row counts do not match the manifest ({detail})")
+
+
+# En incrémental, les tables existantes sont conservées : les deltas y sont fusionnés
+INCREMENTAL_REPLACEMENTS = {
+    "CREATE OR REPLACE TABLE": "CREATE TABLE IF NOT EXISTS",
+    "CREATE OR REPLACE TRANSIENT TABLE": "CREATE TRANSIENT TABLE IF NOT EXISTS",
+}
+
+
+def main(dry_run=False, incremental=False, report_path=None, prometheus_path=PROMETHEUS_TEXTFILE,
+         concurrency=LOAD_CONCURRENCY, backend=WAREHOUSE_BACKEND, staged=False):
+    if staged and incremental:
+        raise ValueError("❌ --staged publishes full loads only (incremental loads already MERGE in place)")
+    # 🛡 Credentials inutiles en mode OFFLINE : stages et sorties OLAP lus dans le stockage local
+    if not OFFLINE:
+        print("🔐 Configuring GCP credentials...")
+        configure_gcp_credentials()
 
     bucket = os.getenv("GCS_BUCKET")
     if not bucket:
         raise EnvironmentError("❌ GCS_BUCKET is not set in environment")
 
     print("📁 Locating latest OLAP folder...")
-    olap_path = get_latest_olap_gcs_path(bucket)
+    # Un seul GET du pointeur LATEST (listing des dossiers seulement pour les runs sans manifeste)
+    prefix = DELTA_PREFIX if incremental else "olap_outputs/"
+    store = get_storage(bucket)
+    manifest = read_latest_manifest(store, prefix)
+    olap_path = manifest["folder"] if manifest is not None else get_latest_olap_folder(store, prefix)
+    load_script = "scripts/sql/merge_into_tables.sql" if incremental else "scripts/sql/copy_into_tables.sql"
+    if staged and manifest is None:
+        raise RuntimeError(f"❌ --staged needs the run manifest to validate row counts, none found in {olap_path}")
 
     substitutions = {
         "BUCKET": bucket,
@@ -88,7 +387,7 @@ def main(dry_run=False):
             ("SETUP INFRASTRUCTURE", "scripts/sql/setup_snowflake_infra.sql"),
             ("CREATE TABLES", "scripts/sql/create_tables.sql"),
             ("CREATE VIEWS", "scripts/sql/view_for_analytics.sql"),
-            ("COPY INTO", "scripts/sql/copy_into_tables.sql")
+            ("COPY INTO", load_script)
         ]:
             print(f"\n-- {label} ({path}) --")
             print_sql_file(path, substitutions if "COPY" in label else None)
@@ -96,8 +395,13 @@ def main(dry_run=False):
         print("\n✅ No SQL was executed.")
         return
 
-    print("❄️ Connecting to Snowflake...")
-    conn = connect_to_snowflake()
+    run_id = datetime.now(timezone.utc).strftime("%Y-%m-%d_%H-%M-%S")
+    mode = "incremental" if incremental else "staged" if staged else "full"
+    start_run("load", mode=mode, olap_path=olap_path, backend=backend)
+
+    print(f"❄️ Connecting to {backend}...")
+    with stage("connect"):
+        conn = connect_to_warehouse(backend)
 
     print("🏗️ Running infrastructure setup...")
     run_sql_file("scripts/sql/setup_snowflake_infra.sql", conn)
@@ -119,8 +423,21 @@ def main(dry_run=False):
         cur.execute(f"USE WAREHOUSE {os.getenv('SNOWFLAKE_WAREHOUSE')};")
     cur.close()
 
+    # ♻️ Rechargement complet : les tables dont les données chargées ont déjà l'empreinte du manifeste
+    # ne sont ni recréées ni rechargées
+    skipped = set() if incremental else unchanged_tables(conn, manifest)
+    if skipped:
+        print(f"⏭ Unchanged since last load, skipped: {', '.join(sorted(skipped))}")
+    if not incremental and not staged:
+        forget_table_fingerprints(conn, [t for t in (manifest or {}).get("tables", {}) if t not in skipped],
+                                  "create_tables.sql")
+
     print("🧱 Creating tables...")
-    run_sql_file("scripts/sql/create_tables.sql", conn)
+    # En publication par échange, les tables de RAW ne sont créées que si elles manquent (cible du SWAP)
+    if incremental or staged:
+        run_sql_file_with_substitution("scripts/sql/create_tables.sql", conn, {}, INCREMENTAL_REPLACEMENTS)
+    else:
+        run_script(conn, "scripts/sql/create_tables.sql", skip_objects={t.upper() for t in skipped})
 
     print("📊 Creating views...")
     run_sql_file("scripts/sql/view_for_analytics.sql", conn)
@@ -128,15 +445,42 @@ def main(dry_run=False):
     print("☁️ Creating GCS stage...")
     run_sql_file_with_substitution("scripts/sql/create_stage.sql", conn, substitutions)
 
-    print("📤 Loading data from GCS to Snowflake via COPY INTO...")
-    run_sql_file_with_substitution("scripts/sql/copy_into_tables.sql", conn, substitutions)
-
-
+    if incremental:
+        print(f"🔀 Merging deltas from GCS into {backend} via MERGE INTO...")
+    elif staged:
+        print(f"🔁 Loading into {STAGING_SCHEMA}, then swapping into RAW...")
+    else:
+        print(f"📤 Loading data from GCS to {backend} via COPY INTO...")
+    try:
+        if staged:
+            publish_staged(conn, manifest, load_script, substitutions, concurrency, skip_tables=skipped)
+        else:
+            loads = run_load_script(load_script, conn, substitutions, concurrency, skip_tables=skipped)
+            if not incremental:
+                record_table_fingerprints(conn, manifest, loads, load_script)
+    finally:
+        # Le rapport JSON est écrit même en cas d'échec ; le textfile Prometheus, qui porte
+        # l'horodatage du dernier succès, seulement si le chargement a abouti
+        report = finish_run(report_path or f"{RUN_REPORT_DIR}/load_{run_id}.json")
+        conn.close()
+    if prometheus_path:
+        write_prometheus(report, prometheus_path)
     print("🎉 All done!")
 
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Load latest OLAP data into Snowflake from GCS.")
     parser.add_argument("--dry-run", action="store_true", help="Print SQL commands without executing.")
+    parser.add_argument("--incremental", action="store_true", help="Merge the latest delta folder instead of a full reload.")
+    parser.add_argument("--report", help="Path of the JSON run report (default RUN_REPORT_DIR/load_<timestamp>.json).")
+    parser.add_argument("--prometheus", default=PROMETHEUS_TEXTFILE,
+                        help="Also write the run and stage metrics to this Prometheus textfile (on success).")
+    parser.add_argument("--concurrency", type=int, default=LOAD_CONCURRENCY,
+                        help="Tables loaded concurrently (async COPY/MERGE queries, default LOAD_CONCURRENCY).")
+    parser.add_argument("--backend", choices=WAREHOUSE_BACKENDS, default=WAREHOUSE_BACKEND,
+                        help="Target warehouse: snowflake, or a local DuckDB database (DUCKDB_PATH) for offline runs.")
+    parser.add_argument("--staged", action="store_true",
+                        help="Load into LOAD_STAGING_SCHEMA, check row counts against the manifest, then swap into RAW.")
     args = parser.parse_args()
-    main(dry_run=args.dry_run)
+    main(dry_run=args.dry_run, incremental=args.incremental, report_path=args.report,
+         prometheus_path=args.prometheus, concurrency=args.concurrency, backend=args.backend, staged=args.staged)
@@ -0,0 +1,84 @@
+import json
+import hashlib
+
+import numpy as np
+import pandas as pd
+
+from scripts.csv_builders import TABLE_SCHEMAS
+from scripts.metrics import stage
+from scripts.olap_io import GZIP_OUTPUT, output_extension, output_target, publish_manifest, read_latest_manifest
+
+# This module fingerprints output tables and builds the per-run manifest (tables, files, schemas, hashes).
+
+
+def table_fingerprint(df: pd.DataFrame, name: str, fmt: str, compress: bool = None) -> str:
+    """
+    Empreinte stable du contenu d'une table : hash de chaque ligne (valeurs, pas les dtypes pandas),
+    triés pour ne pas dépendre de l'ordre des lignes, plus le schéma et le format de sortie
+    (des fichiers réutilisés doivent être lisibles par le même COPY).
+    """
+    compress = GZIP_OUTPUT if compress is None else compress
+    digest = hashlib.sha256()
+    digest.update(json.dumps([TABLE_SCHEMAS[name], output_extension(fmt, compress)]).encode())
+    columns = list(TABLE_SCHEMAS[name])
+    row_hashes = pd.util.hash_pandas_object(df[columns], index=False).to_numpy()
+    digest.update(np.sort(row_hashes).tobytes())
+    return digest.hexdigest()
+
+
+def write_manifest(timestamp: str, fmt: str, results: list, prefix: str = "olap_outputs/", mode: str = "full",
+                   compress: bool = None) -> dict:
+    """
+    Manifeste du run, publié une fois toutes les tables écrites : pour chaque table, fichiers (relatifs
+    au dossier), lignes, schéma logique, extension et empreinte (None si non calculée, ex. mode chunked).
+    """
+    compress = GZIP_OUTPUT if compress is None else compress
+    store, folder = output_target(timestamp, prefix)
+    manifest = {
+        "timestamp": timestamp,
+        "folder": folder,
+        "format": fmt,
+        "mode": mode,
+        "tables": {
+            r["table"]: {
+                "files": r.get("files", []),
+                "rows": r["rows"],
+                "schema": TABLE_SCHEMAS[r["table"]],
+                "extension": output_extension(fmt, compress),
+                "fingerprint": r.get("fingerprint"),
+                "reused_from": r.get("reused_from"),
+            }
+            for r in results
+        },
+    }
+    publish_manifest(store, manifest, prefix)
+    return manifest
+
+
+def previous_manifest(timestamp: str, prefix: str = "olap_outputs/"):
+    """Manifeste du dernier run publié (pointeur LATEST), ou None."""
+    store, _ = output_target(timestamp, prefix)
+    return read_latest_manifest(store, prefix)
+
+
+def reuse_unchanged(name: str, fingerprint: str, previous: dict, timestamp: str,
+                    prefix: str = "olap_outputs/"):
+    """
+    Si la table a la même empreinte qu'au run précédent et que ses fichiers existent encore,
+    ils sont recopiés côté serveur dans le dossier du run (rien n'est encodé ni uploadé).
+    Renvoie les fichiers réutilisés (relatifs au dossier), sinon None.
+    """
+    entry = (previous or {}).get("tables", {}).get(name)
+    if not entry or entry.get("fingerprint") != fingerprint:
+        return None
+    store, folder = output_target(timestamp, prefix)
+    source = previous["folder"]
+    if not all(store.exists(f"{source}{f}") for f in entry["files"]):
+        return None
+    if source != folder:
+        with stage("reuse", table=name) as record:
+            for f in entry["files"]:
+                store.copy(f"{source}{f}", f"{folder}{f}")
+            record["rows_out"] = entry["rows"]
+    print(f"♻️ {name} unchanged (fingerprint {fingerprint[:12]}), reusing {source}")
+    return entry["files"]
@@ -0,0 +1,245 @@
+import os
+import json
+import time
+import resource
+import cProfile
+import threading
+from pathlib import Path
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+from dotenv import load_dotenv
+
+# This module records per-stage run metrics (time, CPU, rows, bytes, memory) and optional builder profiles.
+
+load_dotenv()
+
+RUN_REPORT_DIR = os.getenv("RUN_REPORT_DIR", "run_reports")
+PROMETHEUS_TEXTFILE = os.getenv("PROMETHEUS_TEXTFILE")
+PROFILE_BUILDERS = os.getenv("PROFILE_BUILDERS", "").lower()
+PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")
+PROFILERS = ("cprofile", "pyinstrument")
+METRIC_PREFIX = "stripe_olap"
+
+_CLEAR_REFS = Path("/proc/self/clear_refs")
+_STATUS = Path("/proc/self/status")
+
+_ACTIVE = None
+
+
+def _status_kb(field: str):
+    for line in _STATUS.read_text().splitlines():
+        if line.startswith(field):
+            return int(line.split()[1])
+    return None
+
+
+def reset_peak_rss() -> int:
+    """
+    Remet le pic de RSS au niveau courant (Linux : clear_refs = 5) et renvoie le RSS courant en Ko.
+    Ailleurs, ru_maxrss est cumulatif : le pic mesuré est alors celui du process.
+    """
+    if _CLEAR_REFS.exists():
+        try:
+            _CLEAR_REFS.write_text("5")
+            return _status_kb("VmRSS:")
+        except OSError:
+            pass
+    return 0
+
+
+def peak_rss_kb() -> int:
+    if _STATUS.exists():
+        return _status_kb("VmHWM:")
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+class RunRecorder:
+    """Métriques d'un run : une entrée par étape, ajoutées depuis n'importe quel thread."""
+
+    def __init__(self, run: str, **labels):
+        self.run = run
+        self.labels = labels
+        self.started_at = datetime.now(timezone.utc)
+        self.stages = []
+        self._start_wall = time.perf_counter()
+        self._start_cpu = time.process_time()
+        self._active_stages = 0
+        self._lock = threading.Lock()
+
+    def add(self, record: dict):
+        with self._lock:
+            self.stages.append(record)
+
+    def report(self) -> dict:
+        return {
+            "run": self.run,
+            "labels": self.labels,
+            "started_at": self.started_at.isoformat(),
+            "finished_at": datetime.now(timezone.utc).isoformat(),
+            "wall_s": time.perf_counter() - self._start_wall,
+            "cpu_s": time.process_time() - self._start_cpu,
+            "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+            "stages": list(self.stages),
+        }
+
+    def write_json(self, path) -> Path:
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps(self.report(), indent=2, default=str))
+        print(f"🧾 Run report written to {path}")
+        return path
+
+    def write_prometheus(self, path) -> Path:
+        return write_prometheus(self.report(), path)
+
+
+# Métriques exportées par étape : (champ du rapport, nom, description)
+STAGE_METRICS = [
+    ("wall_s", "stage_wall_seconds", "Wall-clock time of an ETL stage."),
+    ("cpu_s", "stage_cpu_seconds", "CPU time of the thread running an ETL stage."),
+    ("rows_in", "stage_rows_in", "Rows read by an ETL stage."),
+    ("rows_out", "stage_rows_out", "Rows produced by an ETL stage."),
+    ("bytes", "stage_bytes", "Bytes moved by an ETL stage."),
+    ("peak_rss_mb", "stage_peak_rss_megabytes", "Peak resident memory observed during an ETL stage."),
+]
+
+
+def _labels(values: dict) -> str:
+    escaped = (f'{k}="{str(v).replace(chr(92), chr(92) * 2).replace(chr(34), chr(92) + chr(34))}"'
+               for k, v in values.items())
+    return "{" + ",".join(escaped) + "}"
+
+
+def prometheus_text(report: dict) -> str:
+    base = {"run": report["run"], **report["labels"]}
+    lines = []
+    for field, name, help_text in STAGE_METRICS:
+        lines += [f"# HELP {METRIC_PREFIX}_{name} {help_text}", f"# TYPE {METRIC_PREFIX}_{name} gauge"]
+        for record in report["stages"]:
+            if record.get(field) is None:
+                continue
+            labels = _labels({**base, "stage": record["stage"], **record["labels"]})
+            lines.append(f"{METRIC_PREFIX}_{name}{labels} {record[field]}")
+    for field, name, help_text in [("wall_s", "run_wall_seconds", "Wall-clock time of the whole run."),
+                                   ("cpu_s", "run_cpu_seconds", "CPU time of the whole run."),
+                                   ("peak_rss_mb", "run_peak_rss_megabytes", "Peak resident memory of the run.")]:
+        lines += [f"# HELP {METRIC_PREFIX}_{name} {help_text}", f"# TYPE {METRIC_PREFIX}_{name} gauge",
+                  f"{METRIC_PREFIX}_{name}{_labels(base)} {report[field]}"]
+    lines.append(f"{METRIC_PREFIX}_run_last_success_timestamp_seconds{_labels(base)} {time.time():.0f}")
+    return "\n".join(lines) + "\n"
+
+
+def write_prometheus(report: dict, path) -> Path:
+    """
+    Textfile au format d'exposition Prometheus (collecteur textfile de node_exporter).
+    Il porte l'horodatage du dernier succès : ne l'écrire que pour un run qui a abouti.
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(path.name + ".tmp")
+    tmp_path.write_text(prometheus_text(report))
+    # Renommage atomique : node_exporter ne lit jamais un fichier à moitié écrit
+    tmp_path.replace(path)
+    print(f"📈 Prometheus metrics written to {path}")
+    return path
+
+
+def start_run(run: str, **labels) -> RunRecorder:
+    """Active un recorder pour le process : les `stage()` suivants y sont enregistrés."""
+    global _ACTIVE
+    _ACTIVE = RunRecorder(run, **labels)
+    return _ACTIVE
+
+
+def finish_run(report_path=None, prometheus_path=None) -> dict:
+    """Désactive le recorder courant, écrit ses sorties et renvoie le rapport."""
+    global _ACTIVE
+    recorder, _ACTIVE = _ACTIVE, None
+    if recorder is None:
+        return {}
+    if report_path:
+        recorder.write_json(report_path)
+    if prometheus_path:
+        recorder.write_prometheus(prometheus_path)
+    return recorder.report()
+
+
+def add_stage(record: dict):
+    """Ajoute une étape mesurée ailleurs (ex. dans un worker du pool de processus)."""
+    if _ACTIVE is not None:
+        _ACTIVE.add(record)
+
+
+@contextmanager
+def stage(name: str, **labels):
+    """
+    Mesure une étape : temps mur, temps CPU du thread, pic de RSS, statut.
+    L'appelant complète rows_in / rows_out / bytes sur le dict fourni. Sans recorder actif,
+    la mesure est faite mais n'est enregistrée nulle part (le dict reste utilisable).
+    Le pic de RSS n'est remis à zéro que si aucune autre étape n'est en cours ; en parallèle,
+    il couvre les étapes qui se chevauchent.
+    """
+    recorder = _ACTIVE
+    record = {"stage": name, "labels": labels, "rows_in": None, "rows_out": None, "bytes": None}
+    if recorder is not None:
+        with recorder._lock:
+            recorder._active_stages += 1
+            if recorder._active_stages == 1:
+                reset_peak_rss()
+    start_wall, start_cpu = time.perf_counter(), time.thread_time()
+    record["status"] = "error"
+    try:
+        yield record
+        record["status"] = "ok"
+    finally:
+        record["wall_s"] = time.perf_counter() - start_wall
+        record["cpu_s"] = time.thread_time() - start_cpu
+        record["peak_rss_mb"] = peak_rss_kb() / 1024
+        if recorder is not None:
+            with recorder._lock:
+                recorder._active_stages -= 1
+            recorder.add(record)
+
+
+@contextmanager
+def profile_builder(name: str, profiler: str = None, out_dir=PROFILE_DIR):
+    """
+    Profil opt-in d'un builder (PROFILE_BUILDERS=cprofile|pyinstrument ou --profile).
+    cProfile écrit <out_dir>/<name>.prof (snakeviz, pstats) ; pyinstrument un rapport HTML.
+    À utiliser avec --workers 1 : un seul profileur peut être actif par thread.
+    """
+    profiler = (profiler if profiler is not None else PROFILE_BUILDERS) or None
+    if profiler is None:
+        yield
+        return
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+
+    if profiler == "pyinstrument":
+        try:
+            from pyinstrument import Profiler
+        except ImportError:
+            print("⚠️ pyinstrument is not installed, falling back to cProfile")
+            profiler = "cprofile"
+        else:
+            prof = Profiler()
+            prof.start()
+            try:
+                yield
+            finally:
+                prof.stop()
+                path = out_dir / f"{name}.html"
+                path.write_text(prof.output_html())
+                print(f"🔬 Profile written to {path}")
+            return
+
+    prof = cProfile.Profile()
+    prof.enable()
+    try:
+        yield
+    finally:
+        prof.disable()
+        path = out_dir / f"{name}.prof"
+        prof.dump_stats(path)
+        print(f"🔬 Profile written to {path}")
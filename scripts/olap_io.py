@@ -1,69 +1,278 @@
 import os
 import re
 import json
+import gzip
+import codecs
 from io import BytesIO
-from pathlib import Path
 from datetime import timezone
 
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
 from dotenv import load_dotenv
-from google.cloud import storage
+
+from scripts.csv_builders import BUILDERS, TABLE_SCHEMAS, cluster_permutation, compact_dtypes, validate_frame
+from scripts.blob_cache import get_blob_cache
+from scripts.metrics import stage
+from scripts.storage import GCSStorage, LocalStorage, configure_storage_client, get_storage, get_storage_client
 
 load_dotenv()
 
 GCS_BUCKET = os.getenv("GCS_BUCKET")
 ENV = os.getenv("ENV", "DEV").upper()
 
+# Format des sorties OLAP : csv (historique) ou parquet (typé, compressé)
+OUTPUT_FORMATS = ("csv", "parquet")
+OUTPUT_FORMAT = os.getenv("OUTPUT_FORMAT", "csv").lower()
+PARQUET_COMPRESSION = os.getenv("PARQUET_COMPRESSION", "snappy")
+
+ARROW_TYPES = {
+    "string": pa.string(),
+    "integer": pa.int64(),
+    "float": pa.float64(),
+    "boolean": pa.bool_(),
+    "timestamp": pa.timestamp("us"),
+}
+
+CONTENT_TYPES = {
+    "csv": "text/csv",
+    "csv.gz": "application/gzip",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+# Écriture en flux : les tables sont encodées par tranches de WRITE_SLICE_ROWS lignes,
+# envoyées au fil de l'eau (jamais de buffer complet en mémoire)
+WRITE_SLICE_ROWS = int(os.getenv("WRITE_SLICE_ROWS", "50000"))
+# CSV compressés à la volée (.csv.gz, détectés par COPY avec COMPRESSION = AUTO)
+GZIP_OUTPUT = os.getenv("GZIP_OUTPUT", "0") == "1"
+# Taille visée d'un part file : au-delà, une table est découpée (COPY charge les parts en parallèle)
+PART_SIZE_MB = float(os.getenv("PART_SIZE_MB", "100"))
+PART_SAMPLE_ROWS = 10_000
+
+DUMP_PATTERN = r"db_dump_prod_.*\.json$"
+DUMP_CHUNK_SIZE = int(os.getenv("DUMP_CHUNK_SIZE", 8 * 1024 * 1024))
+
+# Mode hors-ligne : le dump est lu depuis un dossier local au lieu de GCS
+OFFLINE = os.getenv("OFFLINE", "0") == "1"
+LOCAL_DUMP_DIR = os.getenv("LOCAL_DUMP_DIR", "tests/data/oltp_dump")
+
+class _JsonChunkReader:
+    """
+    Lit un document JSON par morceaux de `chunk_size` octets.
+    Seul le morceau courant et l'enregistrement en cours de décodage restent en mémoire.
+    Chaque raw_decode repart d'un memo de clés vide : les clés sont mises en commun ici, sur tout
+    le dump, pour que les enregistrements partagent leurs chaînes de clés comme avec json.load.
+    """
+
+    def __init__(self, fileobj, chunk_size: int):
+        self.fileobj = fileobj
+        self.chunk_size = chunk_size
+        self.keys = {}
+        self._decoder = json.JSONDecoder(object_pairs_hook=self._shared_keys)
+        self.utf8 = codecs.getincrementaldecoder("utf-8")()
+        self.buf = ""
+        self.pos = 0
+        self.eof = False
+
+    def _shared_keys(self, pairs: list) -> dict:
+        keys = self.keys
+        return {keys.setdefault(key, key): value for key, value in pairs}
+
+    def fill(self) -> bool:
+        if self.eof:
+            return False
+        raw = self.fileobj.read(self.chunk_size)
+        if not raw:
+            self.eof = True
+            text = self.utf8.decode(b"", final=True)
+        else:
+            text = raw if isinstance(raw, str) else self.utf8.decode(raw)
+        self.buf = self.buf[self.pos:] + text
+        self.pos = 0
+        return True
+
+    def peek(self) -> str:
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos] in " \t\n\r":
+                self.pos += 1
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self.fill():
+                return ""
+
+    def expect(self, char: str):
+        found = self.peek()
+        if found != char:
+            raise ValueError(f"Malformed dump: expected '{char}' at offset {self.pos}, got '{found or 'EOF'}'")
+        self.pos += 1
+
+    def decode_value(self):
+        self.peek()
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self.buf, self.pos)
+            except json.JSONDecodeError:
+                if not self.fill():
+                    raise
+                continue
+            # Un nombre en fin de buffer peut être tronqué : on relit avant de conclure
+            if end == len(self.buf) and self.fill():
+                continue
+            self.pos = end
+            return value
+
+    def iter_array(self):
+        self.expect("[")
+        if self.peek() == "]":
+            self.pos += 1
+            return
+        while True:
+            yield self.decode_value()
+            if self.peek() == ",":
+                self.pos += 1
+                continue
+            self.expect("]")
+            return
+
+
+def iter_json_dump(fileobj, chunk_size: int = DUMP_CHUNK_SIZE):
+    """
+    Parcourt un dump `{"table": [records...], ...}` sans le charger en entier.
+    Produit des paires (table, itérateur d'enregistrements), une table à la fois.
+    Un itérateur non consommé est vidé avant de passer à la table suivante.
+    """
+    reader = _JsonChunkReader(fileobj, chunk_size)
+    reader.expect("{")
+    while reader.peek() != "}":
+        table = reader.decode_value()
+        reader.expect(":")
+        if reader.peek() == "[":
+            records = reader.iter_array()
+            yield table, records
+            for _ in records:
+                pass
+        else:
+            # Valeur non tabulaire au premier niveau : ignorée
+            reader.decode_value()
+        if reader.peek() == ",":
+            reader.pos += 1
+    reader.expect("}")
+
+
+def stream_oltp_tables(fileobj, tables=None, chunk_size: int = DUMP_CHUNK_SIZE):
+    """
+    Produit (table, liste d'enregistrements) une table à la fois.
+    Les tables absentes de `tables` sont parcourues puis jetées sans être matérialisées.
+    """
+    wanted = set(tables) if tables is not None else None
+    for table, records in iter_json_dump(fileobj, chunk_size):
+        if wanted is None or table in wanted:
+            yield table, list(records)
+
+
+def open_latest_oltp_dump(bucket_name=None, prefix="dump/", client=None, local_dir=None,
+                          chunk_size: int = DUMP_CHUNK_SIZE):
+    """
+    Ouvre le dernier dump en lecture binaire, sans le télécharger en entier.
+    Source : `local_dir` (ou LOCAL_DUMP_DIR si OFFLINE=1), sinon le stockage du bucket
+    (un faux client GCS exposant bucket()/list_blobs()/open() peut être passé via `client`).
+    """
+    if local_dir is None and client is None and OFFLINE:
+        local_dir = LOCAL_DUMP_DIR
+
+    if local_dir is not None:
+        store, prefix = LocalStorage(local_dir), ""
+    else:
+        bucket_name = bucket_name or GCS_BUCKET
+        store = GCSStorage(bucket_name, client=client) if client is not None else get_storage(bucket_name)
 
-def configure_storage_client():
-    return storage.Client()
+    dump_blobs = [b for b in store.list(prefix) if re.search(DUMP_PATTERN, b.name)]
 
+    if not dump_blobs:
+        raise FileNotFoundError(f"No valid dump files found in '{store}/{prefix}'")
 
-def load_latest_oltp_json_from_gcs(bucket_name=None, prefix="dump/") -> dict:
-    if bucket_name is None:
-        bucket_name = GCS_BUCKET
+    latest_blob = max(dump_blobs, key=lambda b: b.updated)
+    print(f"📦 Latest dump found: {latest_blob.name} (Last modified: {latest_blob.updated})")
+    return open_blob(store, latest_blob, chunk_size=chunk_size)
 
-    client = configure_storage_client()
-    bucket = client.bucket(bucket_name)
-    blobs = list(bucket.list_blobs(prefix=prefix))
 
-    dump_blobs = [b for b in blobs if re.search(r"db_dump_prod_.*\.json$", b.name)]
+def open_blob(store, info, chunk_size: int = DUMP_CHUNK_SIZE):
+    """Ouvre un blob distant via le cache disque (téléchargé une fois par génération), sinon en direct."""
+    cache = get_blob_cache() if store.cacheable else None
+    if cache is None:
+        return store.open_read(info.name, chunk_size=chunk_size)
+    with stage("download", blob=info.name) as record:
+        misses = cache.misses
+        path = cache.fetch(store, info)
+        record["labels"]["cache"] = "miss" if cache.misses > misses else "hit"
+        record["bytes"] = info.size if cache.misses > misses else 0
+    return open(path, "rb")
 
-    if not dump_blobs:
-        raise FileNotFoundError(f"No valid dump files found in bucket '{bucket_name}/{prefix}'")
 
-    latest_blob = max(dump_blobs, key=lambda b: b.updated)
-    print(f"📦 Latest dump found: {latest_blob.name} (Last modified: {latest_blob.updated})")
+def load_latest_oltp_json_from_gcs(bucket_name=None, prefix="dump/", tables=None, client=None,
+                                   local_dir=None) -> dict:
+    """
+    Charge le dernier dump en streaming. Si `tables` est fourni, seules ces tables sont gardées.
+    """
+    with open_latest_oltp_dump(bucket_name, prefix, client=client, local_dir=local_dir) as fileobj:
+        with stage("parse") as record:
+            data = dict(stream_oltp_tables(fileobj, tables=tables))
+            record["rows_out"] = sum(len(rows) for rows in data.values())
+            record["bytes"] = _bytes_read(fileobj)
+    return data
 
-    raw_bytes = latest_blob.download_as_bytes()
-    return json.load(BytesIO(raw_bytes))
 
-def get_latest_olap_gcs_path(bucket_name: str, prefix="olap_outputs/") -> str:
-    client = configure_storage_client()
-    bucket = client.bucket(bucket_name)
-    blobs = list(bucket.list_blobs(prefix=prefix))
+def _bytes_read(fileobj):
+    try:
+        return fileobj.tell()
+    except (AttributeError, OSError, ValueError):
+        return None
 
-    time_folders = sorted(
-        {b.name.split("/")[1] for b in blobs if b.name.count("/") > 1},
-        reverse=True
-    )
 
-    if not time_folders:
-        raise FileNotFoundError("No OLAP output folders found.")
+MANIFEST_NAME = "_manifest.json"
+# Pointeur vers le manifeste du dernier run complet, écrit en dernier : <prefix>LATEST
+LATEST_POINTER = "LATEST"
 
-    latest_folder = time_folders[0]
-    print(f"📁 Latest OLAP output folder: {latest_folder}")
-    return f"{prefix}{latest_folder}/"
 
+def manifest_path(folder: str) -> str:
+    return f"{folder}{MANIFEST_NAME}"
+
+
+def read_manifest(store, folder: str):
+    data = store.read_bytes_if_exists(manifest_path(folder))
+    return json.loads(data) if data is not None else None
 
-def load_latest_olap_outputs(bucket_name: str, prefix="olap_outputs/") -> dict:
-    client = configure_storage_client()
-    bucket = client.bucket(bucket_name)
-    blobs = list(bucket.list_blobs(prefix=prefix))
 
-    # Trouve les noms de dossiers horodatés
+def read_latest_manifest(store, prefix="olap_outputs/"):
+    """Manifeste du dernier run terminé sous `prefix` : un seul GET (le pointeur LATEST en est une copie)."""
+    data = store.read_bytes_if_exists(f"{prefix}{LATEST_POINTER}")
+    return json.loads(data) if data is not None else None
+
+
+def publish_manifest(store, manifest: dict, prefix="olap_outputs/"):
+    """
+    Écrit le manifeste dans le dossier du run, puis le pointeur LATEST. Chaque objet est écrit
+    atomiquement et le pointeur en dernier : un lecteur ne voit jamais un run à moitié écrit.
+    """
+    data = json.dumps(manifest, indent=2).encode()
+    store.write_bytes(manifest_path(manifest["folder"]), data, content_type="application/json")
+    store.write_bytes(f"{prefix}{LATEST_POINTER}", data, content_type="application/json")
+    print(f"🧾 Manifest written to {store}/{manifest_path(manifest['folder'])}, {prefix}{LATEST_POINTER} updated")
+
+
+def get_latest_olap_folder(store, prefix="olap_outputs/") -> str:
+    """
+    Dossier du dernier run : lu dans le pointeur LATEST, sinon (runs antérieurs au manifeste)
+    dernier dossier horodaté trouvé par listing avec delimiter.
+    """
+    manifest = read_latest_manifest(store, prefix)
+    if manifest is not None:
+        print(f"📁 Latest OLAP output folder: {manifest['timestamp']} (from {prefix}{LATEST_POINTER})")
+        return manifest["folder"]
+
     time_folders = sorted(
-        {b.name.split("/")[1] for b in blobs if b.name.count("/") > 1},
+        (f[len(prefix):].rstrip("/") for f in store.list_folders(prefix)),
         reverse=True
     )
 
@@ -72,64 +281,273 @@ def load_latest_olap_outputs(bucket_name: str, prefix="olap_outputs/") -> dict:
 
     latest_folder = time_folders[0]
     print(f"📁 Latest OLAP output folder: {latest_folder}")
+    return f"{prefix}{latest_folder}/"
 
-    expected_files = [
-        "fact_invoices.csv",
-        "dim_customers.csv",
-        "dim_products.csv",
-        "dim_prices.csv",
-        "dim_payment_methods.csv",
-        "dim_subscriptions.csv",
-        "dim_payment_intents.csv",  
-        "dim_charges.csv"           
-    ]
 
-    result = {}
-    for fname in expected_files:
-        blob_path = f"{prefix}{latest_folder}/{fname}"
-        blob = bucket.blob(blob_path)
-        content = blob.download_as_bytes()
-        df = pd.read_csv(BytesIO(content))
-        result[fname.replace(".csv", "")] = df
+def get_latest_olap_gcs_path(bucket_name: str, prefix="olap_outputs/") -> str:
+    return get_latest_olap_folder(get_storage(bucket_name), prefix)
 
-    return result
 
+def arrow_schema(name: str) -> pa.Schema:
+    return pa.schema([pa.field(col, ARROW_TYPES[t]) for col, t in TABLE_SCHEMAS[name].items()])
 
-def upload_csv_to_gcs(df: pd.DataFrame, bucket_name: str, destination_blob_path: str):
-    client = configure_storage_client()
-    bucket = client.bucket(bucket_name)
-    blob = bucket.blob(destination_blob_path)
 
+def to_arrow_table(df: pd.DataFrame, name: str) -> pa.Table:
+    """
+    Convertit une table de sortie vers son schéma Arrow explicite (TABLE_SCHEMAS).
+    Les timestamps sont écrits en UTC sans fuseau, à la microseconde (attendu par Snowflake).
+    """
+    schema = TABLE_SCHEMAS[name]
+    arrays = []
+    for col, logical_type in schema.items():
+        series = df[col]
+        if logical_type == "timestamp":
+            series = pd.to_datetime(series)
+            if series.dt.tz is not None:
+                series = series.dt.tz_convert("UTC").dt.tz_localize(None)
+        arrays.append(pa.array(series, type=ARROW_TYPES[logical_type], from_pandas=True))
+    return pa.Table.from_arrays(arrays, schema=arrow_schema(name))
+
+
+def write_table(df: pd.DataFrame, target, name: str, fmt: str = "csv", compression: str = None):
+    if fmt == "parquet":
+        pq.write_table(to_arrow_table(df, name), target, compression=compression or PARQUET_COMPRESSION)
+    else:
+        csv_frame(df).to_csv(target, index=False)
+
+
+class _CountingWriter:
+    """Flux binaire qui compte les octets transmis au flux sous-jacent."""
+
+    def __init__(self, raw):
+        self.raw = raw
+        self.bytes = 0
+        self.closed = False
+
+    def write(self, data) -> int:
+        self.raw.write(data)
+        self.bytes += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self.bytes
+
+    def flush(self):
+        pass
+
+
+def row_slice(df: pd.DataFrame, rows, start: int, stop: int) -> pd.DataFrame:
+    """Lignes [start:stop] de `df`, ou des positions `rows` si elles sont données (ordre de clustering)."""
+    return df.iloc[start:stop] if rows is None else df.take(rows[start:stop])
+
+
+def stream_table(df: pd.DataFrame, fileobj, name: str, fmt: str = "csv", compress: bool = False,
+                 slice_rows: int = WRITE_SLICE_ROWS, rows=None) -> int:
+    """
+    Encode `df` dans le flux binaire `fileobj` par tranches de `slice_rows` lignes : seule la tranche
+    courante est encodée en mémoire. `rows` (positions, cf. cluster_permutation) restreint et ordonne
+    les lignes écrites sans copier la table. CSV éventuellement gzippé à la volée (`compress`) ;
+    Parquet écrit un row group par tranche. Renvoie le nombre d'octets écrits.
+    """
+    out = _CountingWriter(fileobj)
+    starts = range(0, max(len(df) if rows is None else len(rows), 1), slice_rows)
+    if fmt == "parquet":
+        with pq.ParquetWriter(out, arrow_schema(name), compression=PARQUET_COMPRESSION) as writer:
+            for start in starts:
+                writer.write_table(to_arrow_table(row_slice(df, rows, start, start + slice_rows), name))
+        return out.bytes
+
+    sink = gzip.GzipFile(fileobj=out, mode="wb", mtime=0) if compress else out
+    for start in starts:
+        part = row_slice(df, rows, start, start + slice_rows)
+        sink.write(csv_frame(part).to_csv(index=False, header=start == 0).encode())
+    if compress:
+        sink.close()
+    return out.bytes
+
+
+def output_extension(fmt: str, compress: bool = False) -> str:
+    return "csv.gz" if fmt == "csv" and compress else fmt
+
+
+def plan_part_rows(df: pd.DataFrame, name: str, fmt: str = "csv", compress: bool = False,
+                   part_size_mb: float = PART_SIZE_MB, rows=None) -> int:
+    """
+    Lignes par part file pour viser `part_size_mb` : taille encodée d'un échantillon de tête (dans
+    l'ordre `rows` s'il est donné), extrapolée. Renvoie len(df) (un seul fichier) si la table tient dans une part.
+    """
+    if part_size_mb <= 0 or len(df) <= 1:
+        return max(len(df), 1)
+    sample = row_slice(df, rows, 0, PART_SAMPLE_ROWS)
     with BytesIO() as buffer:
-        df.to_csv(buffer, index=False)
-        buffer.seek(0)
-        blob.upload_from_file(buffer, content_type="text/csv")
+        bytes_per_row = stream_table(sample, buffer, name, fmt, compress) / len(sample)
+    rows = max(int(part_size_mb * 1024 * 1024 / bytes_per_row), 1)
+    return len(df) if rows >= len(df) else rows
 
-    print(f"☁️ Uploaded to: gs://{bucket_name}/{destination_blob_path}")
 
+def csv_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """Timestamps UTC écrits sans fuseau dans les CSV, comme les colonnes TIMESTAMP_NTZ de Snowflake."""
+    tz_columns = [col for col, dtype in df.dtypes.items() if isinstance(dtype, pd.DatetimeTZDtype)]
+    if not tz_columns:
+        return df
+    return df.assign(**{col: df[col].dt.tz_convert("UTC").dt.tz_localize(None) for col in tz_columns})
 
-def save_fact(df: pd.DataFrame, timestamp: str):
-    filename = "fact_invoices.csv"
 
-    if ENV == "PROD":
-        output_path = f"olap_outputs/{timestamp}/{filename}"
-        upload_csv_to_gcs(df, GCS_BUCKET, output_path)
+def read_table(source, fmt: str = "csv") -> pd.DataFrame:
+    if fmt == "parquet":
+        # Types nullables : un entier avec des NULL reste entier au lieu de passer en float
+        return pd.read_parquet(source, dtype_backend="numpy_nullable")
+    return pd.read_csv(source, compression="gzip" if fmt.endswith(".gz") else None)
+
+
+def part_filename(name: str, part: int, fmt: str) -> str:
+    """Fichier n° `part` d'une table écrite par morceaux : <table>/part-00000.<fmt>."""
+    return f"{name}/part-{part:05d}.{fmt}"
+
+
+def _legacy_output_files(available: dict, name: str):
+    """(format, fichiers) d'une table d'un run sans manifeste : Parquet, puis CSV, puis CSV gzippé."""
+    fmt = next((f for f in ("parquet", "csv", "csv.gz")
+                if f"{name}.{f}" in available or f"{name}/part-00000.{f}" in available), "csv")
+    filenames = [f"{name}.{fmt}"] if f"{name}.{fmt}" in available else sorted(
+        f for f in available if f.startswith(f"{name}/part-") and f.endswith(f".{fmt}"))
+    return fmt, filenames
+
+
+def load_latest_olap_outputs(bucket_name: str, prefix="olap_outputs/") -> dict:
+    """
+    Relit les tables du dernier run. Avec un manifeste, la liste des tables et de leurs fichiers
+    en vient directement ; sinon elle est déduite des noms de fichiers (tables de BUILDERS).
+    """
+    store = get_storage(bucket_name)
+    manifest = read_latest_manifest(store, prefix)
+    folder = manifest["folder"] if manifest is not None else get_latest_olap_folder(store, prefix)
+    available = {b.name[len(folder):]: b for b in store.list(folder)}
+
+    if manifest is not None:
+        tables = {name: (entry["extension"], entry["files"]) for name, entry in manifest["tables"].items()}
     else:
-        local_path = Path(f"olap_outputs/{filename}")
-        local_path.parent.mkdir(parents=True, exist_ok=True)
-        df.to_csv(local_path, index=False)
-        print(f"💾 Saved locally to: {local_path}")
+        tables = {name: _legacy_output_files(available, name) for name in BUILDERS}
+
+    result = {}
+    for name, (fmt, filenames) in tables.items():
+        missing = [f for f in filenames if f not in available]
+        if not filenames or missing:
+            raise FileNotFoundError(f"Missing OLAP output: {store}/{folder}{(missing or [f'{name}.{fmt}'])[0]}")
+        frames = []
+        for filename in filenames:
+            with open_blob(store, available[filename]) as fileobj:
+                frames.append(read_table(fileobj, fmt))
+        result[name] = compact_dtypes(pd.concat(frames, ignore_index=True), name)
+
+    return result
 
 
-def save_dim(df: pd.DataFrame, name: str, timestamp: str):
-    filename = f"{name}.csv"
+def upload_table_to_gcs(df: pd.DataFrame, bucket_name: str, destination_blob_path: str,
+                        name: str = None, fmt: str = "csv"):
+    """Upload résumable en flux d'un seul fichier ; un chemin en .gz est compressé à la volée."""
+    store = get_storage(bucket_name)
+    compress = destination_blob_path.endswith(".gz")
+
+    with stage("upload", table=name or destination_blob_path, format=fmt) as record:
+        with store.open_write(destination_blob_path, content_type=CONTENT_TYPES[output_extension(fmt, compress)]) as fileobj:
+            record["bytes"] = stream_table(df, fileobj, name, fmt, compress)
+        record["rows_out"] = len(df)
+
+    print(f"☁️ Uploaded to: {store}/{destination_blob_path}")
+
+
+def upload_csv_to_gcs(df: pd.DataFrame, bucket_name: str, destination_blob_path: str):
+    upload_table_to_gcs(df, bucket_name, destination_blob_path, fmt="csv")
+
 
+def output_target(timestamp: str, prefix: str):
+    """(stockage, dossier) des sorties : le bucket horodaté en PROD, le dossier local sinon."""
     if ENV == "PROD":
-        output_path = f"olap_outputs/{timestamp}/{filename}"
-        upload_csv_to_gcs(df, GCS_BUCKET, output_path)
-        print(f"☁️ Uploaded {name} to GCS at: gs://{GCS_BUCKET}/{output_path}")
+        return get_storage(GCS_BUCKET), f"{prefix}{timestamp}/"
+    return LocalStorage("."), prefix
+
+
+def _clear_stale_outputs(store, folder: str, name: str, keep: set):
+    """Supprime les fichiers d'un run précédent de la table (local : le dossier est réécrit à chaque run)."""
+    candidates = [b.name for b in store.list(f"{folder}{name}/part-")]
+    candidates += [f"{folder}{name}.{ext}" for ext in ("csv", "csv.gz", "parquet")]
+    for path in candidates:
+        if path not in keep and store.exists(path):
+            store.delete(path)
+
+
+def save_table(df: pd.DataFrame, name: str, timestamp: str, fmt: str = None, prefix: str = "olap_outputs/",
+               compress: bool = None, part_size_mb: float = PART_SIZE_MB) -> list:
+    """
+    Écrit une table en flux : <dossier><table>.<ext>, ou <dossier><table>/part-NNNNN.<ext> si elle
+    dépasse `part_size_mb`. Chaque fichier est encodé par tranches directement dans le stockage
+    (upload résumable en PROD), après validation contre TABLE_SCHEMAS. Les lignes sont triées sur la clé
+    de clustering : chaque fichier couvre une plage disjointe, élaguée dès le premier COPY. Renvoie les chemins écrits.
+    """
+    validate_frame(df, name)
+    order = cluster_permutation(df, name)
+    fmt = fmt or OUTPUT_FORMAT
+    compress = GZIP_OUTPUT if compress is None else compress
+    ext = output_extension(fmt, compress)
+    store, folder = output_target(timestamp, prefix)
+
+    rows_per_part = plan_part_rows(df, name, fmt, compress, part_size_mb, rows=order)
+    if rows_per_part >= len(df):
+        files = [(f"{folder}{name}.{ext}", order)]
     else:
-        local_path = Path(f"olap_outputs/{filename}")
-        local_path.parent.mkdir(parents=True, exist_ok=True)
-        df.to_csv(local_path, index=False)
-        print(f"💾 Saved {name} locally to: {local_path}")
+        # Chaque part est une plage de positions : aucune copie triée de la table n'est matérialisée
+        positions = np.arange(len(df)) if order is None else order
+        files = [(f"{folder}{part_filename(name, part, ext)}", positions[start:start + rows_per_part])
+                 for part, start in enumerate(range(0, len(df), rows_per_part))]
+
+    if ENV != "PROD":
+        _clear_stale_outputs(store, folder, name, keep={path for path, _ in files})
+
+    with stage("upload" if ENV == "PROD" else "write", table=name, format=ext, parts=len(files)) as record:
+        record["bytes"] = 0
+        for path, rows in files:
+            with store.open_write(path, content_type=CONTENT_TYPES[ext]) as fileobj:
+                record["bytes"] += stream_table(df, fileobj, name, fmt, compress, rows=rows)
+        record["rows_out"] = len(df)
+
+    target = files[0][0] if len(files) == 1 else f"{folder}{name}/ ({len(files)} parts)"
+    print(f"☁️ Uploaded {name} to: {store}/{target}" if ENV == "PROD" else f"💾 Saved {name} locally to: {target}")
+    return [path for path, _ in files]
+
+
+def save_fact(df: pd.DataFrame, timestamp: str, name: str = "fact_invoices", fmt: str = None,
+              prefix: str = "olap_outputs/"):
+    return save_table(df, name, timestamp, fmt, prefix)
+
+
+def save_dim(df: pd.DataFrame, name: str, timestamp: str, fmt: str = None,
+             prefix: str = "olap_outputs/"):
+    return save_table(df, name, timestamp, fmt, prefix)
+
+
+def save_part(df: pd.DataFrame, name: str, part: int, timestamp: str, fmt: str = None,
+              prefix: str = "olap_outputs/", compress: bool = None):
+    """
+    Écrit un morceau de table (mode chunked) : <prefix><timestamp>/<table>/part-NNNNN.<ext> en PROD,
+    <prefix><table>/part-NNNNN.<ext> en local. En local, les fichiers d'un run précédent sont supprimés
+    à l'écriture du premier morceau.
+    """
+    fmt = fmt or OUTPUT_FORMAT
+    compress = GZIP_OUTPUT if compress is None else compress
+    ext = output_extension(fmt, compress)
+    store, folder = output_target(timestamp, prefix)
+    path = f"{folder}{part_filename(name, part, ext)}"
+
+    validate_frame(df, name)
+    order = cluster_permutation(df, name)
+    if ENV != "PROD" and part == 0:
+        _clear_stale_outputs(store, folder, name, keep={path})
+
+    with stage("upload" if ENV == "PROD" else "write", table=name, format=ext, part=part) as record:
+        with store.open_write(path, content_type=CONTENT_TYPES[ext]) as fileobj:
+            record["bytes"] = stream_table(df, fileobj, name, fmt, compress, rows=order)
+        record["rows_out"] = len(df)
+    print(f"☁️ Uploaded {name} part {part} to: {store}/{path}" if ENV == "PROD"
+          else f"💾 Saved {name} part {part} locally to: {path}")
+    return path
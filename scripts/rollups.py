@@ -0,0 +1,123 @@
+from typing import Callable, NamedTuple
+
+import numpy as np
+import pandas as pd
+
+from scripts.csv_builders import TABLE_KEYS, TABLE_SCHEMAS, compact_dtypes
+
+# This module builds the pre-aggregated rollup tables the ETL maintains next to the star schema.
+
+# Libellé des clés absentes (une clé de MERGE ne peut pas être NULL)
+UNKNOWN = "unknown"
+# Nombre de mois couverts par une facture selon l'intervalle du plan : le montant d'une facture annuelle
+# est réparti sur 12 mois de MRR, une facture hebdomadaire ou journalière compte dans son mois
+MRR_MONTHS = {"day": 1, "week": 1, "month": 1, "year": 12}
+# Le MRR d'une ligne est plan_amount / MRR_MONTHS : un entier de douzièmes de centime
+MRR_UNITS = 12
+
+
+class Rollup(NamedTuple):
+    source: str
+    rows: Callable
+    aggregations: dict
+    # Mesures non entières sommées en unités entières (colonne -> unités par valeur), divisées après la somme
+    units: dict = {}
+
+
+def _month(values: pd.Series) -> pd.Series:
+    return pd.to_datetime(values, utc=True).dt.tz_localize(None).dt.to_period("M")
+
+
+def _label(values: pd.Series) -> pd.Series:
+    return values.astype("string").fillna(UNKNOWN)
+
+
+def revenue_rows(fact: pd.DataFrame) -> pd.DataFrame:
+    return pd.DataFrame({
+        "month": _month(fact["created_at"]).dt.to_timestamp(),
+        "currency": _label(fact["currency"]),
+        "product_id": _label(fact["product_id"]),
+        "revenue": fact["amount_paid"].fillna(0),
+        "invoices": 1,
+    }).dropna(subset=["month"])
+
+
+def ltv_rows(fact: pd.DataFrame) -> pd.DataFrame:
+    return pd.DataFrame({
+        "customer_id": _label(fact["customer_id"]),
+        "currency": _label(fact["currency"]),
+        "lifetime_value": fact["amount_paid"].fillna(0),
+        "invoices": 1,
+        "first_invoice_at": fact["created_at"],
+        "last_invoice_at": fact["created_at"],
+    })
+
+
+def mrr_rows(fact: pd.DataFrame) -> pd.DataFrame:
+    """Factures d'abonnement payées, une ligne par mois couvert : plan_amount / nombre de mois."""
+    paid = fact[(fact["status"] == "paid").fillna(False).to_numpy()
+                & fact["subscription_id"].notna().to_numpy() & fact["plan_amount"].notna().to_numpy()]
+    start = _month(paid["period_start"].fillna(paid["created_at"]))
+    paid, start = paid[start.notna().to_numpy()], start.dropna()
+    months = _label(paid["plan_interval"]).map(MRR_MONTHS).fillna(1).astype(int).to_numpy()
+    rows = np.repeat(np.arange(len(paid)), months)
+    offsets = np.arange(len(rows)) - np.repeat(np.cumsum(months) - months, months)
+    return pd.DataFrame({
+        "month": (pd.PeriodIndex(start.iloc[rows]) + offsets).to_timestamp(),
+        "plan_interval": _label(paid["plan_interval"]).iloc[rows].to_numpy(),
+        "currency": _label(paid["currency"]).iloc[rows].to_numpy(),
+        "mrr": (paid["plan_amount"].astype("Float64").to_numpy() / months)[rows],
+        "invoices": 1,
+    })
+
+
+# Tables agrégées, chacune dérivée d'une table construite. Tous les agrégats sont additifs (sommes, comptes,
+# min/max) : des agrégats partiels, par exemple par lot en mode chunked, se recombinent exactement pour les
+# mesures entières. Le MRR (flottant) est sommé en douzièmes de centime entiers puis divisé, pour que la
+# somme des lots soit identique au bit près à celle de la table entière.
+ROLLUPS = {
+    "agg_revenue_monthly": Rollup("fact_invoices", revenue_rows, {"revenue": "sum", "invoices": "sum"}),
+    "agg_customer_ltv": Rollup("fact_invoices", ltv_rows, {
+        "lifetime_value": "sum", "invoices": "sum", "first_invoice_at": "min", "last_invoice_at": "max",
+    }),
+    "agg_mrr_monthly": Rollup("fact_invoices", mrr_rows, {"mrr": "sum", "invoices": "sum"}, {"mrr": MRR_UNITS}),
+}
+
+
+def rollups_of(source: str) -> list:
+    return [name for name, rollup in ROLLUPS.items() if rollup.source == source]
+
+
+def aggregate(name: str, rows: pd.DataFrame) -> pd.DataFrame:
+    """Agrège des lignes (ou des agrégats partiels) sur la clé de la table, au schéma de TABLE_SCHEMAS."""
+    units = ROLLUPS[name].units
+    rows = rows.assign(**{col: (rows[col].astype("Float64") * scale).round().astype("Int64")
+                          for col, scale in units.items()})
+    grouped = rows.groupby(TABLE_KEYS[name], sort=True, observed=True).agg(ROLLUPS[name].aggregations)
+    grouped = grouped.reset_index().assign(**{col: grouped[col].to_numpy(dtype="float64") / scale
+                                               for col, scale in units.items()})
+    return compact_dtypes(grouped[list(TABLE_SCHEMAS[name])], name)
+
+
+def build_rollup(name: str, source: pd.DataFrame) -> pd.DataFrame:
+    return aggregate(name, ROLLUPS[name].rows(source))
+
+
+def combine_rollups(name: str, partials: list) -> pd.DataFrame:
+    """Recombine des agrégats partiels de la même table (lots du mode chunked)."""
+    if not partials:
+        return build_rollup(name, pd.DataFrame(columns=list(TABLE_SCHEMAS[ROLLUPS[name].source])))
+    return aggregate(name, pd.concat(partials, ignore_index=True))
+
+
+def _key_index(df: pd.DataFrame, name: str) -> pd.MultiIndex:
+    return pd.MultiIndex.from_frame(df[TABLE_KEYS[name]].astype(object))
+
+
+def affected_groups(name: str, rollup: pd.DataFrame, delta: pd.DataFrame) -> pd.DataFrame:
+    """
+    Lignes de `rollup` (calculé sur toute la table source) dont la clé est touchée par les lignes `delta`.
+    Chaque groupe touché est renvoyé en entier : le MERGE remplace la ligne, un delta rejoué reste idempotent.
+    """
+    touched = _key_index(build_rollup(name, delta), name)
+    return rollup[_key_index(rollup, name).isin(touched)].reset_index(drop=True)
@@ -19,10 +19,39 @@ COPY INTO fact_invoices (
     livemode,
     card_brand
 )
-FROM @STRIPE_OLAP.RAW.GCS_STAGE_PROD/fact_invoices.csv
+FROM @STRIPE_OLAP.RAW.GCS_STAGE_PROD/fact_invoices
+PATTERN = '.*fact_invoices([.]|/part-[0-9]+[.])csv([.]gz)?'
 FILE_FORMAT = (
     TYPE = CSV,
     FIELD_DELIMITER = ',',
+    FIELD_OPTIONALLY_ENCLOSED_BY = '"',
+    SKIP_HEADER = 1
+);
+COPY INTO fact_invoice_lines (
+    line_item_id,
+    invoice_id,
+    line_number,
+    customer_id,
+    subscription_id,
+    subscription_item_id,
+    price_id,
+    product_id,
+    amount,
+    currency,
+    quantity,
+    proration,
+    period_start,
+    period_end,
+    description,
+    created_at,
+    livemode
+)
+FROM @STRIPE_OLAP.RAW.GCS_STAGE_PROD/fact_invoice_lines
+PATTERN = '.*fact_invoice_lines([.]|/part-[0-9]+[.])csv([.]gz)?'
+FILE_FORMAT = (
+    TYPE = CSV,
+    FIELD_DELIMITER = ',',
+    FIELD_OPTIONALLY_ENCLOSED_BY = '"',
     SKIP_HEADER = 1
 );
 COPY INTO dim_customers (
@@ -34,10 +63,12 @@ COPY INTO dim_customers (
     livemode,
     created_at
 )
-FROM @STRIPE_OLAP.RAW.GCS_STAGE_PROD/dim_customers.csv
+FROM @STRIPE_OLAP.RAW.GCS_STAGE_PROD/dim_customers
+PATTERN = '.*dim_customers([.]|/part-[0-9]+[.])csv([.]gz)?'
 FILE_FORMAT = (
     TYPE = CSV,
     FIELD_DELIMITER = ',',
+    FIELD_OPTIONALLY_ENCLOSED_BY = '"',
     SKIP_HEADER = 1
 );
 COPY INTO dim_products (
@@ -48,10 +79,12 @@ COPY INTO dim_products (
     created_at,
     updated_at
 )
-FROM @STRIPE_OLAP.RAW.GCS_STAGE_PROD/dim_products.csv
+FROM @STRIPE_OLAP.RAW.GCS_STAGE_PROD/dim_products
+PATTERN = '.*dim_products([.]|/part-[0-9]+[.])csv([.]gz)?'
 FILE_FORMAT = (
     TYPE = CSV,
     FIELD_DELIMITER = ',',
+    FIELD_OPTIONALLY_ENCLOSED_BY = '"',
     SKIP_HEADER = 1
 );
 COPY INTO dim_prices (
@@ -67,10 +100,12 @@ COPY INTO dim_prices (
     livemode,
     created_at
 )
-FROM @STRIPE_OLAP.RAW.GCS_STAGE_PROD/dim_prices.csv
+FROM @STRIPE_OLAP.RAW.GCS_STAGE_PROD/dim_prices
+PATTERN = '.*dim_prices([.]|/part-[0-9]+[.])csv([.]gz)?'
 FILE_FORMAT = (
     TYPE = CSV,
     FIELD_DELIMITER = ',',
+    FIELD_OPTIONALLY_ENCLOSED_BY = '"',
     SKIP_HEADER = 1
 );
 COPY INTO dim_payment_methods (
@@ -81,10 +116,12 @@ COPY INTO dim_payment_methods (
     created_at,
     card_brand
 )
-FROM @STRIPE_OLAP.RAW.GCS_STAGE_PROD/dim_payment_methods.csv
+FROM @STRIPE_OLAP.RAW.GCS_STAGE_PROD/dim_payment_methods
+PATTERN = '.*dim_payment_methods([.]|/part-[0-9]+[.])csv([.]gz)?'
 FILE_FORMAT = (
     TYPE = CSV,
     FIELD_DELIMITER = ',',
+    FIELD_OPTIONALLY_ENCLOSED_BY = '"',
     SKIP_HEADER = 1
 );
 COPY INTO dim_subscriptions (
@@ -100,10 +137,12 @@ COPY INTO dim_subscriptions (
     plan_interval,
     livemode
 )
-FROM @STRIPE_OLAP.RAW.GCS_STAGE_PROD/dim_subscriptions.csv
+FROM @STRIPE_OLAP.RAW.GCS_STAGE_PROD/dim_subscriptions
+PATTERN = '.*dim_subscriptions([.]|/part-[0-9]+[.])csv([.]gz)?'
 FILE_FORMAT = (
     TYPE = CSV,
     FIELD_DELIMITER = ',',
+    FIELD_OPTIONALLY_ENCLOSED_BY = '"',
     SKIP_HEADER = 1
 );
 COPY INTO dim_payment_intents (
@@ -115,10 +154,12 @@ COPY INTO dim_payment_intents (
     currency,
     created_at
 )
-FROM @STRIPE_OLAP.RAW.GCS_STAGE_PROD/dim_payment_intents.csv
+FROM @STRIPE_OLAP.RAW.GCS_STAGE_PROD/dim_payment_intents
+PATTERN = '.*dim_payment_intents([.]|/part-[0-9]+[.])csv([.]gz)?'
 FILE_FORMAT = (
     TYPE = CSV,
     FIELD_DELIMITER = ',',
+    FIELD_OPTIONALLY_ENCLOSED_BY = '"',
     SKIP_HEADER = 1
 );
 COPY INTO dim_charges (
@@ -131,9 +172,57 @@ COPY INTO dim_charges (
     paid,
     created_at
 )
-FROM @STRIPE_OLAP.RAW.GCS_STAGE_PROD/dim_charges.csv
+FROM @STRIPE_OLAP.RAW.GCS_STAGE_PROD/dim_charges
+PATTERN = '.*dim_charges([.]|/part-[0-9]+[.])csv([.]gz)?'
+FILE_FORMAT = (
+    TYPE = CSV,
+    FIELD_DELIMITER = ',',
+    FIELD_OPTIONALLY_ENCLOSED_BY = '"',
+    SKIP_HEADER = 1
+);
+COPY INTO agg_revenue_monthly (
+    month,
+    currency,
+    product_id,
+    revenue,
+    invoices
+)
+FROM @STRIPE_OLAP.RAW.GCS_STAGE_PROD/agg_revenue_monthly
+PATTERN = '.*agg_revenue_monthly([.]|/part-[0-9]+[.])csv([.]gz)?'
+FILE_FORMAT = (
+    TYPE = CSV,
+    FIELD_DELIMITER = ',',
+    FIELD_OPTIONALLY_ENCLOSED_BY = '"',
+    SKIP_HEADER = 1
+);
+COPY INTO agg_customer_ltv (
+    customer_id,
+    currency,
+    lifetime_value,
+    invoices,
+    first_invoice_at,
+    last_invoice_at
+)
+FROM @STRIPE_OLAP.RAW.GCS_STAGE_PROD/agg_customer_ltv
+PATTERN = '.*agg_customer_ltv([.]|/part-[0-9]+[.])csv([.]gz)?'
+FILE_FORMAT = (
+    TYPE = CSV,
+    FIELD_DELIMITER = ',',
+    FIELD_OPTIONALLY_ENCLOSED_BY = '"',
+    SKIP_HEADER = 1
+);
+COPY INTO agg_mrr_monthly (
+    month,
+    plan_interval,
+    currency,
+    mrr,
+    invoices
+)
+FROM @STRIPE_OLAP.RAW.GCS_STAGE_PROD/agg_mrr_monthly
+PATTERN = '.*agg_mrr_monthly([.]|/part-[0-9]+[.])csv([.]gz)?'
 FILE_FORMAT = (
     TYPE = CSV,
     FIELD_DELIMITER = ',',
+    FIELD_OPTIONALLY_ENCLOSED_BY = '"',
     SKIP_HEADER = 1
 );
\ No newline at end of file
@@ -18,7 +18,31 @@ CREATE OR REPLACE TABLE fact_invoices (
     receipt_number STRING,
     livemode BOOLEAN,
     card_brand STRING
-);
+) CLUSTER BY (TO_DATE(created_at));
+
+ALTER TABLE fact_invoices ADD SEARCH OPTIMIZATION ON EQUALITY(invoice_id, customer_id);
+
+CREATE OR REPLACE TABLE fact_invoice_lines (
+    line_item_id STRING,
+    invoice_id STRING,
+    line_number NUMBER,
+    customer_id STRING,
+    subscription_id STRING,
+    subscription_item_id STRING,
+    price_id STRING,
+    product_id STRING,
+    amount NUMBER,
+    currency STRING,
+    quantity NUMBER,
+    proration BOOLEAN,
+    period_start TIMESTAMP,
+    period_end TIMESTAMP,
+    description STRING,
+    created_at TIMESTAMP,
+    livemode BOOLEAN
+) CLUSTER BY (TO_DATE(created_at));
+
+ALTER TABLE fact_invoice_lines ADD SEARCH OPTIMIZATION ON EQUALITY(invoice_id, customer_id);
 
 CREATE OR REPLACE TABLE dim_customers (
     customer_id STRING,
@@ -84,7 +108,9 @@ CREATE OR REPLACE TABLE dim_payment_intents (
     amount NUMBER,
     currency STRING,
     created_at TIMESTAMP
-);
+) CLUSTER BY (TO_DATE(created_at));
+
+ALTER TABLE dim_payment_intents ADD SEARCH OPTIMIZATION ON EQUALITY(payment_intent_id, customer_id, invoice_id);
 
 CREATE OR REPLACE TABLE dim_charges (
     charge_id STRING,
@@ -95,4 +121,31 @@ CREATE OR REPLACE TABLE dim_charges (
     status STRING,
     paid BOOLEAN,
     created_at TIMESTAMP
+) CLUSTER BY (TO_DATE(created_at));
+
+ALTER TABLE dim_charges ADD SEARCH OPTIMIZATION ON EQUALITY(charge_id, payment_intent_id, customer_id);
+
+CREATE OR REPLACE TRANSIENT TABLE agg_revenue_monthly (
+    month TIMESTAMP,
+    currency STRING,
+    product_id STRING,
+    revenue NUMBER,
+    invoices NUMBER
+);
+
+CREATE OR REPLACE TRANSIENT TABLE agg_customer_ltv (
+    customer_id STRING,
+    currency STRING,
+    lifetime_value NUMBER,
+    invoices NUMBER,
+    first_invoice_at TIMESTAMP,
+    last_invoice_at TIMESTAMP
+);
+
+CREATE OR REPLACE TRANSIENT TABLE agg_mrr_monthly (
+    month TIMESTAMP,
+    plan_interval STRING,
+    currency STRING,
+    mrr FLOAT,
+    invoices NUMBER
 );
@@ -0,0 +1,413 @@
+CREATE OR REPLACE TEMPORARY TABLE fact_invoices_delta LIKE fact_invoices;
+COPY INTO fact_invoices_delta (
+    invoice_id,
+    customer_id,
+    customer_email,
+    amount_paid,
+    currency,
+    status,
+    created_at,
+    period_start,
+    period_end,
+    product_id,
+    product_name,
+    price_id,
+    plan_amount,
+    plan_interval,
+    subscription_id,
+    payment_method_type,
+    receipt_number,
+    livemode,
+    card_brand
+)
+FROM @STRIPE_OLAP.RAW.GCS_STAGE_PROD/fact_invoices
+PATTERN = '.*fact_invoices([.]|/part-[0-9]+[.])csv([.]gz)?'
+FILE_FORMAT = (
+    TYPE = CSV,
+    FIELD_DELIMITER = ',',
+    FIELD_OPTIONALLY_ENCLOSED_BY = '"',
+    SKIP_HEADER = 1
+);
+MERGE INTO fact_invoices AS t
+USING fact_invoices_delta AS s
+ON t.invoice_id = s.invoice_id
+WHEN MATCHED THEN UPDATE SET
+    customer_id = s.customer_id,
+    customer_email = s.customer_email,
+    amount_paid = s.amount_paid,
+    currency = s.currency,
+    status = s.status,
+    created_at = s.created_at,
+    period_start = s.period_start,
+    period_end = s.period_end,
+    product_id = s.product_id,
+    product_name = s.product_name,
+    price_id = s.price_id,
+    plan_amount = s.plan_amount,
+    plan_interval = s.plan_interval,
+    subscription_id = s.subscription_id,
+    payment_method_type = s.payment_method_type,
+    receipt_number = s.receipt_number,
+    livemode = s.livemode,
+    card_brand = s.card_brand
+WHEN NOT MATCHED THEN INSERT (invoice_id, customer_id, customer_email, amount_paid, currency, status, created_at, period_start, period_end, product_id, product_name, price_id, plan_amount, plan_interval, subscription_id, payment_method_type, receipt_number, livemode, card_brand)
+VALUES (s.invoice_id, s.customer_id, s.customer_email, s.amount_paid, s.currency, s.status, s.created_at, s.period_start, s.period_end, s.product_id, s.product_name, s.price_id, s.plan_amount, s.plan_interval, s.subscription_id, s.payment_method_type, s.receipt_number, s.livemode, s.card_brand);
+
+CREATE OR REPLACE TEMPORARY TABLE fact_invoice_lines_delta LIKE fact_invoice_lines;
+COPY INTO fact_invoice_lines_delta (
+    line_item_id,
+    invoice_id,
+    line_number,
+    customer_id,
+    subscription_id,
+    subscription_item_id,
+    price_id,
+    product_id,
+    amount,
+    currency,
+    quantity,
+    proration,
+    period_start,
+    period_end,
+    description,
+    created_at,
+    livemode
+)
+FROM @STRIPE_OLAP.RAW.GCS_STAGE_PROD/fact_invoice_lines
+PATTERN = '.*fact_invoice_lines([.]|/part-[0-9]+[.])csv([.]gz)?'
+FILE_FORMAT = (
+    TYPE = CSV,
+    FIELD_DELIMITER = ',',
+    FIELD_OPTIONALLY_ENCLOSED_BY = '"',
+    SKIP_HEADER = 1
+);
+MERGE INTO fact_invoice_lines AS t
+USING fact_invoice_lines_delta AS s
+ON t.invoice_id = s.invoice_id AND t.line_item_id = s.line_item_id
+WHEN MATCHED THEN UPDATE SET
+    line_number = s.line_number,
+    customer_id = s.customer_id,
+    subscription_id = s.subscription_id,
+    subscription_item_id = s.subscription_item_id,
+    price_id = s.price_id,
+    product_id = s.product_id,
+    amount = s.amount,
+    currency = s.currency,
+    quantity = s.quantity,
+    proration = s.proration,
+    period_start = s.period_start,
+    period_end = s.period_end,
+    description = s.description,
+    created_at = s.created_at,
+    livemode = s.livemode
+WHEN NOT MATCHED THEN INSERT (line_item_id, invoice_id, line_number, customer_id, subscription_id, subscription_item_id, price_id, product_id, amount, currency, quantity, proration, period_start, period_end, description, created_at, livemode)
+VALUES (s.line_item_id, s.invoice_id, s.line_number, s.customer_id, s.subscription_id, s.subscription_item_id, s.price_id, s.product_id, s.amount, s.currency, s.quantity, s.proration, s.period_start, s.period_end, s.description, s.created_at, s.livemode);
+
+CREATE OR REPLACE TEMPORARY TABLE dim_customers_delta LIKE dim_customers;
+COPY INTO dim_customers_delta (
+    customer_id,
+    email,
+    name,
+    delinquent,
+    currency,
+    livemode,
+    created_at
+)
+FROM @STRIPE_OLAP.RAW.GCS_STAGE_PROD/dim_customers
+PATTERN = '.*dim_customers([.]|/part-[0-9]+[.])csv([.]gz)?'
+FILE_FORMAT = (
+    TYPE = CSV,
+    FIELD_DELIMITER = ',',
+    FIELD_OPTIONALLY_ENCLOSED_BY = '"',
+    SKIP_HEADER = 1
+);
+MERGE INTO dim_customers AS t
+USING dim_customers_delta AS s
+ON t.customer_id = s.customer_id
+WHEN MATCHED THEN UPDATE SET
+    email = s.email,
+    name = s.name,
+    delinquent = s.delinquent,
+    currency = s.currency,
+    livemode = s.livemode,
+    created_at = s.created_at
+WHEN NOT MATCHED THEN INSERT (customer_id, email, name, delinquent, currency, livemode, created_at)
+VALUES (s.customer_id, s.email, s.name, s.delinquent, s.currency, s.livemode, s.created_at);
+
+CREATE OR REPLACE TEMPORARY TABLE dim_products_delta LIKE dim_products;
+COPY INTO dim_products_delta (
+    product_id,
+    name,
+    description,
+    active,
+    created_at,
+    updated_at
+)
+FROM @STRIPE_OLAP.RAW.GCS_STAGE_PROD/dim_products
+PATTERN = '.*dim_products([.]|/part-[0-9]+[.])csv([.]gz)?'
+FILE_FORMAT = (
+    TYPE = CSV,
+    FIELD_DELIMITER = ',',
+    FIELD_OPTIONALLY_ENCLOSED_BY = '"',
+    SKIP_HEADER = 1
+);
+MERGE INTO dim_products AS t
+USING dim_products_delta AS s
+ON t.product_id = s.product_id
+WHEN MATCHED THEN UPDATE SET
+    name = s.name,
+    description = s.description,
+    active = s.active,
+    created_at = s.created_at,
+    updated_at = s.updated_at
+WHEN NOT MATCHED THEN INSERT (product_id, name, description, active, created_at, updated_at)
+VALUES (s.product_id, s.name, s.description, s.active, s.created_at, s.updated_at);
+
+CREATE OR REPLACE TEMPORARY TABLE dim_prices_delta LIKE dim_prices;
+COPY INTO dim_prices_delta (
+    price_id,
+    product_id,
+    currency,
+    unit_amount,
+    type,
+    billing_scheme,
+    recurring_interval,
+    recurring_count,
+    recurring_usage_type,
+    livemode,
+    created_at
+)
+FROM @STRIPE_OLAP.RAW.GCS_STAGE_PROD/dim_prices
+PATTERN = '.*dim_prices([.]|/part-[0-9]+[.])csv([.]gz)?'
+FILE_FORMAT = (
+    TYPE = CSV,
+    FIELD_DELIMITER = ',',
+    FIELD_OPTIONALLY_ENCLOSED_BY = '"',
+    SKIP_HEADER = 1
+);
+MERGE INTO dim_prices AS t
+USING dim_prices_delta AS s
+ON t.price_id = s.price_id
+WHEN MATCHED THEN UPDATE SET
+    product_id = s.product_id,
+    currency = s.currency,
+    unit_amount = s.unit_amount,
+    type = s.type,
+    billing_scheme = s.billing_scheme,
+    recurring_interval = s.recurring_interval,
+    recurring_count = s.recurring_count,
+    recurring_usage_type = s.recurring_usage_type,
+    livemode = s.livemode,
+    created_at = s.created_at
+WHEN NOT MATCHED THEN INSERT (price_id, product_id, currency, unit_amount, type, billing_scheme, recurring_interval, recurring_count, recurring_usage_type, livemode, created_at)
+VALUES (s.price_id, s.product_id, s.currency, s.unit_amount, s.type, s.billing_scheme, s.recurring_interval, s.recurring_count, s.recurring_usage_type, s.livemode, s.created_at);
+
+CREATE OR REPLACE TEMPORARY TABLE dim_payment_methods_delta LIKE dim_payment_methods;
+COPY INTO dim_payment_methods_delta (
+    payment_method_id,
+    type,
+    customer_id,
+    livemode,
+    created_at,
+    card_brand
+)
+FROM @STRIPE_OLAP.RAW.GCS_STAGE_PROD/dim_payment_methods
+PATTERN = '.*dim_payment_methods([.]|/part-[0-9]+[.])csv([.]gz)?'
+FILE_FORMAT = (
+    TYPE = CSV,
+    FIELD_DELIMITER = ',',
+    FIELD_OPTIONALLY_ENCLOSED_BY = '"',
+    SKIP_HEADER = 1
+);
+MERGE INTO dim_payment_methods AS t
+USING dim_payment_methods_delta AS s
+ON t.payment_method_id = s.payment_method_id
+WHEN MATCHED THEN UPDATE SET
+    type = s.type,
+    customer_id = s.customer_id,
+    livemode = s.livemode,
+    created_at = s.created_at,
+    card_brand = s.card_brand
+WHEN NOT MATCHED THEN INSERT (payment_method_id, type, customer_id, livemode, created_at, card_brand)
+VALUES (s.payment_method_id, s.type, s.customer_id, s.livemode, s.created_at, s.card_brand);
+
+CREATE OR REPLACE TEMPORARY TABLE dim_subscriptions_delta LIKE dim_subscriptions;
+COPY INTO dim_subscriptions_delta (
+    subscription_id,
+    customer_id,
+    price_id,
+    status,
+    currency,
+    start_date,
+    created_at,
+    cancel_at,
+    ended_at,
+    plan_interval,
+    livemode
+)
+FROM @STRIPE_OLAP.RAW.GCS_STAGE_PROD/dim_subscriptions
+PATTERN = '.*dim_subscriptions([.]|/part-[0-9]+[.])csv([.]gz)?'
+FILE_FORMAT = (
+    TYPE = CSV,
+    FIELD_DELIMITER = ',',
+    FIELD_OPTIONALLY_ENCLOSED_BY = '"',
+    SKIP_HEADER = 1
+);
+MERGE INTO dim_subscriptions AS t
+USING dim_subscriptions_delta AS s
+ON t.subscription_id = s.subscription_id
+WHEN MATCHED THEN UPDATE SET
+    customer_id = s.customer_id,
+    price_id = s.price_id,
+    status = s.status,
+    currency = s.currency,
+    start_date = s.start_date,
+    created_at = s.created_at,
+    cancel_at = s.cancel_at,
+    ended_at = s.ended_at,
+    plan_interval = s.plan_interval,
+    livemode = s.livemode
+WHEN NOT MATCHED THEN INSERT (subscription_id, customer_id, price_id, status, currency, start_date, created_at, cancel_at, ended_at, plan_interval, livemode)
+VALUES (s.subscription_id, s.customer_id, s.price_id, s.status, s.currency, s.start_date, s.created_at, s.cancel_at, s.ended_at, s.plan_interval, s.livemode);
+
+CREATE OR REPLACE TEMPORARY TABLE dim_payment_intents_delta LIKE dim_payment_intents;
+COPY INTO dim_payment_intents_delta (
+    payment_intent_id,
+    customer_id,
+    invoice_id,
+    status,
+    amount,
+    currency,
+    created_at
+)
+FROM @STRIPE_OLAP.RAW.GCS_STAGE_PROD/dim_payment_intents
+PATTERN = '.*dim_payment_intents([.]|/part-[0-9]+[.])csv([.]gz)?'
+FILE_FORMAT = (
+    TYPE = CSV,
+    FIELD_DELIMITER = ',',
+    FIELD_OPTIONALLY_ENCLOSED_BY = '"',
+    SKIP_HEADER = 1
+);
+MERGE INTO dim_payment_intents AS t
+USING dim_payment_intents_delta AS s
+ON t.payment_intent_id = s.payment_intent_id
+WHEN MATCHED THEN UPDATE SET
+    customer_id = s.customer_id,
+    invoice_id = s.invoice_id,
+    status = s.status,
+    amount = s.amount,
+    currency = s.currency,
+    created_at = s.created_at
+WHEN NOT MATCHED THEN INSERT (payment_intent_id, customer_id, invoice_id, status, amount, currency, created_at)
+VALUES (s.payment_intent_id, s.customer_id, s.invoice_id, s.status, s.amount, s.currency, s.created_at);
+
+CREATE OR REPLACE TEMPORARY TABLE dim_charges_delta LIKE dim_charges;
+COPY INTO dim_charges_delta (
+    charge_id,
+    payment_intent_id,
+    customer_id,
+    amount,
+    currency,
+    status,
+    paid,
+    created_at
+)
+FROM @STRIPE_OLAP.RAW.GCS_STAGE_PROD/dim_charges
+PATTERN = '.*dim_charges([.]|/part-[0-9]+[.])csv([.]gz)?'
+FILE_FORMAT = (
+    TYPE = CSV,
+    FIELD_DELIMITER = ',',
+    FIELD_OPTIONALLY_ENCLOSED_BY = '"',
+    SKIP_HEADER = 1
+);
+MERGE INTO dim_charges AS t
+USING dim_charges_delta AS s
+ON t.charge_id = s.charge_id
+WHEN MATCHED THEN UPDATE SET
+    payment_intent_id = s.payment_intent_id,
+    customer_id = s.customer_id,
+    amount = s.amount,
+    currency = s.currency,
+    status = s.status,
+    paid = s.paid,
+    created_at = s.created_at
+WHEN NOT MATCHED THEN INSERT (charge_id, payment_intent_id, customer_id, amount, currency, status, paid, created_at)
+VALUES (s.charge_id, s.payment_intent_id, s.customer_id, s.amount, s.currency, s.status, s.paid, s.created_at);
+
+CREATE OR REPLACE TEMPORARY TABLE agg_revenue_monthly_delta LIKE agg_revenue_monthly;
+COPY INTO agg_revenue_monthly_delta (
+    month,
+    currency,
+    product_id,
+    revenue,
+    invoices
+)
+FROM @STRIPE_OLAP.RAW.GCS_STAGE_PROD/agg_revenue_monthly
+PATTERN = '.*agg_revenue_monthly([.]|/part-[0-9]+[.])csv([.]gz)?'
+FILE_FORMAT = (
+    TYPE = CSV,
+    FIELD_DELIMITER = ',',
+    FIELD_OPTIONALLY_ENCLOSED_BY = '"',
+    SKIP_HEADER = 1
+);
+MERGE INTO agg_revenue_monthly AS t
+USING agg_revenue_monthly_delta AS s
+ON t.month = s.month AND t.currency = s.currency AND t.product_id = s.product_id
+WHEN MATCHED THEN UPDATE SET
+    revenue = s.revenue,
+    invoices = s.invoices
+WHEN NOT MATCHED THEN INSERT (month, currency, product_id, revenue, invoices)
+VALUES (s.month, s.currency, s.product_id, s.revenue, s.invoices);
+
+CREATE OR REPLACE TEMPORARY TABLE agg_customer_ltv_delta LIKE agg_customer_ltv;
+COPY INTO agg_customer_ltv_delta (
+    customer_id,
+    currency,
+    lifetime_value,
+    invoices,
+    first_invoice_at,
+    last_invoice_at
+)
+FROM @STRIPE_OLAP.RAW.GCS_STAGE_PROD/agg_customer_ltv
+PATTERN = '.*agg_customer_ltv([.]|/part-[0-9]+[.])csv([.]gz)?'
+FILE_FORMAT = (
+    TYPE = CSV,
+    FIELD_DELIMITER = ',',
+    FIELD_OPTIONALLY_ENCLOSED_BY = '"',
+    SKIP_HEADER = 1
+);
+MERGE INTO agg_customer_ltv AS t
+USING agg_customer_ltv_delta AS s
+ON t.customer_id = s.customer_id AND t.currency = s.currency
+WHEN MATCHED THEN UPDATE SET
+    lifetime_value = s.lifetime_value,
+    invoices = s.invoices,
+    first_invoice_at = s.first_invoice_at,
+    last_invoice_at = s.last_invoice_at
+WHEN NOT MATCHED THEN INSERT (customer_id, currency, lifetime_value, invoices, first_invoice_at, last_invoice_at)
+VALUES (s.customer_id, s.currency, s.lifetime_value, s.invoices, s.first_invoice_at, s.last_invoice_at);
+
+CREATE OR REPLACE TEMPORARY TABLE agg_mrr_monthly_delta LIKE agg_mrr_monthly;
+COPY INTO agg_mrr_monthly_delta (
+    month,
+    plan_interval,
+    currency,
+    mrr,
+    invoices
+)
+FROM @STRIPE_OLAP.RAW.GCS_STAGE_PROD/agg_mrr_monthly
+PATTERN = '.*agg_mrr_monthly([.]|/part-[0-9]+[.])csv([.]gz)?'
+FILE_FORMAT = (
+    TYPE = CSV,
+    FIELD_DELIMITER = ',',
+    FIELD_OPTIONALLY_ENCLOSED_BY = '"',
+    SKIP_HEADER = 1
+);
+MERGE INTO agg_mrr_monthly AS t
+USING agg_mrr_monthly_delta AS s
+ON t.month = s.month AND t.plan_interval = s.plan_interval AND t.currency = s.currency
+WHEN MATCHED THEN UPDATE SET
+    mrr = s.mrr,
+    invoices = s.invoices
+WHEN NOT MATCHED THEN INSERT (month, plan_interval, currency, mrr, invoices)
+VALUES (s.month, s.plan_interval, s.currency, s.mrr, s.invoices);
@@ -1,8 +1,10 @@
+-- Les vues de revenu lisent les tables agrégées maintenues par l'ETL (scripts/rollups.py)
+-- au lieu de parcourir fact_invoices à chaque requête
 CREATE OR REPLACE VIEW vw_monthly_revenue AS
 SELECT
-    DATE_TRUNC('month', created_at) AS month,
-    SUM(amount_paid) AS total_revenue
-FROM fact_invoices
+    month,
+    SUM(revenue) AS total_revenue
+FROM agg_revenue_monthly
 GROUP BY 1
 ORDER BY 1;
 
@@ -16,7 +18,16 @@ WHERE status = 'active';
 CREATE OR REPLACE VIEW vw_customer_ltv AS
 SELECT
     customer_id,
-    SUM(amount_paid) AS lifetime_value
-FROM fact_invoices
+    SUM(lifetime_value) AS lifetime_value
+FROM agg_customer_ltv
 GROUP BY customer_id;
 
+
+CREATE OR REPLACE VIEW vw_mrr_by_interval AS
+SELECT
+    month,
+    plan_interval,
+    currency,
+    mrr
+FROM agg_mrr_monthly
+ORDER BY 1, 2, 3;
@@ -0,0 +1,228 @@
+import os
+import re
+import hashlib
+import threading
+from pathlib import Path
+from typing import NamedTuple, Optional
+
+from dotenv import load_dotenv
+
+from scripts.metrics import stage
+
+# This module parses SQL scripts into statements (strings and comments aware) and runs them in batches.
+
+load_dotenv()
+
+# Table (schéma courant) des empreintes des objets déjà créés : une instruction inchangée n'est pas rejouée
+SQL_CHECKSUM_TABLE = os.getenv("SQL_CHECKSUM_TABLE", "SQL_SCRIPT_CHECKSUMS")
+# Objets dont la création peut être sautée si l'empreinte est à jour, et la vue INFORMATION_SCHEMA qui
+# confirme qu'ils existent encore. Les tables n'en font pas partie : CREATE OR REPLACE TABLE vide la table
+# avant un rechargement complet, il doit toujours s'exécuter.
+CHECKSUM_OBJECT_TYPES = {"VIEW": "VIEWS"}
+# Empreintes des données chargées dans une table (manifeste de l'ETL), enregistrées après un chargement réussi
+TABLE_DATA = "TABLE_DATA"
+TABLE_DATA_CHECKSUMS = {TABLE_DATA: "TABLES"}
+
+_TOKENS = re.compile(r"""
+    (?P<string>'(?:[^'\\]|\\.|'')*')
+  | (?P<identifier>"(?:[^"]|"")*")
+  | (?P<dollar>\$\$.*?\$\$)
+  | (?P<comment>(?:--|//)[^\n]*|/\*.*?\*/)
+  | (?P<semicolon>;)
+  | (?P<unterminated>['"]|\$\$|/\*)
+  | (?P<code>[^'"$;/-]+|.)
+""", re.VERBOSE | re.DOTALL)
+
+_CREATE = re.compile(
+    r"^CREATE\s+(?:OR\s+REPLACE\s+)?(?:(?:TEMPORARY|TEMP|TRANSIENT|SECURE)\s+)*"
+    r"(TABLE|VIEW|STAGE|SCHEMA|DATABASE|WAREHOUSE|FILE\s+FORMAT)\s+(?:IF\s+NOT\s+EXISTS\s+)?([\w.$\"]+)",
+    re.IGNORECASE,
+)
+# ALTER TABLE (search optimization, ...) : rattaché à la table pour être sauté avec sa création
+_ALTER_TABLE = re.compile(r"^ALTER\s+TABLE\s+(?:IF\s+EXISTS\s+)?([\w.$\"]+)", re.IGNORECASE)
+
+
+class Statement(NamedTuple):
+    text: str
+    kind: str
+    object_type: Optional[str] = None
+    object_name: Optional[str] = None
+
+    @property
+    def checksum(self) -> str:
+        return hashlib.sha256(" ".join(self.text.split()).encode()).hexdigest()
+
+    @property
+    def skippable(self) -> bool:
+        return self.object_type in CHECKSUM_OBJECT_TYPES
+
+
+def split_statements(sql: str) -> list:
+    """
+    Découpe un script en instructions sur les `;` de premier niveau : les `;` dans une chaîne ('...'),
+    un identifiant ("..."), un bloc $$...$$ ou un commentaire (--, //, /* */) sont ignorés.
+    Les commentaires sont retirés ; une instruction vide n'est pas renvoyée.
+    """
+    statements, current = [], []
+    for match in _TOKENS.finditer(sql):
+        kind = match.lastgroup
+        if kind == "unterminated":
+            line = sql.count("\n", 0, match.start()) + 1
+            raise ValueError(f"Unterminated {match.group()!r} at line {line}")
+        if kind == "comment":
+            current.append(" ")
+        elif kind == "semicolon":
+            statements.append("".join(current))
+            current = []
+        else:
+            current.append(match.group())
+    statements.append("".join(current))
+    return [text.strip() for text in statements if text.strip()]
+
+
+def parse_statement(text: str) -> Statement:
+    kind = text.split(None, 1)[0].upper()
+    match = _CREATE.match(text)
+    if not match:
+        alter = _ALTER_TABLE.match(text)
+        if alter:
+            return Statement(text, kind, object_name=alter.group(1).split(".")[-1].strip('"').upper())
+        return Statement(text, kind)
+    object_type = " ".join(match.group(1).upper().split())
+    return Statement(text, kind, object_type, match.group(2).split(".")[-1].strip('"').upper())
+
+
+def render(template: str, substitutions: dict = None, replacements: dict = None) -> str:
+    for key, val in (substitutions or {}).items():
+        template = template.replace(f"{{{{{key}}}}}", val)
+    # Réécritures littérales (ex. CREATE OR REPLACE -> CREATE IF NOT EXISTS en incrémental)
+    for old, new in (replacements or {}).items():
+        template = template.replace(old, new)
+    return template
+
+
+_CACHE = {}
+_CACHE_LOCK = threading.Lock()
+
+
+def read_template(path) -> str:
+    """Contenu brut d'un script, relu seulement si le fichier a changé (mtime)."""
+    return _cached(("template", str(path)), path, lambda: Path(path).read_text())
+
+
+def load_script(path, substitutions: dict = None, replacements: dict = None) -> tuple:
+    """Instructions d'un script après substitution, parsées une fois par (fichier, version, paramètres)."""
+    key = ("script", str(path), tuple(sorted((substitutions or {}).items())), tuple((replacements or {}).items()))
+    return _cached(key, path, lambda: tuple(
+        parse_statement(text) for text in split_statements(render(read_template(path), substitutions, replacements))
+    ))
+
+
+def _cached(key, path, compute):
+    mtime = Path(path).stat().st_mtime_ns
+    with _CACHE_LOCK:
+        hit = _CACHE.get(key)
+    if hit is not None and hit[0] == mtime:
+        return hit[1]
+    value = compute()
+    with _CACHE_LOCK:
+        _CACHE[key] = (mtime, value)
+    return value
+
+
+def current_checksums(conn, object_types: dict = CHECKSUM_OBJECT_TYPES) -> dict:
+    """Empreintes enregistrées des objets qui existent encore dans le schéma courant ({(type, nom): sha})."""
+    queries = [
+        f"SELECT '{object_type}', c.object_name, c.checksum FROM {SQL_CHECKSUM_TABLE} c "
+        f"JOIN INFORMATION_SCHEMA.{view} o ON UPPER(o.table_name) = c.object_name "
+        f"AND o.table_schema = CURRENT_SCHEMA() "
+        f"WHERE c.object_type = '{object_type}'"
+        for object_type, view in object_types.items()
+    ]
+    cur = conn.cursor()
+    try:
+        cur.execute(" UNION ALL ".join(queries))
+        return {(object_type, name): checksum for object_type, name, checksum in cur.fetchall()}
+    except Exception:
+        # Table des empreintes pas encore créée (premier run) : rien n'est à jour
+        return {}
+    finally:
+        cur.close()
+
+
+def _checksum_table(schema: str = None) -> str:
+    return f"{schema}.{SQL_CHECKSUM_TABLE}" if schema else SQL_CHECKSUM_TABLE
+
+
+def checksum_table_statement(schema: str = None) -> str:
+    return (f"CREATE TABLE IF NOT EXISTS {_checksum_table(schema)} (object_type STRING, object_name STRING, "
+            "checksum STRING, applied_at TIMESTAMP_NTZ)")
+
+
+def checksum_statements(entries: list, schema: str = None) -> list:
+    """
+    Création (si besoin) de la table des empreintes et MERGE des (type, nom, empreinte) donnés.
+    `schema` : table des empreintes d'un autre schéma que le schéma courant.
+    """
+    values = ", ".join(f"('{object_type}', '{name}', '{checksum}')" for object_type, name, checksum in entries)
+    return [
+        checksum_table_statement(schema),
+        f"MERGE INTO {_checksum_table(schema)} AS t USING (SELECT * FROM (VALUES {values}) "
+        "AS v (object_type, object_name, checksum)) AS s "
+        "ON t.object_type = s.object_type AND t.object_name = s.object_name "
+        "WHEN MATCHED THEN UPDATE SET checksum = s.checksum, applied_at = CURRENT_TIMESTAMP()::TIMESTAMP_NTZ "
+        "WHEN NOT MATCHED THEN INSERT (object_type, object_name, checksum, applied_at) "
+        "VALUES (s.object_type, s.object_name, s.checksum, CURRENT_TIMESTAMP()::TIMESTAMP_NTZ)",
+    ]
+
+
+def forget_checksums_statements(object_type: str, names: list, schema: str = None) -> list:
+    """Efface des empreintes avant de recréer les objets : un échec en cours de route ne laisse rien de « à jour »."""
+    listed = ", ".join(f"'{name}'" for name in names)
+    return [
+        checksum_table_statement(schema),
+        f"DELETE FROM {_checksum_table(schema)} WHERE object_type = '{object_type}' AND object_name IN ({listed})",
+    ]
+
+
+def execute_batch(conn, texts: list, source: str):
+    """
+    Envoie les instructions en une seule requête multi-instructions (MULTI_STATEMENT_COUNT = n) :
+    un aller-retour au lieu d'un par instruction. La requête s'arrête à la première erreur.
+    """
+    print(f"▶ Executing {len(texts)} statement(s) from {Path(source).name} in one batch")
+    cur = conn.cursor()
+    try:
+        # Le nombre d'instructions est un label : rows_in / rows_out restent des nombres de lignes
+        with stage("sql", file=Path(source).name, statement="BATCH", statements=len(texts)):
+            cur.execute(";\n".join(texts), num_statements=len(texts))
+            while cur.nextset():
+                pass
+    finally:
+        cur.close()
+
+
+def run_script(conn, path, substitutions: dict = None, replacements: dict = None,
+               skip_current: bool = True, skip_objects=()) -> dict:
+    """
+    Exécute un script : instructions parsées (et mises en cache), envoyées en un seul batch.
+    Les créations d'objets de CHECKSUM_OBJECT_TYPES dont l'empreinte enregistrée est identique
+    (et l'objet toujours présent) sont sautées ; les empreintes sont mises à jour dans le même batch.
+    Les instructions créant un objet de `skip_objects` (noms en majuscules) ne sont pas exécutées.
+    Renvoie {"executed": n, "skipped": [noms]}.
+    """
+    statements = [s for s in load_script(path, substitutions, replacements) if s.object_name not in skip_objects]
+    tracked = [s for s in statements if s.skippable] if skip_current else []
+    current = current_checksums(conn) if tracked else {}
+
+    skipped = [s for s in tracked if current.get((s.object_type, s.object_name)) == s.checksum]
+    to_run = [s for s in statements if s not in skipped]
+    if skipped:
+        print(f"⏭ Up to date, skipped: {', '.join(s.object_name for s in skipped)}")
+
+    changed = [s for s in tracked if s not in skipped]
+    entries = [(s.object_type, s.object_name, s.checksum) for s in changed]
+    texts = [s.text for s in to_run] + (checksum_statements(entries) if entries else [])
+    if texts:
+        execute_batch(conn, texts, str(path))
+    return {"executed": len(to_run), "skipped": [s.object_name for s in skipped]}
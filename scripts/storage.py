@@ -0,0 +1,290 @@
+import os
+import time
+import shutil
+import threading
+from pathlib import Path
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import NamedTuple, Optional
+
+import google.auth
+from dotenv import load_dotenv
+from google.cloud import storage
+from google.api_core.exceptions import NotFound
+from google.auth.transport.requests import AuthorizedSession
+from requests.adapters import HTTPAdapter
+
+# This module hides the object store behind one small interface (GCS in production, local folder offline).
+
+load_dotenv()
+
+OFFLINE = os.getenv("OFFLINE", "0") == "1"
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "local" if OFFLINE else "gcs").lower()
+LOCAL_GCS_ROOT = os.getenv("LOCAL_GCS_ROOT", ".local_gcs")
+LISTING_TTL = float(os.getenv("STORAGE_LISTING_TTL", "300"))
+
+# Client GCS unique, créé à la demande (voir get_storage_client)
+STORAGE_POOL_SIZE = int(os.getenv("STORAGE_POOL_SIZE", "16"))
+# Taille des morceaux d'un upload résumable (multiple de 256 Ko imposé par GCS)
+UPLOAD_CHUNK_SIZE = int(os.getenv("UPLOAD_CHUNK_SIZE_MB", "16")) * 1024 * 1024
+_STORAGE_CLIENT = None
+_STORAGE_CLIENT_LOCK = threading.Lock()
+
+_STORAGES = {}
+_STORAGES_LOCK = threading.Lock()
+
+
+def configure_storage_client(pool_size: int = STORAGE_POOL_SIZE):
+    """
+    Client GCS sur une session autorisée (credentials ADC) dont le pool HTTP est élargi à `pool_size`
+    connexions, pour que des uploads concurrents réutilisent leurs connexions.
+    """
+    credentials, project = google.auth.default(scopes=storage.Client.SCOPE)
+    session = AuthorizedSession(credentials)
+    session.mount("https://", HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size))
+    # Sans projet par défaut, le client garde son propre repli (variables d'environnement)
+    options = {"project": project} if project else {}
+    return storage.Client(credentials=credentials, _http=session, **options)
+
+
+def get_storage_client(pool_size: int = STORAGE_POOL_SIZE):
+    """Client GCS partagé par tout le process (et ses threads d'upload)."""
+    global _STORAGE_CLIENT
+    with _STORAGE_CLIENT_LOCK:
+        if _STORAGE_CLIENT is None:
+            _STORAGE_CLIENT = configure_storage_client(pool_size)
+        return _STORAGE_CLIENT
+
+
+class BlobInfo(NamedTuple):
+    name: str
+    size: int
+    updated: datetime
+    generation: Optional[str] = None
+    md5_hash: Optional[str] = None
+
+
+class _TTLCache:
+    """Cache mémoire des listings, invalidé par préfixe à chaque écriture."""
+
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def get_or_set(self, key, compute):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[0] > now:
+                return entry[1]
+        value = compute()
+        with self._lock:
+            self._entries[key] = (now + self.ttl, value)
+        return value
+
+    def invalidate(self, name: str = None):
+        with self._lock:
+            if name is None:
+                self._entries.clear()
+                return
+            # Une écriture sur `name` invalide tous les listings dont le préfixe le couvre
+            for key in [k for k in self._entries if name.startswith(k[1])]:
+                del self._entries[key]
+
+
+class GCSStorage:
+    """Bucket GCS ; un seul client partagé, listings mis en cache `listing_ttl` secondes."""
+
+    # Les blobs distants passent par le cache disque (voir blob_cache)
+    cacheable = True
+
+    def __init__(self, bucket_name: str, client=None, listing_ttl: float = LISTING_TTL):
+        self.bucket_name = bucket_name
+        self.client = client or get_storage_client()
+        self.bucket = self.client.bucket(bucket_name)
+        self._listings = _TTLCache(listing_ttl)
+
+    def __repr__(self):
+        return f"gs://{self.bucket_name}"
+
+    @staticmethod
+    def _info(blob) -> BlobInfo:
+        return BlobInfo(blob.name, blob.size, blob.updated, str(blob.generation) if blob.generation else None,
+                        blob.md5_hash)
+
+    def list(self, prefix: str = "") -> list:
+        return self._listings.get_or_set(
+            ("list", prefix), lambda: [self._info(b) for b in self.bucket.list_blobs(prefix=prefix)]
+        )
+
+    def list_folders(self, prefix: str = "") -> list:
+        """Sous-dossiers directs de `prefix`, via delimiter : aucun objet n'est énuméré."""
+        def compute():
+            iterator = self.bucket.list_blobs(prefix=prefix, delimiter="/")
+            for _ in iterator:
+                pass
+            return sorted(iterator.prefixes)
+        return self._listings.get_or_set(("folders", prefix), compute)
+
+    def stat(self, name: str) -> Optional[BlobInfo]:
+        blob = self.bucket.get_blob(name)
+        return self._info(blob) if blob is not None else None
+
+    def exists(self, name: str) -> bool:
+        return self.bucket.blob(name).exists()
+
+    def open_read(self, name: str, chunk_size: int = None):
+        return self.bucket.blob(name).open("rb", chunk_size=chunk_size)
+
+    def read_bytes(self, name: str) -> bytes:
+        return self.bucket.blob(name).download_as_bytes()
+
+    def read_bytes_if_exists(self, name: str) -> Optional[bytes]:
+        """Un seul GET : None si l'objet n'existe pas (pas de exists() préalable)."""
+        try:
+            return self.bucket.blob(name).download_as_bytes()
+        except NotFound:
+            return None
+
+    def download_to(self, name: str, path):
+        self.bucket.blob(name).download_to_filename(str(path))
+
+    def write_bytes(self, name: str, data: bytes, content_type: str = None):
+        self.bucket.blob(name).upload_from_string(data, content_type=content_type)
+        self._listings.invalidate(name)
+
+    def upload_file(self, name: str, fileobj, content_type: str = None):
+        self.bucket.blob(name).upload_from_file(fileobj, content_type=content_type)
+        self._listings.invalidate(name)
+
+    @contextmanager
+    def open_write(self, name: str, content_type: str = None, chunk_size: int = UPLOAD_CHUNK_SIZE):
+        """
+        Flux d'écriture vers un upload résumable : envoyé par morceaux de `chunk_size`,
+        finalisé à la sortie du bloc, abandonné (terminate) si le bloc lève.
+        """
+        blob = self.bucket.blob(name)
+        with blob.open("wb", chunk_size=chunk_size, ignore_flush=True, content_type=content_type) as writer:
+            yield writer
+        self._listings.invalidate(name)
+
+    def delete(self, name: str):
+        self.bucket.blob(name).delete()
+        self._listings.invalidate(name)
+
+    def copy(self, source: str, name: str):
+        """Copie côté serveur (rewrite GCS) : aucun octet ne transite par le process."""
+        self.bucket.copy_blob(self.bucket.blob(source), self.bucket, name)
+        self._listings.invalidate(name)
+
+    def invalidate(self, name: str = None):
+        self._listings.invalidate(name)
+
+
+class LocalStorage:
+    """Même interface que GCSStorage sur un dossier local (tests et runs hors-ligne)."""
+
+    cacheable = False
+
+    def __init__(self, root):
+        self.root = Path(root)
+
+    def __repr__(self):
+        return f"file://{self.root}"
+
+    def _path(self, name: str) -> Path:
+        return self.root / name
+
+    def _info(self, path: Path) -> BlobInfo:
+        st = path.stat()
+        return BlobInfo(path.relative_to(self.root).as_posix(), st.st_size,
+                        datetime.fromtimestamp(st.st_mtime, tz=timezone.utc), f"{st.st_mtime_ns}-{st.st_size}")
+
+    def list(self, prefix: str = "") -> list:
+        # Parcours limité au dossier du préfixe (le root peut être le dossier courant en local)
+        base = self._path(prefix.rpartition("/")[0])
+        if not base.is_dir():
+            return []
+        return sorted(
+            (self._info(p) for p in base.rglob("*")
+             if p.is_file() and p.relative_to(self.root).as_posix().startswith(prefix)),
+            key=lambda b: b.name,
+        )
+
+    def list_folders(self, prefix: str = "") -> list:
+        folder = self._path(prefix)
+        if not prefix.endswith("/") or not folder.is_dir():
+            return []
+        return sorted(f"{prefix}{p.name}/" for p in folder.iterdir() if p.is_dir())
+
+    def stat(self, name: str) -> Optional[BlobInfo]:
+        path = self._path(name)
+        return self._info(path) if path.is_file() else None
+
+    def exists(self, name: str) -> bool:
+        return self._path(name).is_file()
+
+    def open_read(self, name: str, chunk_size: int = None):
+        return open(self._path(name), "rb")
+
+    def read_bytes(self, name: str) -> bytes:
+        return self._path(name).read_bytes()
+
+    def read_bytes_if_exists(self, name: str) -> Optional[bytes]:
+        path = self._path(name)
+        return path.read_bytes() if path.is_file() else None
+
+    def download_to(self, name: str, path):
+        shutil.copyfile(self._path(name), path)
+
+    def write_bytes(self, name: str, data: bytes, content_type: str = None):
+        path = self._path(name)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(path.name + ".tmp")
+        tmp_path.write_bytes(data if isinstance(data, bytes) else data.encode())
+        tmp_path.replace(path)
+
+    def upload_file(self, name: str, fileobj, content_type: str = None):
+        path = self._path(name)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, "wb") as out:
+            shutil.copyfileobj(fileobj, out)
+
+    @contextmanager
+    def open_write(self, name: str, content_type: str = None, chunk_size: int = None):
+        """Écrit dans un fichier temporaire, renommé à la sortie du bloc (supprimé si le bloc lève)."""
+        path = self._path(name)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(path.name + ".tmp")
+        try:
+            with open(tmp_path, "wb") as out:
+                yield out
+            tmp_path.replace(path)
+        finally:
+            tmp_path.unlink(missing_ok=True)
+
+    def delete(self, name: str):
+        self._path(name).unlink(missing_ok=True)
+
+    def copy(self, source: str, name: str):
+        path = self._path(name)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        shutil.copyfile(self._path(source), path)
+
+    def invalidate(self, name: str = None):
+        pass
+
+
+def get_storage(bucket_name: str):
+    """
+    Stockage partagé pour `bucket_name` : GCS, ou LOCAL_GCS_ROOT/<bucket> si STORAGE_BACKEND=local
+    (par défaut quand OFFLINE=1).
+    """
+    with _STORAGES_LOCK:
+        if bucket_name not in _STORAGES:
+            if STORAGE_BACKEND == "local":
+                _STORAGES[bucket_name] = LocalStorage(Path(LOCAL_GCS_ROOT) / (bucket_name or "default"))
+            else:
+                _STORAGES[bucket_name] = GCSStorage(bucket_name)
+        return _STORAGES[bucket_name]
@@ -1,28 +1,40 @@
 import os
+from pathlib import Path
+
 import pytest
 from scripts.olap_io import load_latest_oltp_json_from_gcs, load_latest_olap_outputs
+from scripts.csv_builders import BUILDERS
 from scripts.gcp import configure_gcp_credentials
 
+# OFFLINE=1 (make test-offline) : dump lu depuis tests/data/oltp_dump, pas de GCS
+OFFLINE = os.getenv("OFFLINE", "0") == "1"
+DUMP_DIR = Path(__file__).parent / "data" / "oltp_dump"
+
 @pytest.fixture(scope="session", autouse=True)
 def gcp_setup():
     """
     Configure les credentials GCP une seule fois pour toute la session de test.
     """
+    if OFFLINE:
+        return
     configure_gcp_credentials()
 
 @pytest.fixture(scope="session")
 def raw_json_dump(gcp_setup):
     """
-    Charge le dernier dump JSON depuis GCS.
+    Charge le dernier dump JSON depuis GCS (ou le dump local en mode OFFLINE).
     """
     return load_latest_oltp_json_from_gcs()
 
 @pytest.fixture(scope="session")
-def olap_outputs(gcp_setup):
+def olap_outputs(gcp_setup, raw_json_dump):
     """
     Charge les derniers outputs OLAP depuis GCS.
+    En mode OFFLINE, ils sont reconstruits à partir du dump local.
     """
+    if OFFLINE:
+        return {name: builder(raw_json_dump) for name, builder in BUILDERS.items()}
     bucket = os.getenv("GCS_BUCKET")
     if not bucket:
         pytest.exit("❌ GCS_BUCKET not set in environment")
-    return load_latest_olap_outputs(bucket)#
+    return load_latest_olap_outputs(bucket)
@@ -0,0 +1,46 @@
+import os
+from datetime import datetime, timezone
+
+from scripts.blob_cache import BlobCache
+from scripts.storage import BlobInfo, LocalStorage
+
+UPDATED = datetime(2025, 1, 1, tzinfo=timezone.utc)
+
+
+def _put(store, name, data):
+    store.write_bytes(name, data)
+    return BlobInfo(name, len(data), UPDATED, generation="1")
+
+
+def test_new_generation_is_a_miss(tmp_path):
+    store = LocalStorage(tmp_path / "bucket")
+    cache = BlobCache(tmp_path / "cache")
+    info = _put(store, "dump/a.json", b"v1")
+
+    assert cache.fetch(store, info).read_bytes() == b"v1"
+    assert cache.fetch(store, info).read_bytes() == b"v1"
+    assert (cache.hits, cache.misses) == (1, 1)
+
+    store.write_bytes("dump/a.json", b"v2")
+    assert cache.fetch(store, info._replace(generation="2")).read_bytes() == b"v2"
+    assert (cache.hits, cache.misses) == (1, 2)
+
+
+def test_lru_eviction_by_size(tmp_path):
+    store = LocalStorage(tmp_path / "bucket")
+    cache = BlobCache(tmp_path / "cache", max_bytes=10)
+    a = _put(store, "a", b"x" * 4)
+    b = _put(store, "b", b"x" * 4)
+    c = _put(store, "c", b"x" * 4)
+
+    cache.fetch(store, a)
+    cache.fetch(store, b)
+    # `a` redevient le plus récent : c'est `b` qui sort quand `c` arrive
+    os.utime(cache.path_for(b), (0, 0))
+    cache.fetch(store, a)
+    cache.fetch(store, c)
+
+    assert cache.path_for(a).exists()
+    assert not cache.path_for(b).exists()
+    assert cache.path_for(c).exists()
+    assert cache.evictions == 1
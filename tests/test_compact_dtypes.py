@@ -0,0 +1,37 @@
+import pandas as pd
+
+from scripts.csv_builders import CATEGORY_COLUMNS, TABLE_SCHEMAS, compact_dtypes, memory_usage_mb
+
+
+def test_builders_emit_compact_schema(olap_outputs):
+    for name, df in olap_outputs.items():
+        for col, logical_type in TABLE_SCHEMAS[name].items():
+            dtype = df[col].dtype
+            if logical_type == "timestamp":
+                assert str(dtype) == "datetime64[ns, UTC]", (name, col, dtype)
+            elif logical_type == "string" and col in CATEGORY_COLUMNS:
+                assert isinstance(dtype, pd.CategoricalDtype), (name, col, dtype)
+            elif logical_type == "string":
+                assert dtype == "string[pyarrow]", (name, col, dtype)
+            elif logical_type == "integer":
+                assert dtype == "Int64", (name, col, dtype)
+            elif logical_type == "boolean":
+                assert dtype == "boolean", (name, col, dtype)
+
+
+def test_compact_frames_are_smaller_than_object_frames():
+    # Garde-fou de régression : la version compacte doit rester nettement plus petite
+    n = 10_000
+    df = pd.DataFrame({
+        "charge_id": [f"ch_{i:024d}" for i in range(n)],
+        "payment_intent_id": [f"pi_{i:024d}" for i in range(n)],
+        "customer_id": [f"cus_{i % 500:014d}" for i in range(n)],
+        "amount": [1200] * n,
+        "currency": ["eur", "usd"] * (n // 2),
+        "status": ["succeeded"] * n,
+        "paid": [True] * n,
+        "created_at": ["2025-05-28 18:35:20"] * n,
+    }).astype(object)
+    compact = compact_dtypes(df, "dim_charges")
+    assert memory_usage_mb(compact) < memory_usage_mb(df) / 2
+
@@ -0,0 +1,223 @@
+import copy
+
+import pandas as pd
+import pytest
+
+from benchmarks.synthetic_dump import generate_dump
+from scripts.csv_builders import BUILDERS, TABLE_KEYS, TABLE_SCHEMAS
+from scripts.duckdb_warehouse import DuckDBConnection, connect_to_duckdb, translate
+from scripts.etl_to_snowflake import run_tables
+from scripts.generate_copy_into_sql import generate_copy_into_sql
+from scripts.incremental import DELTA_PREFIX, ROW_HASHES, next_watermark, row_hashes
+from scripts.load_to_snowflake import main as load, run_load_script
+from scripts.manifest import write_manifest
+from scripts.rollups import ROLLUPS, build_rollup
+from scripts.sql_runner import run_script
+from scripts.storage import LocalStorage
+
+duckdb = pytest.importorskip("duckdb")
+
+TIMESTAMP = "2025-01-01_00-00-00"
+
+
+def test_translate_snowflake_statements():
+    assert translate("CREATE WAREHOUSE IF NOT EXISTS WH AUTO_SUSPEND = 60") is None
+    assert translate("USE SCHEMA RAW") == "USE RAW"
+    assert translate("CREATE TABLE t (receipt_number STRING, amount NUMBER)") == \
+        "CREATE TABLE t (receipt_number STRING, amount BIGINT)"
+    assert translate("CREATE OR REPLACE TEMPORARY TABLE t_delta LIKE t") == \
+        "CREATE OR REPLACE TEMPORARY TABLE t_delta AS SELECT * FROM t LIMIT 0"
+    # Indications physiques sans équivalent local
+    assert translate("CREATE OR REPLACE TRANSIENT TABLE t (at TIMESTAMP) CLUSTER BY (TO_DATE(at))") == \
+        "CREATE OR REPLACE TABLE t (at TIMESTAMP)"
+    assert translate("ALTER TABLE t ADD SEARCH OPTIMIZATION ON EQUALITY(id)") is None
+
+
+@pytest.fixture
+def local_bucket(tmp_path, monkeypatch):
+    """Bucket local partagé par l'ETL et le loader, comme avec OFFLINE=1 ENV=PROD."""
+    store = LocalStorage(tmp_path / "bucket")
+    for module in ("scripts.olap_io", "scripts.load_to_snowflake", "scripts.duckdb_warehouse"):
+        monkeypatch.setattr(f"{module}.get_storage", lambda bucket_name: store)
+    monkeypatch.setattr("scripts.olap_io.ENV", "PROD")
+    monkeypatch.setattr("scripts.load_to_snowflake.OFFLINE", True)
+    monkeypatch.setattr("scripts.duckdb_warehouse.DUCKDB_PATH", str(tmp_path / "olap.duckdb"))
+    monkeypatch.setenv("GCS_BUCKET", "bucket")
+    return store
+
+
+def test_full_load_and_views_on_duckdb(raw_json_dump, local_bucket, tmp_path, capsys):
+    manifest = write_manifest(TIMESTAMP, "csv", run_tables(raw_json_dump, TIMESTAMP, "csv"))
+    load(report_path=tmp_path / "load.json", backend="duckdb")
+
+    db = duckdb.connect(str(tmp_path / "olap.duckdb"))
+    db.execute("USE raw")
+    for name, entry in manifest["tables"].items():
+        assert db.execute(f"SELECT COUNT(*) FROM {name}").fetchone()[0] == entry["rows"]
+    fact_total = db.execute("SELECT SUM(amount_paid) FROM fact_invoices").fetchone()[0]
+    assert db.execute("SELECT SUM(total_revenue) FROM vw_monthly_revenue").fetchone()[0] == fact_total
+    assert db.execute("SELECT SUM(lifetime_value) FROM vw_customer_ltv").fetchone()[0] == fact_total
+    assert db.execute("SELECT COUNT(*) FROM vw_active_subscriptions").fetchone()[0] == db.execute(
+        "SELECT COUNT(*) FROM dim_subscriptions WHERE status = 'active'").fetchone()[0]
+    db.close()
+
+    # Second chargement du même run : empreintes et vues à jour, rien n'est rechargé
+    capsys.readouterr()
+    load(report_path=tmp_path / "load2.json", backend="duckdb")
+    out = capsys.readouterr().out
+    assert "Unchanged since last load, skipped: " + ", ".join(sorted(manifest["tables"])) in out
+    assert "Up to date, skipped: VW_MONTHLY_REVENUE" in out
+
+
+def test_parquet_copy_on_duckdb(raw_json_dump, local_bucket, tmp_path):
+    manifest = write_manifest(TIMESTAMP, "parquet", run_tables(raw_json_dump, TIMESTAMP, "parquet"))
+    script = tmp_path / "copy_parquet.sql"
+    script.write_text(generate_copy_into_sql(TABLE_SCHEMAS, fmt="parquet"))
+
+    conn = connect_to_duckdb(":memory:", stage_root=local_bucket.root)
+    run_script(conn, "scripts/sql/create_tables.sql")
+    run_script(conn, "scripts/sql/create_stage.sql", {"BUCKET": "bucket", "OLAP_PATH": manifest["folder"]})
+    loads = run_load_script(str(script), conn, {})
+    assert {load.table: load.rows for load in loads} == {name: e["rows"] for name, e in manifest["tables"].items()}
+
+
+def test_incremental_merge_keeps_rollups_exact(local_bucket, tmp_path, monkeypatch):
+    raw = generate_dump(200, seed=11)
+    fact = BUILDERS["fact_invoices"](raw)
+    cutoff = fact["created_at"].quantile(0.8)
+    old_ids = set(fact.loc[(fact["created_at"] < cutoff).to_numpy(), "invoice_id"])
+    old_raw = {**raw, "invoices": [invoice for invoice in raw["invoices"] if invoice["id"] in old_ids]}
+
+    write_manifest(TIMESTAMP, "csv", run_tables(old_raw, TIMESTAMP, "csv"))
+    load(report_path=tmp_path / "full.json", backend="duckdb")
+
+    # Run incrémental : factures au-delà du high-water mark, agrégats des seuls groupes touchés
+    old_fact = BUILDERS["fact_invoices"](old_raw)
+    state = {"fact_invoices": next_watermark(old_fact, "fact_invoices"), ROW_HASHES: {"fact_invoices": row_hashes(old_fact)}}
+    delta_run = "2025-01-02_00-00-00"
+    results = run_tables(raw, delta_run, "csv", state=state)
+    write_manifest(delta_run, "csv", results, prefix=DELTA_PREFIX, mode="incremental")
+    touched = {r["table"]: r["rows"] for r in results}
+    assert 0 < touched["agg_revenue_monthly"] < len(build_rollup("agg_revenue_monthly", fact))
+    load(incremental=True, report_path=tmp_path / "delta.json", backend="duckdb")
+
+    db = duckdb.connect(str(tmp_path / "olap.duckdb"))
+    db.execute("USE raw")
+    for name in ROLLUPS:
+        keys = ", ".join(TABLE_KEYS[name])
+        loaded = db.execute(f"SELECT * FROM {name} ORDER BY {keys}").df()
+        expected = build_rollup(name, fact)
+        for col in expected.select_dtypes("datetimetz"):
+            expected[col] = expected[col].dt.tz_localize(None)
+        pd.testing.assert_frame_equal(loaded, expected, check_dtype=False, check_categorical=False, obj=name)
+    db.close()
+
+
+def product_names(path) -> list:
+    db = duckdb.connect(str(path))
+    names = sorted(row[0] for row in db.execute("SELECT name FROM raw.dim_products").fetchall())
+    db.close()
+    return names
+
+
+def test_staged_publish_swaps_only_complete_loads_and_resumes(raw_json_dump, local_bucket, tmp_path, monkeypatch):
+    write_manifest(TIMESTAMP, "csv", run_tables(raw_json_dump, TIMESTAMP, "csv"))
+    load(report_path=tmp_path / "first.json", backend="duckdb", staged=True)
+    before = product_names(tmp_path / "olap.duckdb")
+
+    raw = copy.deepcopy(raw_json_dump)
+    raw["products"][0]["name"] = "Renamed plan"
+    second = "2025-01-02_00-00-00"
+    write_manifest(second, "csv", run_tables(raw, second, "csv", previous=None))
+
+    # Le COPY de fact_invoices échoue : rien n'est publié, RAW garde la version précédente
+    copies = []
+    copy_into = DuckDBConnection.copy_into
+
+    def flaky_copy(self, table, *args):
+        copies.append(table)
+        if table == "fact_invoices" and failing:
+            raise RuntimeError("stage unreachable")
+        return copy_into(self, table, *args)
+
+    failing = True
+    monkeypatch.setattr(DuckDBConnection, "copy_into", flaky_copy)
+    with pytest.raises(RuntimeError, match="nothing published"):
+        load(report_path=tmp_path / "failed.json", backend="duckdb", staged=True)
+    assert product_names(tmp_path / "olap.duckdb") == before
+    assert {"dim_products", "fact_invoices"} <= set(copies)
+
+    # Reprise : seule la table en échec est recopiée, puis tout est échangé
+    failing = False
+    copies.clear()
+    load(report_path=tmp_path / "retry.json", backend="duckdb", staged=True)
+    assert copies == ["fact_invoices"]
+    assert "Renamed plan" in product_names(tmp_path / "olap.duckdb")
+
+    db = duckdb.connect(str(tmp_path / "olap.duckdb"))
+    fact_total = db.execute("SELECT SUM(amount_paid) FROM raw.fact_invoices").fetchone()[0]
+    assert db.execute("SELECT SUM(total_revenue) FROM raw.vw_monthly_revenue").fetchone()[0] == fact_total
+    # Les versions précédentes passées en staging par l'échange sont supprimées
+    assert db.execute("SELECT COUNT(*) FROM duckdb_tables() WHERE schema_name = 'raw_staging'").fetchone()[0] == 0
+    db.close()
+
+
+def test_staged_publish_rejects_row_count_drift(raw_json_dump, local_bucket, tmp_path):
+    results = run_tables(raw_json_dump, TIMESTAMP, "csv")
+    for result in results:
+        if result["table"] == "dim_prices":
+            result["rows"] += 1
+    write_manifest(TIMESTAMP, "csv", results)
+    with pytest.raises(RuntimeError, match="dim_prices: .* rows staged, manifest says"):
+        load(report_path=tmp_path / "load.json", backend="duckdb", staged=True)
+
+    db = duckdb.connect(str(tmp_path / "olap.duckdb"))
+    assert db.execute("SELECT COUNT(*) FROM raw.fact_invoices").fetchone()[0] == 0
+    db.close()
+
+
+def test_full_load_does_not_mark_short_copies_as_current(raw_json_dump, local_bucket, tmp_path, monkeypatch):
+    write_manifest(TIMESTAMP, "csv", run_tables(raw_json_dump, TIMESTAMP, "csv"))
+
+    # Le COPY de dim_prices ne trouve aucun fichier : la table finit « loaded » avec 0 ligne
+    copies = []
+    copy_into = DuckDBConnection.copy_into
+
+    def missing_files(self, table, columns, stage, path, pattern, file_type):
+        copies.append(table)
+        if table == "dim_prices" and missing:
+            pattern = "no-such-file"
+        return copy_into(self, table, columns, stage, path, pattern, file_type)
+
+    missing = True
+    monkeypatch.setattr(DuckDBConnection, "copy_into", missing_files)
+    with pytest.raises(RuntimeError, match="dim_prices: 0 rows loaded, manifest says"):
+        load(report_path=tmp_path / "failed.json", backend="duckdb")
+
+    # Le run suivant recharge dim_prices ; les tables complètes sont reconnues à jour
+    missing = False
+    copies.clear()
+    load(report_path=tmp_path / "retry.json", backend="duckdb")
+    assert copies == ["dim_prices"]
+    db = duckdb.connect(str(tmp_path / "olap.duckdb"))
+    assert db.execute("SELECT COUNT(*) FROM raw.dim_prices").fetchone()[0] == len(raw_json_dump["prices"])
+    db.close()
+
+
+def test_failed_load_keeps_the_last_success_textfile(raw_json_dump, local_bucket, tmp_path, monkeypatch):
+    write_manifest(TIMESTAMP, "csv", run_tables(raw_json_dump, TIMESTAMP, "csv"))
+    prom = tmp_path / "load.prom"
+
+    def unreachable(self, *args):
+        raise RuntimeError("stage unreachable")
+
+    with monkeypatch.context() as patch:
+        patch.setattr(DuckDBConnection, "copy_into", unreachable)
+        with pytest.raises(RuntimeError):
+            load(report_path=tmp_path / "failed.json", prometheus_path=prom, backend="duckdb")
+    # Échec : rapport JSON écrit, aucun horodatage de succès publié
+    assert (tmp_path / "failed.json").exists()
+    assert not prom.exists()
+
+    load(report_path=tmp_path / "load.json", prometheus_path=prom, backend="duckdb")
+    assert "stripe_olap_run_last_success_timestamp_seconds" in prom.read_text()
@@ -0,0 +1,147 @@
+import time
+import contextlib
+import threading
+
+import pandas as pd
+import pytest
+
+import scripts.etl_to_snowflake as etl
+import scripts.olap_io as olap_io
+from benchmarks.synthetic_dump import generate_dump, write_dump
+from scripts.csv_builders import BUILDERS
+from scripts.etl_to_snowflake import run_pipeline, run_tables
+from scripts.rollups import ROLLUPS
+
+
+@pytest.fixture
+def local_outputs(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr("scripts.olap_io.ENV", "DEV")
+    return tmp_path / "olap_outputs"
+
+
+def _read_all(folder):
+    return {name: pd.read_csv(folder / f"{name}.csv") for name in [*BUILDERS, *ROLLUPS]}
+
+
+@pytest.mark.parametrize("workers, process_builders", [(4, False), (2, True)])
+def test_parallel_run_matches_serial(raw_json_dump, local_outputs, workers, process_builders):
+    serial = run_tables(raw_json_dump, "ts", "csv")
+    expected = _read_all(local_outputs)
+
+    parallel = run_tables(raw_json_dump, "ts", "csv", workers=workers, process_builders=process_builders)
+    actual = _read_all(local_outputs)
+
+    assert [r["table"] for r in parallel] == list(BUILDERS) + list(ROLLUPS)
+    assert [r["rows"] for r in parallel] == [r["rows"] for r in serial]
+    for name in expected:
+        pd.testing.assert_frame_equal(actual[name], expected[name])
+
+
+def test_timings_are_reported(raw_json_dump, local_outputs):
+    results = run_tables(raw_json_dump, "ts", "csv", workers=3)
+    for r in results:
+        assert r["build_s"] >= 0 and r["save_s"] >= 0
+
+
+def test_pipeline_matches_serial(raw_json_dump, local_outputs, tmp_path):
+    dump = tmp_path / "dump.json"
+    write_dump(dump, 80, seed=5)
+    raw = generate_dump(80, seed=5)
+    serial = run_tables(raw, "ts", "csv")
+    expected = _read_all(local_outputs)
+
+    pipelined = run_pipeline(lambda: open(dump, "rb"), "ts", "csv", build_workers=2, upload_workers=2)
+    actual = _read_all(local_outputs)
+
+    assert [r["table"] for r in pipelined] == list(BUILDERS) + list(ROLLUPS)
+    assert [r["fingerprint"] for r in pipelined] == [r["fingerprint"] for r in serial]
+    for name in expected:
+        pd.testing.assert_frame_equal(actual[name], expected[name])
+
+
+@pytest.fixture
+def traced_pipeline(local_outputs, tmp_path, monkeypatch):
+    """Pipeline instrumenté : lecture (lente) du dump, builds et uploads (lents) tracés dans `events`."""
+    dump = tmp_path / "dump.json"
+    write_dump(dump, 80, seed=5)
+    events, waiting, lock = [], [], threading.Lock()
+    delays = {"parse": 0.0, "upload": 0.0}
+    parse, build, write = olap_io.stream_oltp_tables, etl.build_table, etl.write_table
+
+    def traced_parse(fileobj, tables=None):
+        for table, records in parse(fileobj, tables=tables):
+            time.sleep(delays["parse"])
+            events.append(("parsed", table, None))
+            yield table, records
+
+    def traced_build(name, raw, profiler=None):
+        result = build(name, raw, profiler)
+        with lock:
+            waiting.append(name)
+        return result
+
+    def traced_write(name, df, *args):
+        with lock:
+            # Tables construites pas encore uploadées (celle-ci comprise)
+            events.append(("upload", name, len(waiting)))
+            if name in waiting:
+                waiting.remove(name)
+        time.sleep(delays["upload"])
+        return write(name, df, *args)
+
+    monkeypatch.setattr(etl, "stream_oltp_tables", traced_parse)
+    monkeypatch.setattr(etl, "build_table", traced_build)
+    monkeypatch.setattr(etl, "write_table", traced_write)
+
+    def run(queue_size: int, parse_s: float = 0.0, upload_s: float = 0.0):
+        delays.update(parse=parse_s, upload=upload_s)
+        run_pipeline(lambda: open(dump, "rb"), "ts", "csv", queue_size=queue_size)
+        return events
+
+    return run
+
+
+def test_pipeline_uploads_while_the_dump_is_still_read(traced_pipeline):
+    events = traced_pipeline(queue_size=2, parse_s=0.05)
+    first_upload = next(i for i, e in enumerate(events) if e[:2] == ("upload", "dim_customers"))
+    last_parse = max(i for i, e in enumerate(events) if e[0] == "parsed")
+    assert first_upload < last_parse
+
+
+def test_pipeline_queues_bound_tables_waiting_for_upload(traced_pipeline):
+    events = traced_pipeline(queue_size=1, upload_s=0.02)
+    # Au plus : 1 en file, 1 bloquée dans le thread de build, 1 en cours d'upload
+    assert max(e[2] for e in events if e[0] == "upload") <= 3
+
+
+def test_pipeline_failure_stops_every_stage(local_outputs, tmp_path, monkeypatch):
+    dump = tmp_path / "dump.json"
+    write_dump(dump, 20, seed=5)
+
+    def broken(data):
+        raise RuntimeError("builder exploded")
+
+    monkeypatch.setitem(BUILDERS, "dim_customers", broken)
+    with pytest.raises(RuntimeError, match="builder exploded"):
+        run_pipeline(lambda: open(dump, "rb"), "ts", "csv", queue_size=1)
+    assert not any(thread.name.startswith("etl-") for thread in threading.enumerate())
+
+
+def test_pipeline_profiles_builders(local_outputs, tmp_path, monkeypatch):
+    dump = tmp_path / "dump.json"
+    write_dump(dump, 20, seed=5)
+    profiled = []
+    monkeypatch.setattr(etl, "profile_builder", lambda name, profiler: profiled.append((name, profiler))
+                        or contextlib.nullcontext())
+    run_pipeline(lambda: open(dump, "rb"), "ts", "csv", profiler="cprofile")
+    assert sorted(profiled) == sorted((name, "cprofile") for name in BUILDERS)
+
+
+@pytest.mark.parametrize("workers", [1, 3])
+def test_run_tables_releases_sources_after_their_last_builder(raw_json_dump, local_outputs, workers):
+    raw = dict(raw_json_dump)
+    expected = [r["rows"] for r in run_tables(dict(raw_json_dump), "ts", "csv")]
+    results = run_tables(raw, "ts", "csv", workers=workers, release_sources=True)
+    assert [r["rows"] for r in results] == expected
+    assert raw == {}
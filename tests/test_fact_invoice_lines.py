@@ -0,0 +1,71 @@
+import copy
+
+import pandas as pd
+
+from scripts.csv_builders import build_fact_invoice_lines
+
+
+def _line(invoice_id, line_id, amount):
+    return {
+        "id": line_id,
+        "invoice": invoice_id,
+        "amount": amount,
+        "currency": "eur",
+        "quantity": 1,
+        "period": {"start": 1748450118, "end": 1751128518},
+        "parent": {"subscription_item_details": {"subscription": "sub_1", "subscription_item": "si_1"}},
+        "pricing": {"price_details": {"price": "price_1", "product": "prod_1"}},
+    }
+
+
+def _invoice(invoice_id, lines, has_more=False):
+    return {
+        "id": invoice_id, "customer_id": "cus_1", "currency": "eur", "created": "2025-05-28 18:35:19",
+        "livemode": False, "lines": {"data": lines, "has_more": has_more},
+    }
+
+
+def test_row_count_vs_dump_lines(raw_json_dump, olap_outputs):
+    """Chaque élément de lines.data du dump = exactement une ligne dans fact_invoice_lines."""
+    expected_len = sum(len(inv["lines"]["data"]) for inv in raw_json_dump["invoices"])
+    assert len(olap_outputs["fact_invoice_lines"]) == expected_len
+
+
+def test_lines_amount_matches_fact_invoices(olap_outputs):
+    lines_total = olap_outputs["fact_invoice_lines"].groupby("invoice_id")["amount"].sum()
+    invoices = olap_outputs["fact_invoices"].set_index("invoice_id")["amount_paid"]
+    assert (lines_total.reindex(invoices.index) == invoices).all()
+
+
+def test_multi_line_invoices_are_exploded():
+    data = {"invoices": [
+        _invoice("in_1", [_line("in_1", "il_1", 500), _line("in_1", "il_2", 700)]),
+        _invoice("in_2", []),
+        _invoice("in_3", [_line("in_3", "il_3", 100)]),
+    ]}
+    df = build_fact_invoice_lines(data)
+    assert len(df) == 3
+    assert df.groupby("invoice_id")["line_number"].max().to_dict() == {"in_1": 1, "in_3": 0}
+    assert df["amount"].sum() == 1300
+
+
+def test_paginated_lines_are_merged_without_duplicates():
+    first_page = [_line("in_1", "il_1", 500)]
+    data = {
+        "invoices": [_invoice("in_1", first_page, has_more=True)],
+        "invoice_lines": copy.deepcopy(first_page) + [_line("in_1", "il_2", 700), _line("in_9", "il_9", 1)],
+    }
+    df = build_fact_invoice_lines(data)
+    assert df["line_item_id"].tolist() == ["il_1", "il_2"]
+
+
+def test_missing_paths_yield_nulls():
+    data = {"invoices": [_invoice("in_1", [{"id": "il_1", "amount": 10}])]}
+    df = build_fact_invoice_lines(data)
+    assert len(df) == 1
+    assert pd.isna(df.loc[0, "price_id"])
+    assert df.loc[0, "currency"] == "eur"
+
+
+def test_empty_invoices():
+    assert build_fact_invoice_lines({"invoices": []}).empty
@@ -0,0 +1,85 @@
+import json
+
+import pandas as pd
+import pytest
+
+import scripts.flatten_utils as flatten_utils
+from scripts.flatten_utils import (
+    FLATTEN_RULES,
+    JsonFlattenRule,
+    apply_flatten_if_needed,
+    decode_json_column,
+    extract_paths,
+    flatten_dim_prices,
+    register_flatten_rule,
+)
+
+RECURRING = json.dumps({"interval": "month", "interval_count": 1, "usage_type": "licensed"})
+
+
+def test_each_json_value_is_decoded_once(monkeypatch):
+    calls = []
+    monkeypatch.setattr(flatten_utils, "_loads", lambda val: calls.append(val) or json.loads(val))
+    df = pd.DataFrame({"id": ["p1", "p2", "p3"], "recurring": [RECURRING, RECURRING, None]})
+
+    flat = flatten_dim_prices(df)
+    assert calls == [RECURRING]
+    assert flat["recurring_interval"].tolist() == ["month", "month", None]
+    assert flat["recurring_count"].tolist() == [1, 1, None]
+    assert "recurring" not in flat
+
+
+def test_decoded_dicts_and_invalid_json(capsys):
+    series = pd.Series([{"interval": "year"}, "{not json", 3.5], name="recurring")
+    assert decode_json_column(series).tolist() == [{"interval": "year"}, None, None]
+    assert "1 invalid JSON values in column 'recurring'" in capsys.readouterr().out
+
+
+def test_registered_rules_are_applied(monkeypatch):
+    monkeypatch.setitem(FLATTEN_RULES, "dim_test", [])
+    register_flatten_rule("dim_test", JsonFlattenRule("meta", {"tag": ("tags", 0)}, drop=False))
+    df = pd.DataFrame({"meta": ['{"tags": ["a", "b"]}', {"tags": []}]})
+
+    flat = apply_flatten_if_needed(df, "dim_test")
+    assert flat["tag"].tolist() == ["a", None]
+    assert "meta" in flat
+
+    with pytest.raises(ValueError):
+        register_flatten_rule("dim_prices", JsonFlattenRule("recurring", {}))
+
+
+LINES = {"data": [{"price": {"id": "price_1"}, "amount": 100}], "has_more": False}
+PATHS = {"price_id": ("price", "id"), "amount": ("amount",)}
+
+
+def _extract(values, paths=PATHS, prefix=("data", 0)):
+    return extract_paths(pd.Series(values, dtype=object), paths, prefix).to_dict("records")
+
+
+def test_extract_paths_follows_keys_and_indexes():
+    assert _extract([LINES]) == [{"price_id": "price_1", "amount": 100}]
+    assert _extract([LINES], {"more": ("has_more",), "price_id": ("data", 0, "price", "id")}, prefix=()) == \
+        [{"more": False, "price_id": "price_1"}]
+
+
+@pytest.mark.parametrize("value, amount", [
+    ({"data": [{"amount": 100}]}, 100),                     # clé manquante en fin de chemin
+    ({"lines": []}, None),                                  # clé manquante dans le préfixe
+    ({"data": []}, None),                                   # liste trop courte
+    ({"data": [{"price": None, "amount": None}]}, None),    # None en cours de chemin
+    (None, None),
+    (float("nan"), None),
+    ({"data": "xy"}, None),                                 # une chaîne n'est pas indexée
+    ({"data": [{"price": "price_1", "amount": 5}]}, 5),     # clé demandée sur une chaîne
+    ({"data": {"0": {"amount": 1}}}, None),                 # index demandé sur un dict
+    (42, None),
+])
+def test_extract_paths_returns_none_for_missing_paths(value, amount):
+    assert _extract([value]) == [{"price_id": None, "amount": amount}]
+
+
+def test_extract_paths_keeps_the_index():
+    series = pd.Series([LINES, None], index=[10, 20], dtype=object)
+    frame = extract_paths(series, PATHS, prefix=("data", 0))
+    assert frame.index.tolist() == [10, 20]
+    assert frame["price_id"].tolist() == ["price_1", None]
@@ -0,0 +1,122 @@
+import json
+
+import pandas as pd
+import pytest
+
+from scripts import etl_to_snowflake
+from scripts.incremental import (
+    ROW_HASHES,
+    GCSStateStore,
+    LocalStateStore,
+    extract_delta,
+    filter_new_rows,
+    next_watermark,
+    row_hashes,
+)
+from scripts.storage import LocalStorage
+from scripts.csv_builders import TABLE_CHANGE_TRACKING
+from scripts.generate_merge_sql import generate_merge_sql
+from conftest import DUMP_DIR
+
+
+def _customers(*created):
+    return pd.DataFrame({
+        "customer_id": [f"cus_{i}" for i in range(len(created))],
+        "created_at": list(created),
+    })
+
+
+def test_first_run_emits_everything():
+    df = _customers("2025-05-01 10:00:00", "2025-05-02 10:00:00")
+    delta, watermark = extract_delta(df, "dim_customers", state={})
+    assert len(delta) == 2
+    assert watermark == "2025-05-02T10:00:00"
+
+
+def test_only_rows_past_watermark_are_emitted():
+    df = _customers("2025-05-01 10:00:00", "2025-05-02 10:00:00", "2025-05-03 09:00:00")
+    delta = filter_new_rows(df, "dim_customers", "2025-05-02T10:00:00")
+    assert delta["customer_id"].tolist() == ["cus_1", "cus_2"]
+
+
+def test_watermark_never_moves_back():
+    df = _customers("2025-01-01 00:00:00")
+    assert next_watermark(df, "dim_customers", "2025-06-01T00:00:00") == "2025-06-01T00:00:00"
+    assert next_watermark(_customers(None), "dim_customers", None) is None
+
+
+def test_products_use_updated_at():
+    df = pd.DataFrame({
+        "product_id": ["prod_1", "prod_2"],
+        "created_at": ["2025-01-01 00:00:00", "2025-01-01 00:00:00"],
+        "updated_at": ["2025-01-01 00:00:00", "2025-07-01 00:00:00"],
+    })
+    delta, _ = extract_delta(df, "dim_products", {"dim_products": "2025-03-01T00:00:00"})
+    assert delta["product_id"].tolist() == ["prod_2"]
+
+
+def test_changed_rows_before_the_watermark_are_emitted():
+    before = pd.DataFrame({
+        "subscription_id": ["sub_1", "sub_2"],
+        "status": ["active", "active"],
+        "created_at": ["2025-01-01 00:00:00", "2025-02-01 00:00:00"],
+    })
+    now = before.assign(status=["active", "canceled"])
+    state = {"dim_subscriptions": "2025-06-01T00:00:00", ROW_HASHES: {"dim_subscriptions": row_hashes(before)}}
+    delta, watermark = extract_delta(now, "dim_subscriptions", state)
+    assert delta["subscription_id"].tolist() == ["sub_2"]
+    assert watermark == "2025-06-01T00:00:00"
+
+    # Sans empreintes du run précédent, une table suivie est réémise en entier
+    delta, _ = extract_delta(now, "dim_subscriptions", {"dim_subscriptions": "2025-06-01T00:00:00"})
+    assert len(delta) == 2
+
+
+def test_row_hashes_roundtrip(tmp_path):
+    hashes = row_hashes(_customers("2025-05-01 10:00:00", "2025-05-02 10:00:00"))
+    for store in (LocalStateStore(tmp_path / "state" / "wm.json"),
+                  GCSStateStore(store=LocalStorage(tmp_path / "bucket"), blob_path="state/wm.json")):
+        assert store.load_row_hashes() == {}
+        store.save_row_hashes({"dim_customers": hashes})
+        loaded = store.load_row_hashes()
+        assert list(loaded) == ["dim_customers"]
+        assert (loaded["dim_customers"] == hashes).all()
+    assert (tmp_path / "bucket" / "state" / "row_hashes" / "dim_customers.parquet").exists()
+
+
+def test_local_state_store_roundtrip(tmp_path):
+    store = LocalStateStore(tmp_path / "state" / "wm.json")
+    assert store.load() == {}
+    store.save({"dim_customers": "2025-05-02T10:00:00"})
+    assert store.load() == {"dim_customers": "2025-05-02T10:00:00"}
+
+
+def test_merge_sql_uses_keys():
+    sql = generate_merge_sql({"fact_invoice_lines": {"invoice_id": "string", "line_item_id": "string", "amount": "integer"}})
+    assert "CREATE OR REPLACE TEMPORARY TABLE fact_invoice_lines_delta LIKE fact_invoice_lines;" in sql
+    assert "ON t.invoice_id = s.invoice_id AND t.line_item_id = s.line_item_id" in sql
+    assert "    amount = s.amount\n" in sql
+    assert "line_item_id = s.line_item_id," not in sql
+
+
+@pytest.mark.skipif(not etl_to_snowflake.OFFLINE, reason="needs the local dump (OFFLINE=1)")
+def test_incremental_etl_offline(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr("scripts.olap_io.ENV", "DEV")
+    monkeypatch.setattr("scripts.olap_io.LOCAL_DUMP_DIR", str(DUMP_DIR))
+    store = LocalStateStore(tmp_path / "wm.json")
+    monkeypatch.setattr("scripts.etl_to_snowflake.get_state_store", lambda: store)
+
+    etl_to_snowflake.main(fmt="csv", incremental=True)
+    first = pd.read_csv(tmp_path / "olap_deltas" / "fact_invoices.csv")
+    assert len(first) == 3
+    state = store.load()
+    assert state["fact_invoices"] == "2025-05-28T18:35:19"
+
+    # Second run on the same dump: only rows at the high-water mark are re-emitted
+    etl_to_snowflake.main(fmt="csv", incremental=True)
+    second = pd.read_csv(tmp_path / "olap_deltas" / "fact_invoices.csv")
+    assert second["created_at"].tolist() == ["2025-05-28 18:35:19"]
+    assert json.loads((tmp_path / "wm.json").read_text()) == state
+    assert sorted(store.load_row_hashes()) == sorted(TABLE_CHANGE_TRACKING)
+
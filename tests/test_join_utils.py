@@ -0,0 +1,36 @@
+import pandas as pd
+
+from scripts.join_utils import Lookup, join_dimensions
+
+FACTS = pd.DataFrame({
+    "invoice_id": ["in_1", "in_2", "in_3", "in_4"],
+    "customer_id": ["cus_a", "cus_b", "cus_x", "cus_a"],
+    "payment_method_id": ["pm_1", None, "pm_1", "pm_9"],
+})
+CUSTOMERS = pd.DataFrame({"id": ["cus_a", "cus_b", "cus_b"], "email": ["a@x.io", "b@x.io", "dup@x.io"]})
+PAYMENT_METHODS = pd.DataFrame({"id": ["pm_1"], "amount": [42]})
+
+
+def _join():
+    return join_dimensions(FACTS, [
+        Lookup("customer_id", CUSTOMERS, {"email": "customer_email"}),
+        Lookup("payment_method_id", PAYMENT_METHODS, {"amount": "pm_amount"}, how="left"),
+    ], table="test")
+
+
+def test_matches_chained_merges():
+    result, _orphans = _join()
+    expected = (
+        FACTS.merge(CUSTOMERS.drop_duplicates("id"), left_on="customer_id", right_on="id")
+        .merge(PAYMENT_METHODS, how="left", left_on="payment_method_id", right_on="id")
+        .rename(columns={"email": "customer_email", "amount": "pm_amount"})
+    )[list(result.columns)]
+    pd.testing.assert_frame_equal(result, expected)
+
+
+def test_orphans_are_reported(capsys):
+    result, orphans = _join()
+    assert list(result["invoice_id"]) == ["in_1", "in_2", "in_4"]
+    # Les clés nulles ne sont pas des orphelins ; les jointures gauches les signalent sans filtrer
+    assert orphans == {"customer_id": ["cus_x"], "payment_method_id": ["pm_9"]}
+    assert "1 rows dropped" in capsys.readouterr().out
@@ -0,0 +1,119 @@
+import pytest
+
+from scripts.load_to_snowflake import group_statements, run_load_script, run_statements_parallel
+from scripts.metrics import finish_run, start_run
+
+
+class FakeAsyncCursor:
+    def __init__(self, conn):
+        self.conn = conn
+        self.sfqid = None
+        self.description = None
+        self._rows = []
+        self.rowcount = -1
+
+    def execute_async(self, statement):
+        self.sfqid = self.conn.submit(statement)
+        return {"queryId": self.sfqid}
+
+    def get_results_from_sfqid(self, sfqid):
+        statement = self.conn.queries[sfqid]["statement"]
+        if statement.startswith("COPY"):
+            self.description = [("file",), ("status",), ("rows_loaded",)]
+            self._rows = [("part-00000.csv", "LOADED", 10), ("part-00001.csv", "LOADED", 5)]
+        elif statement.startswith("MERGE"):
+            self.rowcount = 15
+
+    def fetchall(self):
+        return self._rows
+
+    def close(self):
+        pass
+
+
+class FakeConnection:
+    """Requêtes asynchrones simulées : chacune reste RUNNING pendant `polls` appels de get_query_status."""
+
+    def __init__(self, failing=(), polls=2):
+        self.failing = failing
+        self.polls = polls
+        self.queries = {}
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.order = []
+
+    def cursor(self):
+        return FakeAsyncCursor(self)
+
+    def submit(self, statement):
+        qid = f"q{len(self.queries)}"
+        self.queries[qid] = {"statement": statement, "polls": self.polls}
+        self.order.append(statement.split("\n")[0])
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        return qid
+
+    def get_query_status(self, qid):
+        query = self.queries[qid]
+        query["polls"] -= 1
+        if query["polls"] > 0:
+            return "RUNNING"
+        self.in_flight -= 1
+        return "FAILED_WITH_ERROR" if any(t in query["statement"] for t in self.failing) else "SUCCESS"
+
+    @staticmethod
+    def is_still_running(status):
+        return status == "RUNNING"
+
+    def get_query_status_throw_if_error(self, qid):
+        if any(t in self.queries[qid]["statement"] for t in self.failing):
+            raise RuntimeError("002003 (42S02): SQL compilation error: Table does not exist")
+        return "SUCCESS"
+
+
+MERGE_SCRIPT = [
+    "CREATE OR REPLACE TEMPORARY TABLE dim_a_delta LIKE dim_a",
+    "COPY INTO dim_a_delta (id)\nFROM @stage/dim_a",
+    "MERGE INTO dim_a AS t\nUSING dim_a_delta AS s",
+    "CREATE OR REPLACE TEMPORARY TABLE dim_b_delta LIKE dim_b",
+    "COPY INTO dim_b_delta (id)\nFROM @stage/dim_b",
+    "MERGE INTO dim_b AS t\nUSING dim_b_delta AS s",
+]
+
+
+def test_group_statements_keeps_delta_tables_with_their_table():
+    groups = group_statements(MERGE_SCRIPT)
+    assert list(groups) == ["dim_a", "dim_b"]
+    assert groups["dim_a"] == MERGE_SCRIPT[:3]
+
+
+def test_tables_load_concurrently_in_statement_order():
+    conn = FakeConnection()
+    loads = run_statements_parallel(conn, MERGE_SCRIPT, concurrency=4, poll_interval=0)
+
+    assert conn.max_in_flight == 2
+    assert [line for line in conn.order if "dim_a" in line] == [s.split("\n")[0] for s in MERGE_SCRIPT[:3]]
+    # Le COPY du delta et le MERGE portent sur les mêmes 15 lignes : elles ne sont pas comptées deux fois
+    assert [(load.table, load.status, load.rows, load.merged) for load in loads] == \
+        [("dim_a", "loaded", 15, 15), ("dim_b", "loaded", 15, 15)]
+
+
+def test_concurrency_limit():
+    conn = FakeConnection()
+    statements = [f"COPY INTO t{i} (id)\nFROM @stage/t{i}" for i in range(6)]
+    run_statements_parallel(conn, statements, concurrency=3, poll_interval=0)
+    assert conn.max_in_flight == 3
+
+
+def test_failed_table_fails_the_run_with_a_summary(tmp_path, capsys):
+    script = tmp_path / "copy_into_tables.sql"
+    script.write_text("COPY INTO dim_a (id)\nFROM @stage/{{OLAP_PATH}}dim_a;\n"
+                      "COPY INTO dim_b (id)\nFROM @stage/{{OLAP_PATH}}dim_b;\n")
+    start_run("load")
+    with pytest.raises(RuntimeError, match=r"1/2 table\(s\): dim_b: 002003 \(42S02\)"):
+        run_load_script(str(script), FakeConnection(failing=("dim_b",)), {"OLAP_PATH": "olap_outputs/ts/"})
+    report = finish_run()
+
+    summary = capsys.readouterr().out
+    assert "dim_a" in summary and "loaded" in summary and "failed" in summary
+    assert {(s["labels"]["table"], s["status"]) for s in report["stages"]} == {("dim_a", "ok"), ("dim_b", "error")}
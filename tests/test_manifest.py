@@ -0,0 +1,95 @@
+import copy
+
+from scripts.csv_builders import BUILDERS
+from scripts.etl_to_snowflake import run_tables
+from scripts.load_to_snowflake import unchanged_tables
+from scripts.manifest import previous_manifest, table_fingerprint, write_manifest
+from scripts.olap_io import get_latest_olap_folder, load_latest_olap_outputs, read_latest_manifest
+from scripts.storage import LocalStorage
+
+
+def test_fingerprint_ignores_row_order_but_not_values(raw_json_dump):
+    df = BUILDERS["dim_prices"](raw_json_dump)
+    fingerprint = table_fingerprint(df, "dim_prices", "csv")
+    assert table_fingerprint(df.iloc[::-1], "dim_prices", "csv") == fingerprint
+    assert table_fingerprint(df, "dim_prices", "parquet") != fingerprint
+
+    changed = df.copy()
+    changed.loc[0, "unit_amount"] = changed.loc[0, "unit_amount"] + 1
+    assert table_fingerprint(changed, "dim_prices", "csv") != fingerprint
+
+
+def test_unchanged_tables_reuse_previous_files(raw_json_dump, tmp_path, monkeypatch):
+    store = LocalStorage(tmp_path / "bucket")
+    monkeypatch.setattr("scripts.olap_io.ENV", "PROD")
+    monkeypatch.setattr("scripts.olap_io.get_storage", lambda bucket_name: store)
+
+    first = "2025-01-01_00-00-00"
+    write_manifest(first, "csv", run_tables(raw_json_dump, first, "csv"))
+
+    # Un produit renommé : dim_products et fact_invoices (product_name) changent, pas le reste
+    raw = copy.deepcopy(raw_json_dump)
+    raw["products"][0]["name"] = "Renamed plan"
+    second = "2025-01-02_00-00-00"
+    previous = previous_manifest(second)
+    results = run_tables(raw, second, "csv", previous=previous)
+    manifest = write_manifest(second, "csv", results)
+
+    reused = {name for name, entry in manifest["tables"].items() if entry["reused_from"] == first}
+    assert {"dim_products", "fact_invoices"}.isdisjoint(reused)
+    assert {"dim_customers", "dim_prices", "dim_charges"} <= reused
+
+    # Le dossier du second run est complet : fichiers réutilisés recopiés à côté des nouveaux
+    outputs = load_latest_olap_outputs("bucket")
+    assert outputs["dim_products"]["name"].tolist().count("Renamed plan") == 1
+    assert len(outputs["dim_customers"]) == len(BUILDERS["dim_customers"](raw))
+
+
+class ChecksumCursor:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def execute(self, sql):
+        self.sql = sql
+
+    def fetchall(self):
+        return self.rows
+
+    def close(self):
+        pass
+
+
+class ChecksumConnection:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def cursor(self):
+        return ChecksumCursor(self.rows)
+
+
+def test_loader_skips_tables_whose_loaded_fingerprint_matches():
+    manifest = {"tables": {"dim_prices": {"fingerprint": "aaa"}, "dim_products": {"fingerprint": "bbb"}}}
+    conn = ChecksumConnection([("TABLE_DATA", "DIM_PRICES", "aaa"), ("TABLE_DATA", "DIM_PRODUCTS", "old")])
+    assert unchanged_tables(conn, manifest) == {"dim_prices"}
+    assert unchanged_tables(conn, None) == set()
+
+
+def test_readers_follow_the_latest_pointer_without_listing(raw_json_dump, tmp_path, monkeypatch):
+    store = LocalStorage(tmp_path / "bucket")
+    monkeypatch.setattr("scripts.olap_io.ENV", "PROD")
+    monkeypatch.setattr("scripts.olap_io.get_storage", lambda bucket_name: store)
+
+    timestamp = "2025-01-01_00-00-00"
+    manifest = write_manifest(timestamp, "csv", run_tables(raw_json_dump, timestamp, "csv", previous=None))
+    assert read_latest_manifest(store) == manifest
+
+    # Seul le dossier du run est listé (infos des blobs pour le cache), jamais le préfixe entier
+    listed = []
+    list_folder = store.list
+    monkeypatch.setattr(store, "list", lambda prefix="": listed.append(prefix) or list_folder(prefix))
+    monkeypatch.setattr(store, "list_folders", lambda prefix="": listed.append(prefix) or [])
+    assert get_latest_olap_folder(store) == f"olap_outputs/{timestamp}/"
+    outputs = load_latest_olap_outputs("bucket")
+    assert set(outputs) == set(manifest["tables"])
+    assert len(outputs["dim_prices"]) == manifest["tables"]["dim_prices"]["rows"]
+    assert listed == [f"olap_outputs/{timestamp}/"]
@@ -0,0 +1,95 @@
+import json
+
+import pytest
+
+from scripts import etl_to_snowflake
+from scripts.csv_builders import BUILDERS
+from scripts.load_to_snowflake import rows_affected
+from scripts.metrics import finish_run, stage, start_run
+from conftest import DUMP_DIR
+
+
+def test_stages_are_recorded_with_status():
+    start_run("test", env="DEV")
+    with stage("build", table="t") as record:
+        record["rows_out"] = 3
+    with pytest.raises(ValueError):
+        with stage("upload", table="t"):
+            raise ValueError("boom")
+    report = finish_run()
+
+    build, upload = report["stages"]
+    assert (build["stage"], build["status"], build["rows_out"]) == ("build", "ok", 3)
+    assert upload["status"] == "error"
+    assert build["wall_s"] >= 0 and build["cpu_s"] >= 0 and build["peak_rss_mb"] > 0
+
+
+def test_stage_without_run_is_a_noop():
+    with stage("build") as record:
+        pass
+    assert record["status"] == "ok"
+    assert finish_run() == {}
+
+
+def test_prometheus_textfile(tmp_path):
+    recorder = start_run("etl", env="PROD")
+    with stage("upload", table='fact "x"') as record:
+        record["bytes"] = 42
+    recorder.write_prometheus(tmp_path / "etl.prom")
+    finish_run()
+
+    text = (tmp_path / "etl.prom").read_text()
+    assert "# TYPE stripe_olap_stage_bytes gauge" in text
+    assert 'stripe_olap_stage_bytes{run="etl",env="PROD",stage="upload",table="fact \\"x\\""} 42' in text
+    assert not list(tmp_path.glob("*.tmp"))
+
+
+@pytest.mark.skipif(not etl_to_snowflake.OFFLINE, reason="needs the local dump (OFFLINE=1)")
+def test_etl_writes_run_report(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr("scripts.olap_io.ENV", "DEV")
+    monkeypatch.setattr("scripts.olap_io.LOCAL_DUMP_DIR", str(DUMP_DIR))
+    etl_to_snowflake.main(fmt="csv", report_path="report.json", prometheus_path="etl.prom")
+
+    report = json.loads((tmp_path / "report.json").read_text())
+    stages = {(s["stage"], s["labels"].get("table")) for s in report["stages"]}
+    assert ("parse", None) in stages
+    assert {("build", name) for name in BUILDERS} <= stages
+    assert {("write", name) for name in BUILDERS} <= stages
+    assert (tmp_path / "etl.prom").exists()
+
+
+@pytest.mark.skipif(not etl_to_snowflake.OFFLINE, reason="needs the local dump (OFFLINE=1)")
+def test_failed_etl_writes_report_but_no_prometheus(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr("scripts.olap_io.ENV", "DEV")
+    monkeypatch.setattr("scripts.olap_io.LOCAL_DUMP_DIR", str(DUMP_DIR))
+
+    def broken_builder(raw):
+        raise RuntimeError("builder failed")
+    monkeypatch.setitem(BUILDERS, "dim_products", broken_builder)
+
+    with pytest.raises(RuntimeError, match="builder failed"):
+        etl_to_snowflake.main(fmt="csv", report_path="report.json", prometheus_path="etl.prom")
+
+    report = json.loads((tmp_path / "report.json").read_text())
+    build = next(s for s in report["stages"] if s["stage"] == "build" and s["labels"].get("table") == "dim_products")
+    assert build["status"] == "error"
+    assert not (tmp_path / "etl.prom").exists()
+
+
+class FakeCursor:
+    def __init__(self, description, rows, rowcount=-1):
+        self.description = description
+        self._rows = rows
+        self.rowcount = rowcount
+
+    def fetchall(self):
+        return self._rows
+
+
+def test_rows_affected_reads_copy_results():
+    copy = FakeCursor([("file",), ("status",), ("rows_parsed",), ("rows_loaded",)],
+                      [("a.csv", "LOADED", 3, 3), ("b.csv", "LOADED", 2, 2)])
+    assert rows_affected(copy) == 5
+    assert rows_affected(FakeCursor([("number of rows inserted",)], [], rowcount=7)) == 7
@@ -0,0 +1,112 @@
+import io
+import json
+from datetime import datetime, timezone
+from pathlib import Path
+
+import pytest
+
+import scripts.olap_io
+from scripts.blob_cache import BlobCache
+from scripts.olap_io import iter_json_dump, stream_oltp_tables, load_latest_oltp_json_from_gcs
+from conftest import DUMP_DIR
+
+DUMP_FILE = next(DUMP_DIR.glob("db_dump_prod_*.json"))
+
+
+class FakeBlob:
+    def __init__(self, name, payload, updated):
+        self.name = name
+        self.payload = payload
+        self.updated = updated
+        self.size = len(payload)
+        self.generation = 1
+        self.md5_hash = None
+
+    def open(self, mode="rb", chunk_size=None):
+        return io.BytesIO(self.payload)
+
+    def download_to_filename(self, filename):
+        Path(filename).write_bytes(self.payload)
+
+
+class FakeBucket:
+    def __init__(self, blobs):
+        self.blobs = blobs
+
+    def list_blobs(self, prefix=""):
+        return [b for b in self.blobs if b.name.startswith(prefix)]
+
+    def blob(self, name):
+        return next(b for b in self.blobs if b.name == name)
+
+
+class FakeClient:
+    def __init__(self, blobs):
+        self._bucket = FakeBucket(blobs)
+
+    def bucket(self, name):
+        return self._bucket
+
+
+@pytest.mark.parametrize("chunk_size", [1, 7, 4096])
+def test_streaming_matches_json_load(chunk_size):
+    """Le parseur par morceaux doit produire exactement le même contenu que json.load."""
+    expected = json.loads(DUMP_FILE.read_bytes())
+    with open(DUMP_FILE, "rb") as f:
+        streamed = dict(stream_oltp_tables(f, chunk_size=chunk_size))
+    assert streamed == expected
+
+
+def test_streaming_handles_scalars_and_empty_tables():
+    payload = '{"meta": {"v": 1}, "empty": [], "n": [1, 2.5, -3e2], "s": ["é\\u00e9", null]}'
+    tables = dict(stream_oltp_tables(io.BytesIO(payload.encode()), chunk_size=2))
+    assert tables == {"empty": [], "n": [1, 2.5, -3e2], "s": ["éé", None]}
+
+
+def test_records_share_their_key_strings():
+    # Comme json.load : une seule chaîne par nom de clé, partagée par tous les enregistrements
+    payload = b'{"a": [{"amount": 1, "nested": {"amount": 2}}, {"amount": 3, "nested": {"amount": 4}}]}'
+    first, second = dict(stream_oltp_tables(io.BytesIO(payload), chunk_size=5))["a"]
+    assert all(k1 is k2 for k1, k2 in zip(first, second))
+    assert next(iter(first["nested"])) is next(iter(second["nested"]))
+
+
+def test_unconsumed_tables_are_skipped():
+    payload = b'{"a": [{"x": 1}, {"x": 2}], "b": [{"y": 3}]}'
+    seen = [table for table, _records in iter_json_dump(io.BytesIO(payload), chunk_size=3)]
+    assert seen == ["a", "b"]
+
+
+def test_table_filter():
+    with open(DUMP_FILE, "rb") as f:
+        tables = dict(stream_oltp_tables(f, tables=["invoices", "prices"]))
+    assert set(tables) == {"invoices", "prices"}
+
+
+def test_malformed_dump_raises():
+    with pytest.raises(ValueError):
+        list(stream_oltp_tables(io.BytesIO(b'{"a": [{"x": 1}')))
+
+
+def test_load_from_local_dir():
+    data = load_latest_oltp_json_from_gcs(local_dir=DUMP_DIR, tables=["customers"])
+    assert list(data) == ["customers"]
+    assert len(data["customers"]) == 3
+
+
+def test_load_from_fake_gcs_picks_latest_blob(tmp_path, monkeypatch):
+    cache = BlobCache(tmp_path)
+    monkeypatch.setattr(scripts.olap_io, "get_blob_cache", lambda: cache)
+    old = FakeBlob("dump/db_dump_prod_old.json", b'{"invoices": [{"id": "old"}]}',
+                   datetime(2025, 1, 1, tzinfo=timezone.utc))
+    new = FakeBlob("dump/db_dump_prod_new.json", b'{"invoices": [{"id": "new"}]}',
+                   datetime(2025, 6, 1, tzinfo=timezone.utc))
+    other = FakeBlob("dump/notes.txt", b"", datetime(2026, 1, 1, tzinfo=timezone.utc))
+    client = FakeClient([old, new, other])
+    data = load_latest_oltp_json_from_gcs("bucket", client=client)
+    assert data == {"invoices": [{"id": "new"}]}
+    assert (cache.hits, cache.misses) == (0, 1)
+
+    # Deuxième lecture de la même génération : servie depuis le disque
+    assert load_latest_oltp_json_from_gcs("bucket", client=client) == data
+    assert (cache.hits, cache.misses) == (1, 1)
@@ -0,0 +1,56 @@
+from io import BytesIO
+
+import pandas as pd
+import pyarrow.parquet as pq
+import pytest
+
+from scripts.csv_builders import BUILDERS, TABLE_SCHEMAS
+from scripts.olap_io import ARROW_TYPES, read_table, save_dim, write_table
+from scripts.generate_copy_into_sql import generate_copy_into_sql
+from scripts.generate_create_tables import generate_create_table_sql
+
+
+@pytest.mark.parametrize("table_name", BUILDERS.keys())
+def test_builder_columns_match_schema(olap_outputs, table_name):
+    assert list(olap_outputs[table_name].columns) == list(TABLE_SCHEMAS[table_name])
+
+
+@pytest.mark.parametrize("compression", ["snappy", "zstd"])
+@pytest.mark.parametrize("table_name", BUILDERS.keys())
+def test_parquet_roundtrip_keeps_schema(raw_json_dump, table_name, compression):
+    df = BUILDERS[table_name](raw_json_dump)
+    buffer = BytesIO()
+    write_table(df, buffer, table_name, fmt="parquet", compression=compression)
+
+    buffer.seek(0)
+    arrow_schema = pq.read_schema(buffer)
+    for col, logical_type in TABLE_SCHEMAS[table_name].items():
+        assert arrow_schema.field(col).type == ARROW_TYPES[logical_type]
+
+    buffer.seek(0)
+    back = read_table(buffer, fmt="parquet")
+    assert len(back) == len(df)
+    assert list(back.columns) == list(df.columns)
+
+
+def test_create_table_types_come_from_the_schema_registry():
+    sql = generate_create_table_sql({"dim_subscriptions": TABLE_SCHEMAS["dim_subscriptions"]})
+    assert "start_date TIMESTAMP" in sql
+    assert "cancel_at TIMESTAMP" in sql  # colonne souvent vide : plus d'inférence sur un échantillon
+    assert "livemode BOOLEAN" in sql
+
+
+def test_copy_into_parquet_matches_by_name():
+    sql = generate_copy_into_sql({"dim_customers": pd.DataFrame(columns=["customer_id"])}, fmt="parquet")
+    assert "FROM @STRIPE_OLAP.RAW.GCS_STAGE_PROD/dim_customers\nPATTERN = '.*dim_customers([.]|/part-[0-9]+[.])parquet'" in sql
+    assert "FILE_FORMAT = (TYPE = PARQUET)" in sql
+    assert "MATCH_BY_COLUMN_NAME = CASE_INSENSITIVE;" in sql
+
+
+def test_save_dim_locally_as_parquet(raw_json_dump, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr("scripts.olap_io.ENV", "DEV")
+    df = BUILDERS["dim_prices"](raw_json_dump)
+    save_dim(df, "dim_prices", timestamp="2025-01-01_00-00-00", fmt="parquet")
+    back = pd.read_parquet(tmp_path / "olap_outputs" / "dim_prices.parquet")
+    assert back["price_id"].tolist() == df["price_id"].tolist()
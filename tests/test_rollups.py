@@ -0,0 +1,46 @@
+import pandas as pd
+import pytest
+
+from benchmarks.synthetic_dump import generate_dump
+from scripts.csv_builders import BUILDERS, validate_frame
+from scripts.rollups import ROLLUPS, affected_groups, build_rollup, combine_rollups
+
+RAW = generate_dump(300, seed=3)
+FACT = BUILDERS["fact_invoices"](RAW)
+
+
+def test_rollups_match_the_fact_table():
+    revenue = build_rollup("agg_revenue_monthly", FACT)
+    ltv = build_rollup("agg_customer_ltv", FACT)
+    for name in ROLLUPS:
+        validate_frame(build_rollup(name, FACT), name)
+    assert revenue["revenue"].sum() == ltv["lifetime_value"].sum() == FACT["amount_paid"].sum()
+    assert revenue["invoices"].sum() == len(FACT)
+
+
+def test_yearly_plans_are_spread_over_twelve_months():
+    paid = FACT[(FACT["status"] == "paid").to_numpy()]
+    yearly = paid[(paid["plan_interval"] == "year").to_numpy()].head(1)
+    mrr = build_rollup("agg_mrr_monthly", yearly)
+    assert len(mrr) == 12
+    assert mrr["mrr"].sum() == pytest.approx(yearly["plan_amount"].iloc[0])
+    assert build_rollup("agg_mrr_monthly", paid)["mrr"].sum() == pytest.approx(paid["plan_amount"].sum())
+
+
+def test_partial_rollups_recombine_exactly():
+    for name in ROLLUPS:
+        partials = [build_rollup(name, FACT.iloc[start:start + 40]) for start in range(0, len(FACT), 40)]
+        pd.testing.assert_frame_equal(combine_rollups(name, partials), build_rollup(name, FACT), check_exact=True)
+
+
+def test_delta_touches_only_its_groups_with_full_values():
+    rollup = build_rollup("agg_revenue_monthly", FACT)
+    cutoff = FACT["created_at"].quantile(0.9)
+    delta = FACT[(FACT["created_at"] >= cutoff).to_numpy()]
+    touched = affected_groups("agg_revenue_monthly", rollup, delta)
+
+    assert 0 < len(touched) < len(rollup)
+    assert touched["month"].min() == cutoff.tz_localize(None).to_period("M").to_timestamp().tz_localize("UTC")
+    # Valeurs complètes des groupes touchés (pas seulement la part du delta) : un MERGE rejoué reste juste
+    merged = touched.merge(rollup, on=["month", "currency", "product_id"], suffixes=("", "_full"))
+    assert (merged["revenue"] == merged["revenue_full"]).all()
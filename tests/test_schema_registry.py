@@ -0,0 +1,66 @@
+import pandas as pd
+import pytest
+
+from scripts.csv_builders import (
+    BUILDERS, SEARCH_OPTIMIZATION, TABLE_CLUSTERING, TABLE_SCHEMAS, TRANSIENT_TABLES, cluster_order,
+    cluster_permutation, validate_frame,
+)
+from scripts.generate_create_tables import generate_create_table_sql
+from scripts.olap_io import save_dim
+from scripts.sql_runner import parse_statement, split_statements
+
+
+@pytest.mark.parametrize("table_name", BUILDERS.keys())
+def test_builder_outputs_pass_validation(olap_outputs, table_name):
+    validate_frame(olap_outputs[table_name], table_name)
+
+
+def test_validation_rejects_drifted_frames(raw_json_dump):
+    df = BUILDERS["dim_prices"](raw_json_dump)
+    with pytest.raises(ValueError, match="missing=\\['livemode'\\]"):
+        validate_frame(df.drop(columns="livemode"), "dim_prices")
+    with pytest.raises(ValueError, match="unit_amount"):
+        validate_frame(df.assign(unit_amount=df["unit_amount"].astype(str)), "dim_prices")
+    with pytest.raises(ValueError, match="key column"):
+        validate_frame(df.assign(price_id=None).astype({"price_id": "string"}), "dim_prices")
+
+
+def test_invalid_frame_is_not_written(raw_json_dump, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr("scripts.olap_io.ENV", "DEV")
+    df = BUILDERS["dim_prices"](raw_json_dump).drop(columns="livemode")
+    with pytest.raises(ValueError):
+        save_dim(df, "dim_prices", timestamp="2025-01-01_00-00-00")
+    assert not (tmp_path / "olap_outputs").exists()
+
+
+def test_ddl_carries_physical_design_hints():
+    schemas = {name: TABLE_SCHEMAS[name] for name in ("fact_invoices", "dim_products", "agg_customer_ltv")}
+    statements = [parse_statement(text) for text in split_statements(
+        generate_create_table_sql(schemas, TABLE_CLUSTERING, SEARCH_OPTIMIZATION, TRANSIENT_TABLES))]
+    texts = [statement.text for statement in statements]
+
+    assert texts[0].endswith(") CLUSTER BY (TO_DATE(created_at))")
+    assert texts[1] == "ALTER TABLE fact_invoices ADD SEARCH OPTIMIZATION ON EQUALITY(invoice_id, customer_id)"
+    assert texts[2].startswith("CREATE OR REPLACE TABLE dim_products (") and texts[2].endswith(")")
+    assert texts[3].startswith("CREATE OR REPLACE TRANSIENT TABLE agg_customer_ltv (")
+    # L'ALTER est rattaché à sa table : sauté avec elle quand la table est inchangée
+    assert [statement.object_name for statement in statements] == \
+        ["FACT_INVOICES", "FACT_INVOICES", "DIM_PRODUCTS", "AGG_CUSTOMER_LTV"]
+
+
+def test_outputs_are_sorted_on_the_cluster_key(raw_json_dump):
+    df = BUILDERS["fact_invoices"](raw_json_dump)
+    ordered = cluster_order(df, "fact_invoices")
+    assert ordered["created_at"].is_monotonic_increasing
+    assert sorted(ordered["invoice_id"]) == sorted(df["invoice_id"])
+    assert cluster_order(df, "dim_products") is df
+
+
+def test_cluster_permutation_puts_missing_dates_last():
+    df = pd.DataFrame({
+        "created_at": pd.to_datetime(["2024-03-01", None, "2024-01-01", "2024-03-01"], utc=True),
+        "invoice_id": ["in_b", "in_c", "in_d", "in_a"],
+    }, index=[10, 11, 12, 13])
+    assert cluster_permutation(df, "fact_invoices").tolist() == [2, 3, 0, 1]
+    assert cluster_permutation(df, "dim_products") is None
@@ -0,0 +1,107 @@
+import os
+
+import pytest
+
+from scripts.metrics import finish_run, start_run
+from scripts.sql_runner import load_script, parse_statement, run_script, split_statements
+
+
+def test_split_ignores_semicolons_in_strings_and_comments():
+    sql = """
+    -- header; not a statement
+    CREATE VIEW v AS SELECT 'a;b' AS x, "we;ird" AS y; /* block; comment */
+    SELECT 'it''s; fine', $$ body; $$ FROM t // trailing; comment
+    ;
+    ;
+    """
+    assert split_statements(sql) == [
+        """CREATE VIEW v AS SELECT 'a;b' AS x, "we;ird" AS y""",
+        "SELECT 'it''s; fine', $$ body; $$ FROM t",
+    ]
+
+
+def test_unterminated_string_is_reported():
+    with pytest.raises(ValueError, match="line 2"):
+        split_statements("SELECT 1;\nSELECT 'oops;")
+
+
+def test_parse_statement_target():
+    assert parse_statement("CREATE OR REPLACE VIEW vw_x AS SELECT 1")[1:] == ("CREATE", "VIEW", "VW_X")
+    assert parse_statement("CREATE TABLE IF NOT EXISTS RAW.dim_a (id STRING)")[1:] == ("CREATE", "TABLE", "DIM_A")
+    assert parse_statement("USE SCHEMA RAW")[1:] == ("USE", None, None)
+
+
+def test_repo_scripts_keep_commented_statements():
+    # Les instructions précédées d'un commentaire étaient perdues par le split naïf
+    kinds = [s.kind for s in load_script("scripts/sql/setup_snowflake_infra.sql")]
+    assert kinds == ["CREATE", "USE", "CREATE", "USE", "CREATE"]
+    assert len(load_script("scripts/sql/copy_into_tables.sql")) == 12
+
+
+def test_scripts_are_cached_until_the_file_changes(tmp_path):
+    path = tmp_path / "s.sql"
+    path.write_text("CREATE STAGE s URL = 'gcs://{{BUCKET}}/';")
+    first = load_script(path, {"BUCKET": "b"})
+    assert load_script(path, {"BUCKET": "b"}) is first
+    assert first[0].text == "CREATE STAGE s URL = 'gcs://b/'"
+
+    path.write_text("SELECT 1; SELECT 2;")
+    os.utime(path, ns=(0, path.stat().st_mtime_ns + 1_000_000))
+    assert len(load_script(path, {"BUCKET": "b"})) == 2
+
+
+class FakeCursor:
+    def __init__(self, conn):
+        self.conn = conn
+        self._rows = []
+
+    def execute(self, sql, num_statements=None):
+        if sql.startswith("SELECT") and "INFORMATION_SCHEMA" in sql:
+            self._rows = list(self.conn.checksums)
+            return self
+        self.conn.batches.append((sql, num_statements))
+        return self
+
+    def nextset(self):
+        return None
+
+    def fetchall(self):
+        return self._rows
+
+    def close(self):
+        pass
+
+
+class FakeConnection:
+    def __init__(self):
+        self.batches = []
+        self.checksums = []
+
+    def cursor(self):
+        return FakeCursor(self)
+
+
+def test_run_script_batches_and_skips_current_views(tmp_path):
+    path = tmp_path / "views.sql"
+    path.write_text("CREATE OR REPLACE VIEW vw_a AS SELECT 1;\nCREATE OR REPLACE VIEW vw_b AS SELECT 2;\n")
+    conn = FakeConnection()
+
+    assert run_script(conn, path) == {"executed": 2, "skipped": []}
+    (sql, count), = conn.batches
+    assert count == 4 and sql.count(";\n") == 3  # 2 vues + table et MERGE des empreintes
+
+    statements = load_script(path)
+    conn.checksums = [("VIEW", "VW_A", statements[0].checksum), ("VIEW", "VW_B", "stale")]
+    assert run_script(conn, path) == {"executed": 1, "skipped": ["VW_A"]}
+    sql, count = conn.batches[-1]
+    assert count == 3 and sql.startswith("CREATE OR REPLACE VIEW vw_b") and "vw_a" not in sql
+
+
+def test_batch_stage_counts_statements_in_a_label(tmp_path):
+    path = tmp_path / "infra.sql"
+    path.write_text("CREATE WAREHOUSE IF NOT EXISTS wh;\nUSE WAREHOUSE wh;\n")
+    start_run("load")
+    run_script(FakeConnection(), path)
+    record, = finish_run()["stages"]
+    assert record["labels"] == {"file": "infra.sql", "statement": "BATCH", "statements": 2}
+    assert record["rows_in"] is None and record["rows_out"] is None
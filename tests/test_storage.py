@@ -0,0 +1,137 @@
+import io
+from datetime import datetime, timezone
+
+from google.api_core.exceptions import NotFound
+from google.auth.credentials import AnonymousCredentials
+from google.auth.transport.requests import AuthorizedSession
+
+from scripts.storage import GCSStorage, LocalStorage, configure_storage_client
+from scripts.olap_io import get_latest_olap_folder
+
+
+class FakeIterator(list):
+    def __init__(self, blobs, prefixes):
+        super().__init__(blobs)
+        self.prefixes = prefixes
+
+
+class CountingBucket:
+    """Faux bucket GCS qui compte les appels de listing."""
+
+    def __init__(self, names):
+        self.names = names
+        self.calls = []
+
+    def list_blobs(self, prefix="", delimiter=None):
+        self.calls.append((prefix, delimiter))
+        names = [n for n in self.names if n.startswith(prefix)]
+        if delimiter is None:
+            return [FakeBlob(n) for n in names]
+        folders = {prefix + n[len(prefix):].split("/")[0] + "/" for n in names if "/" in n[len(prefix):]}
+        files = [FakeBlob(n) for n in names if "/" not in n[len(prefix):]]
+        return FakeIterator(files, folders)
+
+    def blob(self, name):
+        return UploadBlob(self, name)
+
+
+class FakeBlob:
+    def __init__(self, name):
+        self.name = name
+        self.size = 1
+        self.updated = datetime(2025, 1, 1, tzinfo=timezone.utc)
+        self.generation = 1
+        self.md5_hash = None
+
+
+class UploadBlob(FakeBlob):
+    def __init__(self, bucket, name):
+        super().__init__(name)
+        self.bucket = bucket
+
+    def upload_from_string(self, data, content_type=None):
+        self.bucket.names.append(self.name)
+
+    def download_as_bytes(self):
+        raise NotFound(self.name)
+
+
+class FakeClient:
+    def __init__(self, bucket):
+        self._bucket = bucket
+
+    def bucket(self, name):
+        return self._bucket
+
+
+NAMES = [
+    "olap_outputs/2025-05-01_00-00-00/fact_invoices.csv",
+    "olap_outputs/2025-05-02_00-00-00/fact_invoices.csv",
+    "olap_outputs/2025-05-02_00-00-00/dim_customers.csv",
+]
+
+
+def test_latest_folder_uses_delimiter_listing():
+    bucket = CountingBucket(list(NAMES))
+    store = GCSStorage("bucket", client=FakeClient(bucket))
+    assert get_latest_olap_folder(store) == "olap_outputs/2025-05-02_00-00-00/"
+    assert bucket.calls == [("olap_outputs/", "/")]
+
+
+def test_listings_are_cached_until_ttl_or_write():
+    bucket = CountingBucket(list(NAMES))
+    store = GCSStorage("bucket", client=FakeClient(bucket), listing_ttl=60)
+    store.list_folders("olap_outputs/")
+    store.list_folders("olap_outputs/")
+    assert len(bucket.calls) == 1
+
+    store.write_bytes("olap_outputs/2025-05-03_00-00-00/fact_invoices.csv", b"x")
+    assert store.list_folders("olap_outputs/")[-1] == "olap_outputs/2025-05-03_00-00-00/"
+    assert len(bucket.calls) == 2
+
+    expired = GCSStorage("bucket", client=FakeClient(bucket), listing_ttl=0)
+    expired.list("olap_outputs/")
+    expired.list("olap_outputs/")
+    assert len(bucket.calls) == 4
+
+
+def test_local_storage_implements_the_same_interface(tmp_path):
+    store = LocalStorage(tmp_path)
+    for name in NAMES:
+        store.write_bytes(name, b"a,b\n1,2\n")
+    store.upload_file("olap_outputs/2025-05-02_00-00-00/dim_prices.csv", io.BytesIO(b"c\n3\n"))
+
+    assert get_latest_olap_folder(store) == "olap_outputs/2025-05-02_00-00-00/"
+    assert [b.name for b in store.list("olap_outputs/2025-05-02")] == [
+        "olap_outputs/2025-05-02_00-00-00/dim_customers.csv",
+        "olap_outputs/2025-05-02_00-00-00/dim_prices.csv",
+        "olap_outputs/2025-05-02_00-00-00/fact_invoices.csv",
+    ]
+    assert store.exists(NAMES[0]) and not store.exists("missing.csv")
+    assert store.read_bytes("olap_outputs/2025-05-02_00-00-00/dim_prices.csv") == b"c\n3\n"
+    assert store.stat(NAMES[0]).size == 8
+
+
+def test_offline_roundtrip_through_local_bucket(raw_json_dump, tmp_path, monkeypatch):
+    from scripts import olap_io
+    from scripts.csv_builders import BUILDERS
+
+    store = LocalStorage(tmp_path)
+    monkeypatch.setattr(olap_io, "get_storage", lambda bucket_name: store)
+    for name, builder in BUILDERS.items():
+        olap_io.upload_table_to_gcs(builder(raw_json_dump), "bucket", f"olap_outputs/2025-05-02_00-00-00/{name}.csv")
+
+    outputs = olap_io.load_latest_olap_outputs("bucket")
+    assert set(outputs) == set(BUILDERS)
+    assert len(outputs["fact_invoices"]) == len(raw_json_dump["invoices"])
+
+
+def test_storage_client_uses_a_pooled_authorized_session(monkeypatch):
+    credentials = AnonymousCredentials()
+    monkeypatch.setattr("google.auth.default", lambda scopes=None: (credentials, "stripe-olap"))
+    client = configure_storage_client(pool_size=4)
+
+    assert client.project == "stripe-olap"
+    session = client._http
+    assert isinstance(session, AuthorizedSession) and session.credentials is credentials
+    assert session.get_adapter("https://storage.googleapis.com")._pool_maxsize == 4
@@ -0,0 +1,86 @@
+import io
+import gzip
+import re
+
+import pandas as pd
+import pytest
+
+from benchmarks.synthetic_dump import generate_dump
+from scripts.csv_builders import BUILDERS, cluster_order, cluster_permutation
+from scripts.generate_copy_into_sql import file_pattern
+from scripts.olap_io import load_latest_olap_outputs, save_table, stream_table, write_table
+from scripts.storage import LocalStorage
+
+
+def test_sliced_csv_matches_single_write(raw_json_dump):
+    df = BUILDERS["fact_invoice_lines"](raw_json_dump)
+    expected = io.StringIO()
+    write_table(df, expected, "fact_invoice_lines", "csv")
+
+    out = io.BytesIO()
+    size = stream_table(df, out, "fact_invoice_lines", "csv", slice_rows=3)
+    assert out.getvalue().decode() == expected.getvalue()
+    assert size == len(out.getvalue())
+
+
+def test_permuted_slices_match_the_sorted_frame(raw_json_dump):
+    df = BUILDERS["fact_invoices"](raw_json_dump)
+    expected = io.StringIO()
+    write_table(cluster_order(df, "fact_invoices"), expected, "fact_invoices", "csv")
+
+    out = io.BytesIO()
+    stream_table(df, out, "fact_invoices", "csv", slice_rows=3, rows=cluster_permutation(df, "fact_invoices"))
+    assert out.getvalue().decode() == expected.getvalue()
+
+
+def test_gzip_on_the_fly_roundtrip(raw_json_dump):
+    df = BUILDERS["dim_customers"](raw_json_dump)
+    out = io.BytesIO()
+    stream_table(df, out, "dim_customers", "csv", compress=True, slice_rows=2)
+    assert pd.read_csv(io.BytesIO(gzip.decompress(out.getvalue())))["customer_id"].tolist() == df["customer_id"].tolist()
+
+
+@pytest.mark.parametrize("fmt,compress", [("csv", False), ("csv", True), ("parquet", False)])
+def test_large_tables_are_split_into_parts(tmp_path, monkeypatch, fmt, compress):
+    store = LocalStorage(tmp_path / "bucket")
+    monkeypatch.setattr("scripts.olap_io.ENV", "PROD")
+    monkeypatch.setattr("scripts.olap_io.get_storage", lambda bucket_name: store)
+    raw = generate_dump(300, seed=3)
+
+    timestamp = "2025-01-01_00-00-00"
+    paths = {}
+    for name, builder in BUILDERS.items():
+        # ~5 Ko par part : les factures sont découpées, les petites dimensions restent en un fichier
+        paths[name] = save_table(builder(raw), name, timestamp, fmt, compress=compress, part_size_mb=0.005)
+    assert len(paths["fact_invoices"]) > 1
+    assert paths["dim_products"] == [f"olap_outputs/{timestamp}/dim_products.{'csv.gz' if compress else fmt}"]
+
+    pattern = re.compile(file_pattern("fact_invoices", fmt))
+    assert all(pattern.fullmatch(path) for path in paths["fact_invoices"])
+
+    outputs = load_latest_olap_outputs("bucket")
+    for name, builder in BUILDERS.items():
+        expected = cluster_order(builder(raw), name).reset_index(drop=True)
+        if fmt == "csv":
+            pd.testing.assert_frame_equal(outputs[name], expected, check_categorical=False, obj=name)
+        else:
+            assert outputs[name].iloc[:, 0].tolist() == expected.iloc[:, 0].tolist()
+
+
+def test_local_save_replaces_stale_parts(tmp_path, monkeypatch, raw_json_dump):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr("scripts.olap_io.ENV", "DEV")
+    df = BUILDERS["fact_invoices"](raw_json_dump)
+    assert len(save_table(df, "fact_invoices", "ts", "csv", part_size_mb=0.0005)) > 1
+
+    assert save_table(df, "fact_invoices", "ts", "csv") == ["olap_outputs/fact_invoices.csv"]
+    assert not list((tmp_path / "olap_outputs").glob("fact_invoices/part-*"))
+
+
+def test_failed_local_write_leaves_no_file(tmp_path):
+    store = LocalStorage(tmp_path)
+    with pytest.raises(RuntimeError):
+        with store.open_write("olap_outputs/dim_prices.csv") as fileobj:
+            fileobj.write(b"price_id\n")
+            raise RuntimeError("encoding failed")
+    assert store.list("olap_outputs/") == []
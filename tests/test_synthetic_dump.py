@@ -0,0 +1,31 @@
+import json
+
+from benchmarks.synthetic_dump import generate_dump, parse_scale, table_sizes, write_dump
+from scripts.csv_builders import BUILDERS
+
+
+def test_generator_is_seeded():
+    assert generate_dump(50, seed=1) == generate_dump(50, seed=1)
+    assert generate_dump(50, seed=1) != generate_dump(50, seed=2)
+
+
+def test_written_dump_matches_in_memory_dump(tmp_path):
+    path = tmp_path / "db_dump_prod_synthetic.json"
+    write_dump(path, 40, seed=3)
+    assert json.loads(path.read_text()) == generate_dump(40, seed=3)
+
+
+def test_builders_accept_synthetic_dump():
+    raw = generate_dump(200)
+    assert {table: len(rows) for table, rows in raw.items()} == table_sizes(200)
+    outputs = {name: builder(raw) for name, builder in BUILDERS.items()}
+    # Clés cohérentes : aucune facture écartée par les jointures
+    assert len(outputs["fact_invoices"]) == 200
+    assert len(outputs["fact_invoice_lines"]) >= 200
+    assert outputs["dim_prices"]["recurring_interval"].notna().all()
+    assert outputs["dim_subscriptions"]["price_id"].notna().all()
+
+
+def test_parse_scale():
+    assert parse_scale("1M") == 1_000_000
+    assert parse_scale("2500") == 2500